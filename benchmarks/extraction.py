@@ -0,0 +1,212 @@
+"""
+Benchmark article extraction over a directory of stored HTML pages.
+
+    python -m benchmarks.extraction [--corpus DIR] [--repeat N] [--save-baseline]
+
+Every page is extracted repeat times with extract_article_text and, separately, step
+by step, so a regression can be traced to the step that caused it. Times are reported
+as p50/p95/p99 over all pages and runs, peak memory is the largest tracemalloc peak of
+a single page (Python allocations only, Readability running in Node is not counted)
+and output size is the total Markdown produced. Any time, memory or size figure more
+than --threshold above the committed baseline fails the run, as does a missing baseline.
+"""
+import argparse
+import json
+import logging
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+from typing import Callable, Optional
+
+from markdownify import markdownify as html2md
+
+from utils.html_slimmer import slim_html
+from utils.newspaper_processor import (
+    EMAIL_REGEX,
+    _parse_page,
+    extract_article_text,
+    format_article_markdown
+)
+from utils.readability_worker import simple_json_from_html
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+DEFAULT_CORPUS = PROJECT_ROOT / "benchmarks" / "corpus"
+DEFAULT_BASELINE = PROJECT_ROOT / "benchmarks" / "baseline.json"
+SIGNATURE = '<div id="firma"><hr><p><a href="https://github.com/urielsalis/empleadoEstatalBot">Source Code</a></p></div>'
+TIME_FIGURES = ("p50", "p95", "p99")
+# Times below this are noise, they do not fail the run however much they grow
+MIN_COMPARED_SECONDS = 0.001
+
+
+def _article_html(article: Optional[dict]) -> Optional[str]:
+    if not article or not article.get("content"):
+        return None
+    return EMAIL_REGEX.sub(lambda m: m.group(0).replace('@', ' at '), article["content"])
+
+
+def extraction_steps(html: str) -> dict[str, Callable[[], object]]:
+    """
+    The steps of extract_article_text in order, each taking the previous step's output.
+    Returned as zero-argument callables that must be run in order.
+    """
+    state = {}
+
+    def run_slim():
+        state["html"] = slim_html(html)
+
+    def run_parse_page():
+        # The single parse extract_article makes, reading the metadata and making URLs absolute
+        state["soup"], state["base_url"], metadata = _parse_page(state["html"])
+        state["og_image"] = metadata.og_image
+
+    def run_serialize_page():
+        # Without a site profile, extract_article hands Readability the rewritten page
+        if state["base_url"]:
+            state["html"] = str(state["soup"])
+
+    def run_readability():
+        state["article"] = simple_json_from_html(state["html"])
+
+    def run_markdownify():
+        content = _article_html(state["article"])
+        state["markdown"] = html2md(content) if content else None
+
+    def run_post_process():
+        if state["markdown"] is None:
+            return None
+        return format_article_markdown(state["markdown"], state["article"], state["og_image"], SIGNATURE)
+
+    return {
+        "slim_html": run_slim,
+        "parse_page": run_parse_page,
+        "serialize_page": run_serialize_page,
+        "readability": run_readability,
+        "markdownify": run_markdownify,
+        "post_process": run_post_process,
+    }
+
+
+def percentile(samples: list[float], fraction: float) -> float:
+    """Nearest-rank percentile of a non-empty list."""
+    ordered = sorted(samples)
+    rank = max(1, round(fraction * len(ordered)))
+    return ordered[min(rank, len(ordered)) - 1]
+
+
+def _measure_memory(function: Callable[[], object]) -> int:
+    tracemalloc.start()
+    try:
+        function()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def run_benchmark(pages: list[str], repeat: int = 5) -> dict[str, dict[str, float]]:
+    """
+    Extract every page repeat times, returning for the whole extraction ("total") and each
+    step its p50/p95/p99 time in seconds and peak memory in bytes. The total also
+    has output_chars, the size of the Markdown produced for all pages.
+    """
+    times: dict[str, list[float]] = {"total": []}
+    memory: dict[str, int] = {"total": 0}
+    output_chars = 0
+
+    for html in pages:
+        # Warm up, the first extraction starts the Readability worker
+        extract_article_text(html, SIGNATURE)
+
+        for _ in range(repeat):
+            start = time.perf_counter()
+            extract_article_text(html, SIGNATURE)
+            times["total"].append(time.perf_counter() - start)
+
+            for name, step in extraction_steps(html).items():
+                start = time.perf_counter()
+                step()
+                times.setdefault(name, []).append(time.perf_counter() - start)
+
+        memory["total"] = max(memory["total"], _measure_memory(lambda: extract_article_text(html, SIGNATURE)))
+        for name, step in extraction_steps(html).items():
+            memory[name] = max(memory.get(name, 0), _measure_memory(step))
+
+        output_chars += len(extract_article_text(html, SIGNATURE) or "")
+
+    results = {
+        name: {
+            **{figure: percentile(samples, int(figure[1:]) / 100) for figure in TIME_FIGURES},
+            "peak_memory": memory[name],
+        }
+        for name, samples in times.items()
+    }
+    results["total"]["output_chars"] = output_chars
+    return results
+
+
+def find_regressions(
+    results: dict[str, dict[str, float]],
+    baseline: dict[str, dict[str, float]],
+    threshold: float
+) -> list[str]:
+    """Describe every figure more than threshold (a fraction) above its baseline."""
+    regressions = []
+    for name, figures in results.items():
+        for figure, value in figures.items():
+            expected = baseline.get(name, {}).get(figure)
+            if expected is None:
+                continue
+            if figure in TIME_FIGURES and max(value, expected) < MIN_COMPARED_SECONDS:
+                continue
+            if value > expected * (1 + threshold):
+                regressions.append(f"{name} {figure}: {value:.6g} vs baseline {expected:.6g}")
+    return regressions
+
+
+def format_results(results: dict[str, dict[str, float]]) -> str:
+    lines = [f"{'step':<24}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'peak KiB':>12}"]
+    for name, figures in results.items():
+        lines.append(
+            f"{name:<24}{figures['p50'] * 1000:>10.2f}{figures['p95'] * 1000:>10.2f}"
+            f"{figures['p99'] * 1000:>10.2f}{figures['peak_memory'] / 1024:>12.0f}"
+        )
+    lines.append(f"output: {results['total']['output_chars']} characters")
+    return "\n".join(lines)
+
+
+def main(argv: Optional[list[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark article extraction over stored HTML pages.")
+    parser.add_argument("--corpus", type=Path, default=DEFAULT_CORPUS, help="directory of .html pages")
+    parser.add_argument("--repeat", type=int, default=5, help="timed runs per page")
+    parser.add_argument("--baseline", type=Path, default=DEFAULT_BASELINE, help="baseline JSON file")
+    parser.add_argument("--threshold", type=float, default=0.25, help="allowed growth over the baseline, 0.25 = 25%%")
+    parser.add_argument("--save-baseline", action="store_true", help="write the results as the new baseline")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.ERROR)
+    paths = sorted(args.corpus.glob("*.html"))
+    if not paths:
+        print(f"No .html pages in {args.corpus}", file=sys.stderr)
+        return 2
+    pages = [path.read_text(encoding="utf-8") for path in paths]
+
+    results = run_benchmark(pages, args.repeat)
+    print(f"{len(pages)} pages, {args.repeat} runs each")
+    print(format_results(results))
+
+    if args.save_baseline:
+        args.baseline.write_text(json.dumps(results, indent=2) + "\n")
+        print(f"Saved baseline to {args.baseline}")
+        return 0
+    if not args.baseline.exists():
+        print(f"No baseline at {args.baseline}, run with --save-baseline to record one", file=sys.stderr)
+        return 2
+
+    regressions = find_regressions(results, json.loads(args.baseline.read_text()), args.threshold)
+    for regression in regressions:
+        print(f"REGRESSION {regression}", file=sys.stderr)
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
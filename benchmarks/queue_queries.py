@@ -0,0 +1,165 @@
+"""
+Benchmark the queries stages use to pick up work, over a database of generated posts.
+
+    python -m benchmarks.queue_queries [--rows N] [--repeat N] [--without-indexes]
+
+Most generated posts are already posted, as in a database that has been running for a
+while, and an equal share of the newest waits in each queue. Each query is timed repeat
+times and reported as p50/p95/p99; claimed posts are released again between runs,
+outside the timing. --without-indexes drops the state and texts.post_id indexes first, to compare
+against a table scan.
+"""
+import argparse
+import logging
+import os
+import sys
+import tempfile
+import time
+from typing import Callable, Optional
+
+from benchmarks.extraction import TIME_FIGURES, percentile
+from infrastructure import database
+from infrastructure.database import (
+    STATE_CHUNKED,
+    STATE_FETCHED,
+    STATE_NEW,
+    STATE_POSTED,
+    STATE_PROCESSED,
+    claim_posts_to_fetch,
+    claim_posts_to_post,
+    claim_posts_to_process,
+    get_posts_to_chunk,
+    get_posts_with_processed_duplicate,
+    release_claims
+)
+
+WORKER = "benchmark"
+# Share of the generated posts waiting in each queue, the rest is posted
+QUEUED_SHARE = 0.02
+QUEUE_INDEXES = (
+    "idx_posts_state",
+    "idx_posts_new",
+    "idx_posts_fetched",
+    "idx_posts_processed",
+    "idx_posts_chunked",
+    "idx_posts_posted",
+    "idx_texts_post_id",
+)
+
+
+def populate(rows: int) -> None:
+    """
+    Insert rows posts spread over every state, the newest in the queues, with the texts
+    and chunks each state has.
+    """
+    conn = database.get_db_connection()
+    queued = max(1, int(rows * QUEUED_SHARE))
+    states = [STATE_NEW, STATE_FETCHED, STATE_PROCESSED, STATE_CHUNKED]
+    posts, texts, chunks = [], [], []
+    for post_id in range(1, rows + 1):
+        index = (rows - post_id) // queued
+        state = states[index] if index < len(states) else STATE_POSTED
+        done = states.index(state) if state in states else len(states)
+        posts.append((
+            post_id, f"t3_{post_id}", "argentina", f"https://diario.com.ar/{post_id}",
+            f"https://diario.com.ar/{post_id}", 1_700_000_000 + post_id,
+            0 if state == STATE_NEW else None,
+            1 if done >= 1 else None,
+            2 if done >= 2 else None,
+            3 if state == STATE_POSTED else None,
+            state
+        ))
+        if done >= 1:
+            texts.append((post_id, "texto" if done >= 2 else None, "<html></html>"))
+        if done >= 3:
+            chunks.append((post_id, 0, "texto"))
+    conn.executemany("""
+        INSERT INTO posts (
+            id, reddit_id, subreddit, url, canonical_url, created_utc,
+            fetch_at_utc, fetched_at_utc, processed_at_utc, posted_at_utc, state
+        )
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+    """, posts)
+    conn.executemany("INSERT INTO texts (post_id, text, raw_text) VALUES (?, ?, ?)", texts)
+    conn.executemany("INSERT INTO chunks (post_id, position, body) VALUES (?, ?, ?)", chunks)
+    conn.commit()
+    conn.execute("ANALYZE")
+
+
+def queue_queries(batch_size: int) -> dict[str, Callable[[], list]]:
+    """The queries each stage runs once per cycle, returning the posts they picked up."""
+    return {
+        "claim_posts_to_fetch": lambda: claim_posts_to_fetch(WORKER, batch_size),
+        "claim_posts_to_process": lambda: claim_posts_to_process(WORKER, batch_size),
+        "get_posts_to_chunk": lambda: get_posts_to_chunk(batch_size),
+        "claim_posts_to_post": lambda: claim_posts_to_post(WORKER, batch_size),
+        "get_posts_with_processed_duplicate": lambda: get_posts_with_processed_duplicate(batch_size),
+    }
+
+
+def run_benchmark(
+    rows: int = 100_000,
+    repeat: int = 20,
+    batch_size: int = 10,
+    with_indexes: bool = True
+) -> dict[str, dict[str, float]]:
+    """Time every queue query over a fresh database of rows posts, returning p50/p95/p99 seconds."""
+    data_dir = os.environ.get("DATA_DIR")
+    with tempfile.TemporaryDirectory() as tmp:
+        os.environ["DATA_DIR"] = tmp
+        try:
+            database.close_db_connection()
+            database.init_db()
+            conn = database.get_db_connection()
+            if not with_indexes:
+                for index in QUEUE_INDEXES:
+                    conn.execute(f"DROP INDEX {index}")
+            populate(rows)
+
+            times: dict[str, list[float]] = {}
+            for name, query in queue_queries(batch_size).items():
+                for _ in range(repeat):
+                    start = time.perf_counter()
+                    picked_up = query()
+                    times.setdefault(name, []).append(time.perf_counter() - start)
+                    release_claims([row[0] for row in picked_up], WORKER)
+        finally:
+            database.close_db_connection()
+            if data_dir is None:
+                del os.environ["DATA_DIR"]
+            else:
+                os.environ["DATA_DIR"] = data_dir
+
+    return {
+        name: {figure: percentile(samples, int(figure[1:]) / 100) for figure in TIME_FIGURES}
+        for name, samples in times.items()
+    }
+
+
+def format_results(results: dict[str, dict[str, float]]) -> str:
+    lines = [f"{'query':<36}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}"]
+    for name, figures in results.items():
+        lines.append(
+            f"{name:<36}{figures['p50'] * 1000:>10.3f}{figures['p95'] * 1000:>10.3f}{figures['p99'] * 1000:>10.3f}"
+        )
+    return "\n".join(lines)
+
+
+def main(argv: Optional[list[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark the queue queries over generated posts.")
+    parser.add_argument("--rows", type=int, default=100_000, help="posts in the generated database")
+    parser.add_argument("--repeat", type=int, default=20, help="timed runs per query")
+    parser.add_argument("--batch-size", type=int, default=10, help="posts picked up per query")
+    parser.add_argument("--without-indexes", action="store_true", help="drop the queue indexes first")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.ERROR)
+    results = run_benchmark(args.rows, args.repeat, args.batch_size, not args.without_indexes)
+    indexes = "without" if args.without_indexes else "with"
+    print(f"{args.rows} posts, {args.repeat} runs per query, {indexes} queue indexes")
+    print(format_results(results))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
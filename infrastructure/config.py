@@ -21,4 +21,10 @@ def get_monitored_subreddits() -> list[str]:
 def get_distinguished_subreddits() -> list[str]:
     """Get list of subreddits where the bot is distinguished."""
     config = load_config()
-    return config['reddit']['distinguishable'] 
\ No newline at end of file
+    return config['reddit']['distinguishable'] 
+
+
+def get_url_shorteners() -> list[str]:
+    """Get list of URL shortener domains whose links are resolved before queueing."""
+    config = load_config()
+    return config['newspaper_processor'].get('url_shorteners', [])
@@ -4,6 +4,9 @@ from pathlib import Path
 import logging
 import time
 import threading
+from typing import Callable
+
+from infrastructure.stats_registry import StatsRegistry
 
 logger = logging.getLogger(__name__)
 
@@ -16,10 +19,106 @@ _write_rlock = threading.RLock()
 # Global database path
 _db_path = None
 
+# Stats are counted in memory and written to post_stats by flush_stats()
+_stats = StatsRegistry()
+# Held while a flush is being written, so readers never catch its stats taken out of memory but not yet in post_stats
+_stats_flush_lock = threading.Lock()
+
+# A post is dropped once its fetch has been retried this many times
+MAX_FETCH_RETRIES = 3
+
+# A claimed post is left to its worker for this long, then any worker may claim it again
+DEFAULT_LEASE_SECONDS = 900
+# Filters out posts another worker holds an unexpired lease on, takes the current time
+UNCLAIMED = "(p.lease_expires_utc IS NULL OR p.lease_expires_utc <= ?)"
+# Fences a write to the worker holding the post, takes its worker_id. IS rather than = lets
+# None match posts nobody claimed, for writes made outside a claim.
+HELD_BY = "claimed_by IS ?"
+
+# Where a post is in the pipeline, kept in posts.state. Queries compare against these as
+# literals rather than parameters, SQLite only uses a partial index for a matching literal.
+STATE_NEW = 'new'
+STATE_FETCHED = 'fetched'
+STATE_PROCESSED = 'processed'
+STATE_CHUNKED = 'chunked'
+STATE_POSTED = 'posted'
+
 def _get_current_time() -> int:
     """Helper function to get current UTC timestamp."""
     return int(time.time())
 
+def _add_column_if_missing(conn: sqlite3.Connection, table: str, column: str, definition: str) -> None:
+    """Add a column to an existing table unless it is already there."""
+    columns = {row[1] for row in conn.execute(f"PRAGMA table_info({table})")}
+    if column not in columns:
+        conn.execute(f"ALTER TABLE {table} ADD COLUMN {column} {definition}")
+        logger.info(f"Added column {table}.{column}")
+
+def _add_canonical_url(conn: sqlite3.Connection) -> None:
+    """Databases created before crosspost deduplication lack the column."""
+    _add_column_if_missing(conn, "posts", "canonical_url", "TEXT DEFAULT NULL")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_posts_canonical_url ON posts (canonical_url)")
+
+def _add_chunk_comment_id(conn: sqlite3.Connection) -> None:
+    """Chunks stored before resumable posting lack the column."""
+    _add_column_if_missing(conn, "chunks", "comment_id", "TEXT DEFAULT NULL")
+
+def _add_leases(conn: sqlite3.Connection) -> None:
+    """Databases created before work leases lack the claim columns."""
+    _add_column_if_missing(conn, "posts", "claimed_by", "TEXT DEFAULT NULL")
+    _add_column_if_missing(conn, "posts", "lease_expires_utc", "INTEGER DEFAULT NULL")
+
+def _add_post_state(conn: sqlite3.Connection) -> None:
+    """
+    Keep each post's state in an indexed column instead of deriving it from its timestamps,
+    with a partial index per queue so claiming work does not scan the whole table.
+    """
+    _add_column_if_missing(conn, "posts", "state", f"TEXT NOT NULL DEFAULT '{STATE_NEW}'")
+    conn.execute(f"""
+        UPDATE posts 
+        SET state = CASE
+            WHEN posted_at_utc IS NOT NULL THEN '{STATE_POSTED}'
+            WHEN processed_at_utc IS NOT NULL AND EXISTS (SELECT 1 FROM chunks c WHERE c.post_id = posts.id)
+                THEN '{STATE_CHUNKED}'
+            WHEN processed_at_utc IS NOT NULL THEN '{STATE_PROCESSED}'
+            WHEN fetched_at_utc IS NOT NULL THEN '{STATE_FETCHED}'
+            ELSE '{STATE_NEW}'
+        END
+    """)
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_posts_state ON posts (state)")
+    conn.execute(f"CREATE INDEX IF NOT EXISTS idx_posts_new ON posts (fetch_at_utc) WHERE state = '{STATE_NEW}'")
+    conn.execute(f"CREATE INDEX IF NOT EXISTS idx_posts_fetched ON posts (id) WHERE state = '{STATE_FETCHED}'")
+    conn.execute(f"CREATE INDEX IF NOT EXISTS idx_posts_processed ON posts (id) WHERE state = '{STATE_PROCESSED}'")
+    conn.execute(f"CREATE INDEX IF NOT EXISTS idx_posts_chunked ON posts (created_utc) WHERE state = '{STATE_CHUNKED}'")
+    conn.execute(f"CREATE INDEX IF NOT EXISTS idx_posts_posted ON posts (posted_at_utc) WHERE state = '{STATE_POSTED}'")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_texts_post_id ON texts (post_id)")
+
+# Schema changes in the order they were made. A database's PRAGMA user_version is the number
+# of them already applied; new ones are only ever appended. Fresh databases run them all too,
+# so each must also work on tables created with the current schema.
+MIGRATIONS: list[Callable[[sqlite3.Connection], None]] = [
+    _add_canonical_url,
+    _add_chunk_comment_id,
+    _add_leases,
+    _add_post_state,
+]
+
+def _migrate(conn: sqlite3.Connection) -> None:
+    """Apply the migrations a database has not had yet, each in its own transaction."""
+    version = conn.execute("PRAGMA user_version").fetchone()[0]
+    for number, migration in enumerate(MIGRATIONS[version:], start=version + 1):
+        cursor = conn.cursor()
+        try:
+            cursor.execute("BEGIN TRANSACTION")
+            migration(conn)
+            # PRAGMA does not take parameters
+            cursor.execute(f"PRAGMA user_version = {number}")
+            cursor.execute("COMMIT")
+            logger.info(f"Applied schema migration {number}: {migration.__name__}")
+        except sqlite3.Error:
+            cursor.execute("ROLLBACK")
+            raise
+
 def init_db() -> str:
     """Initialize the database and return the path to the DB file as a string."""
     global _db_path
@@ -35,18 +134,22 @@ def init_db() -> str:
     conn = get_db_connection()
     with _write_rlock:
         try:
-            conn.execute("""
+            conn.execute(f"""
                 CREATE TABLE IF NOT EXISTS posts (
                     id INTEGER PRIMARY KEY AUTOINCREMENT,
                     reddit_id TEXT UNIQUE,
                     subreddit TEXT,
                     url TEXT,
+                    canonical_url TEXT DEFAULT NULL,
                     created_utc INTEGER,
                     fetch_at_utc INTEGER DEFAULT NULL,
                     fetched_at_utc INTEGER DEFAULT NULL,
                     processed_at_utc INTEGER DEFAULT NULL,
                     posted_at_utc INTEGER DEFAULT NULL,
-                    retry_count INTEGER DEFAULT 0
+                    retry_count INTEGER DEFAULT 0,
+                    claimed_by TEXT DEFAULT NULL,
+                    lease_expires_utc INTEGER DEFAULT NULL,
+                    state TEXT NOT NULL DEFAULT '{STATE_NEW}'
                 )
             """)
             conn.execute("""
@@ -58,6 +161,59 @@ def init_db() -> str:
                     FOREIGN KEY (post_id) REFERENCES posts (id)
                 )
             """)
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS chunks (
+                    post_id INTEGER,
+                    position INTEGER,
+                    body TEXT,
+                    comment_id TEXT DEFAULT NULL,
+                    PRIMARY KEY (post_id, position),
+                    FOREIGN KEY (post_id) REFERENCES posts (id)
+                )
+            """)
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS url_redirects (
+                    short_url TEXT PRIMARY KEY,
+                    final_url TEXT,
+                    resolved_at_utc INTEGER
+                )
+            """)
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS extraction_cache (
+                    cache_key TEXT PRIMARY KEY,
+                    text TEXT,
+                    size INTEGER,
+                    last_used_utc INTEGER
+                )
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_extraction_cache_last_used ON extraction_cache (last_used_utc)")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS extraction_failures (
+                    domain TEXT,
+                    reason TEXT,
+                    count INTEGER DEFAULT 0,
+                    last_failed_utc INTEGER,
+                    PRIMARY KEY (domain, reason)
+                )
+            """)
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS site_profile_stats (
+                    domain TEXT PRIMARY KEY,
+                    hits INTEGER DEFAULT 0,
+                    fallbacks INTEGER DEFAULT 0,
+                    hit_ms INTEGER DEFAULT 0,
+                    last_updated_utc INTEGER
+                )
+            """)
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS stage_idle_stats (
+                    stage TEXT PRIMARY KEY,
+                    posts INTEGER DEFAULT 0,
+                    idle_seconds INTEGER DEFAULT 0,
+                    max_idle_seconds INTEGER DEFAULT 0,
+                    last_updated_utc INTEGER
+                )
+            """)
             conn.execute("""
                 CREATE TABLE IF NOT EXISTS post_stats (
                     id INTEGER PRIMARY KEY AUTOINCREMENT,
@@ -75,6 +231,16 @@ def init_db() -> str:
                 ('posts_processed', 0),
                 ('posts_posted', 0),
                 ('posts_skipped', 0),
+                ('posts_deduplicated', 0),
+                ('posting_queue_wait_seconds', 0),
+                ('posting_queue_waits', 0),
+                ('rate_limit_wait_seconds', 0),
+                ('http_cache_hits', 0),
+                ('http_cache_misses', 0),
+                ('http_requests', 0),
+                ('http_connections_reused', 0),
+                ('extraction_cache_hits', 0),
+                ('extraction_cache_misses', 0),
                 ('oldest_post', 0),
                 ('newest_post', 0)
             ]
@@ -86,6 +252,9 @@ def init_db() -> str:
                 """, (stat_name, initial_value, _get_current_time()))
                 
             conn.commit()
+            
+            # Bring tables created by older versions up to the current schema
+            _migrate(conn)
             logger.info("Database tables created or already exist.")
             
         except sqlite3.Error as e:
@@ -120,17 +289,61 @@ def close_db_connection() -> None:
             logger.error(f"Error closing connection: {e}")
 
 def _update_stat(stat_name: str, increment: int = 1) -> None:
-    """Internal function to update a statistic."""
-    conn = get_db_connection()
-    with _write_rlock:
-        cursor = conn.cursor()
-        cursor.execute("""
-            UPDATE post_stats 
-            SET stat_value = stat_value + ?,
-                last_updated_utc = ?
-            WHERE stat_name = ?
-        """, (increment, _get_current_time(), stat_name))
-        conn.commit()
+    """Internal function to update a statistic, written to post_stats by the next flush."""
+    _stats.increment(stat_name, increment)
+
+def flush_stats() -> None:
+    """Write the stats counted since the last flush to post_stats in a single transaction."""
+    with _stats_flush_lock:
+        pending = _stats.take()
+        if not any(pending):
+            return
+        conn = get_db_connection()
+        with _write_rlock:
+            current_time = _get_current_time()
+            cursor = conn.cursor()
+            try:
+                cursor.execute("BEGIN TRANSACTION")
+                
+                cursor.executemany("""
+                    UPDATE post_stats 
+                    SET stat_value = stat_value + ?,
+                        last_updated_utc = ?
+                    WHERE stat_name = ?
+                """, [(value, current_time, name) for name, value in pending.increments.items()])
+                
+                # Stats that keep the lowest or highest value seen, 0 until there is one
+                cursor.executemany("""
+                    UPDATE post_stats 
+                    SET stat_value = ?,
+                        last_updated_utc = ?
+                    WHERE stat_name = ?
+                    AND (stat_value = 0 OR stat_value > ?)
+                """, [(value, current_time, name, value) for name, value in pending.minimums.items()])
+                cursor.executemany("""
+                    UPDATE post_stats 
+                    SET stat_value = ?,
+                        last_updated_utc = ?
+                    WHERE stat_name = ?
+                    AND (stat_value = 0 OR stat_value < ?)
+                """, [(value, current_time, name, value) for name, value in pending.maximums.items()])
+                
+                cursor.execute("COMMIT")
+                conn.commit()
+            except sqlite3.Error as e:
+                # Nothing of this flush was written, the next one tries again
+                if conn.in_transaction:
+                    conn.rollback()
+                _stats.restore(pending)
+                logger.error(f"Failed to flush stats: {e}")
+                raise
+
+def get_stats() -> dict[str, int]:
+    """Get every stat, including what was counted since the last flush."""
+    with _stats_flush_lock:
+        cursor = get_db_connection().cursor()
+        cursor.execute("SELECT stat_name, stat_value FROM post_stats")
+        return StatsRegistry.apply(dict(cursor.fetchall()), _stats.peek())
 
 def cleanup_old_posts() -> None:
     """Delete posts that were posted more than 1 day ago or have no text content."""
@@ -146,47 +359,53 @@ def cleanup_old_posts() -> None:
             cursor.execute("BEGIN TRANSACTION")
             
             # Delete old posted entries and their texts
-            cursor.execute("""
+            cursor.execute(f"""
                 DELETE FROM texts 
                 WHERE post_id IN (
                     SELECT id FROM posts 
-                    WHERE posted_at_utc IS NOT NULL 
+                    WHERE state = '{STATE_POSTED}' 
                     AND posted_at_utc < ?
                 )
             """, (one_day_ago,))
             
-            cursor.execute("""
+            cursor.execute(f"""
                 DELETE FROM posts 
-                WHERE posted_at_utc IS NOT NULL 
+                WHERE state = '{STATE_POSTED}' 
                 AND posted_at_utc < ?
             """, (one_day_ago,))
             
             # Delete posts with no text content and their texts
-            cursor.execute("""
+            cursor.execute(f"""
                 DELETE FROM texts 
                 WHERE post_id IN (
-                    SELECT id FROM posts 
-                    WHERE fetched_at_utc IS NOT NULL 
-                    AND processed_at_utc IS NULL 
-                    AND id IN (
-                        SELECT post_id 
-                        FROM texts 
-                        WHERE text IS NULL
+                    SELECT p.id FROM posts p
+                    WHERE p.state = '{STATE_FETCHED}' 
+                    AND EXISTS (
+                        SELECT 1 
+                        FROM texts t 
+                        WHERE t.post_id = p.id 
+                        AND t.text IS NULL
                     )
                 )
             """)
             
-            cursor.execute("""
+            cursor.execute(f"""
                 DELETE FROM posts 
-                WHERE fetched_at_utc IS NOT NULL 
-                AND processed_at_utc IS NULL 
-                AND id IN (
-                    SELECT post_id 
-                    FROM texts 
-                    WHERE text IS NULL
+                WHERE state = '{STATE_FETCHED}' 
+                AND EXISTS (
+                    SELECT 1 
+                    FROM texts t 
+                    WHERE t.post_id = posts.id 
+                    AND t.text IS NULL
                 )
             """)
             
+            # Delete the comment chunks of every post removed above
+            cursor.execute("""
+                DELETE FROM chunks 
+                WHERE post_id NOT IN (SELECT id FROM posts)
+            """)
+            
             cursor.execute("COMMIT")
             conn.commit()
             
@@ -198,82 +417,116 @@ def cleanup_old_posts() -> None:
             logger.error(f"Failed to clean up posts: {e}")
             raise
 
-def insert_post(reddit_id: str, subreddit: str, url: str, created_utc: int) -> None:
-    """Insert a new post if it doesn't exist."""
+def insert_post(
+    reddit_id: str,
+    subreddit: str,
+    url: str,
+    created_utc: int,
+    canonical_url: str | None = None
+) -> None:
+    """Insert a new post if it doesn't exist.
+    Posts sharing a canonical_url share a single fetch and extraction.
+    """
+    insert_posts_many([(reddit_id, subreddit, url, created_utc, canonical_url)])
+
+def insert_posts_many(posts: list[tuple[str, str, str, int, str | None]]) -> int:
+    """
+    Insert (reddit_id, subreddit, url, created_utc, canonical_url) posts that don't exist yet
+    in a single transaction. Returns how many were new.
+    """
+    if not posts:
+        return 0
     conn = get_db_connection()
     with _write_rlock:
         current_time = _get_current_time()
         cursor = conn.cursor()
         
         try:
-            # Insert the post and update stats in a single transaction
+            # Insert the posts and update stats in a single transaction
             cursor.execute("BEGIN TRANSACTION")
             
-            # Insert the post
-            cursor.execute("""
-                INSERT OR IGNORE INTO posts (reddit_id, subreddit, url, created_utc, fetch_at_utc) 
-                VALUES (?, ?, ?, ?, ?)
-            """, (reddit_id, subreddit, url, created_utc, current_time))
-            
-            # If a new post was inserted, update stats
-            cursor.execute("""
-                UPDATE post_stats 
-                SET stat_value = stat_value + 1,
-                    last_updated_utc = ?
-                WHERE stat_name = 'total_posts'
-                AND EXISTS (
-                    SELECT 1 FROM posts 
-                    WHERE reddit_id = ? 
-                    AND id = last_insert_rowid()
-                )
-            """, (current_time, reddit_id))
-            
-            # Update posts_fetched stat when a new post is inserted
-            cursor.execute("""
-                UPDATE post_stats 
-                SET stat_value = stat_value + 1,
-                    last_updated_utc = ?
-                WHERE stat_name = 'posts_fetched'
-                AND EXISTS (
-                    SELECT 1 FROM posts 
-                    WHERE reddit_id = ? 
-                    AND id = last_insert_rowid()
-                )
-            """, (current_time, reddit_id))
-            
-            # Update oldest/newest post if needed
-            cursor.execute("""
-                UPDATE post_stats 
-                SET stat_value = CASE 
-                    WHEN stat_name = 'oldest_post' AND (stat_value = 0 OR stat_value > ?) THEN ?
-                    WHEN stat_name = 'newest_post' AND (stat_value = 0 OR stat_value < ?) THEN ?
-                    ELSE stat_value 
-                END,
-                last_updated_utc = ?
-                WHERE stat_name IN ('oldest_post', 'newest_post')
-            """, (created_utc, created_utc, created_utc, created_utc, current_time))
+            # Insert the posts, the row count only includes the ones that were not there yet
+            cursor.executemany("""
+                INSERT OR IGNORE INTO posts (reddit_id, subreddit, url, canonical_url, created_utc, fetch_at_utc) 
+                VALUES (?, ?, ?, ?, ?, ?)
+            """, [
+                (reddit_id, subreddit, url, canonical_url, created_utc, current_time)
+                for reddit_id, subreddit, url, created_utc, canonical_url in posts
+            ])
+            inserted = cursor.rowcount
             
             cursor.execute("COMMIT")
             conn.commit()
         except sqlite3.Error as e:
-            logger.error(f"Failed to insert post: {e}")
+            logger.error(f"Failed to insert posts: {e}")
             raise
+    
+    # Count the new posts and update oldest/newest post if needed
+    _update_stat('total_posts', inserted)
+    _update_stat('posts_fetched', inserted)
+    _stats.record_min('oldest_post', min(created_utc for _, _, _, created_utc, _ in posts))
+    _stats.record_max('newest_post', max(created_utc for _, _, _, created_utc, _ in posts))
+    return inserted
 
-def get_posts_to_fetch(limit: int = 10) -> list[tuple[int, str]]:
-    """Get posts that are ready to be fetched."""
+def claim_posts_to_fetch(
+    worker_id: str,
+    limit: int = 10,
+    lease_seconds: int = DEFAULT_LEASE_SECONDS
+) -> list[tuple[int, str, int]]:
+    """Claim up to limit posts that are ready to be fetched, returning (id, url, retry_count).
+    Crossposts of an article that is already queued or fetched are left out,
+    they reuse the earliest post's result instead.
+    """
     conn = get_db_connection()
-    cursor = conn.cursor()
-    cursor.execute("""
-        SELECT id, url 
+    with _write_rlock:
+        current_time = _get_current_time()
+        cursor = conn.cursor()
+        cursor.execute(f"""
+            UPDATE posts 
+            SET claimed_by = ?,
+                lease_expires_utc = ?
+            WHERE id IN (
+                SELECT p.id 
+                FROM posts p
+                WHERE p.state = '{STATE_NEW}'
+                AND p.fetch_at_utc <= ?
+                AND {UNCLAIMED}
+                AND NOT EXISTS (
+                    SELECT 1 FROM posts s
+                    WHERE s.canonical_url = p.canonical_url
+                    AND s.id < p.id
+                )
+                LIMIT ?
+            )
+            RETURNING id, url, retry_count
+        """, (worker_id, current_time + lease_seconds, current_time, current_time, limit))
+        posts = cursor.fetchall()
+        conn.commit()
+        return posts
+
+def _held_posts(cursor: sqlite3.Cursor, post_ids: list[int], worker_id: str | None) -> set[int]:
+    """The posts among post_ids that worker_id still holds, to be run inside the transaction writing them."""
+    placeholders = ",".join("?" for _ in post_ids)
+    cursor.execute(f"""
+        SELECT id
         FROM posts 
-        WHERE fetched_at_utc IS NULL
-        AND fetch_at_utc <= ?
-        LIMIT ?
-    """, (_get_current_time(), limit))
-    return cursor.fetchall()
+        WHERE id IN ({placeholders})
+        AND {HELD_BY}
+    """, (*post_ids, worker_id))
+    return {row[0] for row in cursor.fetchall()}
+
+def mark_post_as_fetched(post_id: int, html_content: str, worker_id: str | None = None) -> bool:
+    """Mark a post as fetched and store its HTML content. Returns whether worker_id still held it."""
+    return bool(mark_posts_as_fetched_many([(post_id, html_content)], worker_id))
 
-def mark_post_as_fetched(post_id: int, html_content: str) -> None:
-    """Mark a post as fetched and store its HTML content."""
+def mark_posts_as_fetched_many(posts: list[tuple[int, str]], worker_id: str | None = None) -> list[int]:
+    """
+    Mark (post_id, html_content) posts as fetched and store their HTML in a single transaction.
+    Posts whose lease another worker has taken over are left to it; returns the ids of the posts
+    that were marked.
+    """
+    if not posts:
+        return []
     conn = get_db_connection()
     with _write_rlock:
         current_time = _get_current_time()
@@ -282,34 +535,34 @@ def mark_post_as_fetched(post_id: int, html_content: str) -> None:
         try:
             # Store the raw HTML, update post status, and increment counter in a single transaction
             cursor.execute("BEGIN TRANSACTION")
+            held = _held_posts(cursor, [post_id for post_id, _ in posts], worker_id)
+            posts = [(post_id, html_content) for post_id, html_content in posts if post_id in held]
             
             # Store the raw HTML
-            cursor.execute("""
+            cursor.executemany("""
                 INSERT INTO texts (post_id, raw_text)
                 VALUES (?, ?)
-            """, (post_id, html_content))
+            """, posts)
             
-            # Update the post's fetched timestamp
-            cursor.execute("""
+            # Update the posts' fetched timestamp
+            cursor.executemany(f"""
                 UPDATE posts 
                 SET fetched_at_utc = ?,
-                    fetch_at_utc = NULL
+                    fetch_at_utc = NULL,
+                    state = '{STATE_FETCHED}',
+                    claimed_by = NULL,
+                    lease_expires_utc = NULL
                 WHERE id = ?
-            """, (current_time, post_id))
-            
-            # Update content_fetched stat
-            cursor.execute("""
-                UPDATE post_stats 
-                SET stat_value = stat_value + 1,
-                    last_updated_utc = ?
-                WHERE stat_name = 'content_fetched'
-            """, (current_time,))
+            """, [(current_time, post_id) for post_id, _ in posts])
             
             cursor.execute("COMMIT")
             conn.commit()
         except sqlite3.Error as e:
-            logger.error(f"Failed to mark post {post_id} as fetched: {e}")
+            logger.error(f"Failed to mark posts {[post_id for post_id, _ in posts]} as fetched: {e}")
             raise
+    
+    _update_stat('content_fetched', len(posts))
+    return [post_id for post_id, _ in posts]
 
 def increment_retry_and_schedule(post_id: int, retry_time: int) -> int:
     """Increment retry count and schedule next retry in a single query."""
@@ -319,179 +572,707 @@ def increment_retry_and_schedule(post_id: int, retry_time: int) -> int:
         cursor.execute("""
             UPDATE posts 
             SET retry_count = retry_count + 1,
-                fetch_at_utc = ?
+                fetch_at_utc = ?,
+                claimed_by = NULL,
+                lease_expires_utc = NULL
             WHERE id = ?
             RETURNING retry_count
         """, (retry_time, post_id))
         conn.commit()
         return cursor.fetchone()[0]
 
-def delete_post(post_id: int) -> None:
-    """Delete a post and its associated text."""
+def delete_post(post_id: int, worker_id: str | None = None) -> bool:
+    """Delete a post and its associated text. Returns whether worker_id still held it."""
     conn = get_db_connection()
     with _write_rlock:
         cursor = conn.cursor()
         try:
             cursor.execute("BEGIN TRANSACTION")
             
-            cursor.execute("DELETE FROM texts WHERE post_id = ?", (post_id,))
-            cursor.execute("DELETE FROM posts WHERE id = ?", (post_id,))
+            deleted = bool(_held_posts(cursor, [post_id], worker_id))
+            if deleted:
+                cursor.execute("DELETE FROM texts WHERE post_id = ?", (post_id,))
+                cursor.execute("DELETE FROM posts WHERE id = ?", (post_id,))
             
             cursor.execute("COMMIT")
             conn.commit()
+            return deleted
         except sqlite3.Error as e:
             logger.error(f"Failed to delete post {post_id}: {e}")
             raise
 
-def get_posts_to_process(limit: int = 10) -> list[tuple[int, str]]:
-    """Get posts that have been fetched but not processed."""
+def claim_posts_to_process(
+    worker_id: str,
+    limit: int = 10,
+    lease_seconds: int = DEFAULT_LEASE_SECONDS
+) -> list[tuple[int, str, str]]:
+    """Claim up to limit posts that have been fetched but not processed, returning (id, url, raw_text)."""
+    conn = get_db_connection()
+    with _write_rlock:
+        current_time = _get_current_time()
+        cursor = conn.cursor()
+        cursor.execute(f"""
+            UPDATE posts 
+            SET claimed_by = ?,
+                lease_expires_utc = ?
+            WHERE id IN (
+                SELECT p.id 
+                FROM posts p
+                JOIN texts t ON p.id = t.post_id
+                WHERE p.state = '{STATE_FETCHED}' 
+                AND t.raw_text IS NOT NULL
+                AND {UNCLAIMED}
+                LIMIT ?
+            )
+            RETURNING id, url
+        """, (worker_id, current_time + lease_seconds, current_time, limit))
+        urls = dict(cursor.fetchall())
+        conn.commit()
+    if not urls:
+        return []
+    
+    placeholders = ",".join("?" for _ in urls)
+    cursor.execute(f"""
+        SELECT post_id, raw_text 
+        FROM texts 
+        WHERE post_id IN ({placeholders})
+        AND raw_text IS NOT NULL
+    """, list(urls))
+    return [(post_id, urls[post_id], raw_text) for post_id, raw_text in cursor.fetchall()]
+
+def mark_post_as_processed(post_id: int, processed_text: str, worker_id: str | None = None) -> bool:
+    """Mark a post as processed and store its processed text. Returns whether worker_id still held it."""
+    return bool(mark_posts_as_processed_many([(post_id, processed_text)], worker_id))
+
+def mark_posts_as_processed_many(posts: list[tuple[int, str]], worker_id: str | None = None) -> list[int]:
+    """
+    Mark (post_id, processed_text) posts as processed and store their text in a single transaction.
+    Posts whose lease another worker has taken over are left to it; returns the ids of the posts
+    that were marked.
+    """
+    if not posts:
+        return []
+    conn = get_db_connection()
+    with _write_rlock:
+        current_time = _get_current_time()
+        cursor = conn.cursor()
+        
+        try:
+            # Store the processed texts and update post status in a single transaction
+            cursor.execute("BEGIN TRANSACTION")
+            held = _held_posts(cursor, [post_id for post_id, _ in posts], worker_id)
+            posts = [(post_id, processed_text) for post_id, processed_text in posts if post_id in held]
+            
+            # Update the texts
+            cursor.executemany("""
+                UPDATE texts 
+                SET text = ?
+                WHERE post_id = ?
+            """, [(processed_text, post_id) for post_id, processed_text in posts])
+            
+            # Update the posts' processed timestamp
+            cursor.executemany(f"""
+                UPDATE posts 
+                SET processed_at_utc = ?,
+                    state = '{STATE_PROCESSED}',
+                    claimed_by = NULL,
+                    lease_expires_utc = NULL
+                WHERE id = ?
+            """, [(current_time, post_id) for post_id, _ in posts])
+            
+            cursor.execute("COMMIT")
+            conn.commit()
+        except sqlite3.Error as e:
+            logger.error(f"Database error while marking posts {[post_id for post_id, _ in posts]} as processed: {e}")
+            raise
+    
+    _update_stat('posts_processed', len(posts))
+    return [post_id for post_id, _ in posts]
+
+def get_posts_with_processed_duplicate(limit: int = 10) -> list[tuple[int, str]]:
+    """Get unfetched posts whose article was already processed for an earlier crosspost."""
     conn = get_db_connection()
     cursor = conn.cursor()
-    cursor.execute("""
-        SELECT p.id, t.raw_text 
+    cursor.execute(f"""
+        SELECT p.id, MIN(t.text)
         FROM posts p
-        JOIN texts t ON p.id = t.post_id
-        WHERE p.processed_at_utc IS NULL 
-        AND t.raw_text IS NOT NULL
+        JOIN posts s ON s.canonical_url = p.canonical_url AND s.id < p.id
+        JOIN texts t ON t.post_id = s.id
+        WHERE p.state = '{STATE_NEW}'
+        AND s.processed_at_utc IS NOT NULL
+        AND t.text IS NOT NULL
+        GROUP BY p.id
         LIMIT ?
     """, (limit,))
     return cursor.fetchall()
 
-def mark_post_as_processed(post_id: int, processed_text: str) -> None:
-    """Mark a post as processed and store its processed text."""
+def mark_post_as_duplicate(post_id: int, processed_text: str) -> None:
+    """Mark a crosspost as fetched and processed, reusing the text extracted for an earlier post."""
     conn = get_db_connection()
     with _write_rlock:
         current_time = _get_current_time()
         cursor = conn.cursor()
         
         try:
-            # Store the processed text and update post status in a single transaction
             cursor.execute("BEGIN TRANSACTION")
             
-            # Update the text
-            cursor.execute("""
-                UPDATE texts 
-                SET text = ?
-                WHERE post_id = ?
-            """, (processed_text, post_id))
-            
-            # Update the post's processed timestamp
-            cursor.execute("""
+            # Skip straight to the posting stage, unless another worker already has
+            cursor.execute(f"""
                 UPDATE posts 
-                SET processed_at_utc = ?
+                SET fetched_at_utc = ?,
+                    processed_at_utc = ?,
+                    fetch_at_utc = NULL,
+                    state = '{STATE_PROCESSED}'
                 WHERE id = ?
-            """, (current_time, post_id))
+                AND state = '{STATE_NEW}'
+            """, (current_time, current_time, post_id))
+            if cursor.rowcount == 0:
+                cursor.execute("COMMIT")
+                conn.commit()
+                return
+            
+            # Store the shared text, there is no raw HTML of our own
+            cursor.execute("""
+                INSERT INTO texts (post_id, text)
+                VALUES (?, ?)
+            """, (post_id, processed_text))
+            
+            cursor.execute("COMMIT")
+            conn.commit()
+        except sqlite3.Error as e:
+            logger.error(f"Failed to mark post {post_id} as duplicate: {e}")
+            raise
+    
+    _update_stat('posts_processed')
+    _update_stat('posts_deduplicated')
+
+def mark_extraction_failed(post_id: int, domain: str, reason: str, worker_id: str | None = None) -> bool:
+    """
+    Drop a post whose extraction failed, counting the failure reason against its domain.
+    A post another worker has taken over is left to it; returns whether it was dropped.
+    """
+    conn = get_db_connection()
+    with _write_rlock:
+        cursor = conn.cursor()
+        try:
+            cursor.execute("BEGIN TRANSACTION")
+            
+            if not _held_posts(cursor, [post_id], worker_id):
+                cursor.execute("COMMIT")
+                conn.commit()
+                return False
             
-            # Update stats
+            cursor.execute("DELETE FROM texts WHERE post_id = ?", (post_id,))
+            cursor.execute("DELETE FROM posts WHERE id = ?", (post_id,))
             cursor.execute("""
-                UPDATE post_stats 
-                SET stat_value = stat_value + 1,
-                    last_updated_utc = ?
-                WHERE stat_name = 'posts_processed'
-            """, (current_time,))
+                INSERT INTO extraction_failures (domain, reason, count, last_failed_utc)
+                VALUES (?, ?, 1, ?)
+                ON CONFLICT (domain, reason) DO UPDATE SET
+                    count = count + 1,
+                    last_failed_utc = excluded.last_failed_utc
+            """, (domain, reason, _get_current_time()))
             
             cursor.execute("COMMIT")
             conn.commit()
+            return True
         except sqlite3.Error as e:
-            logger.error(f"Database error while marking post {post_id} as processed: {e}")
+            logger.error(f"Failed to mark extraction of post {post_id} as failed: {e}")
             raise
 
-def get_posts_to_post(limit: int = 10) -> list[tuple[int, str, str, str]]:
-    """Get posts that have been processed but not posted yet."""
+def get_extraction_failures() -> list[tuple[str, str, int]]:
+    """Get (domain, reason, count) of failed extractions, most frequent first."""
     conn = get_db_connection()
     cursor = conn.cursor()
     cursor.execute("""
-        SELECT p.id, p.reddit_id, p.subreddit, t.text
+        SELECT domain, reason, count 
+        FROM extraction_failures 
+        ORDER BY count DESC
+    """)
+    return cursor.fetchall()
+
+def get_posts_to_chunk(limit: int = 50) -> list[tuple[int, str, str]]:
+    """Get (id, subreddit, text) of processed posts whose comment chunks have not been stored yet."""
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    cursor.execute(f"""
+        SELECT p.id, p.subreddit, t.text
         FROM posts p
         JOIN texts t ON p.id = t.post_id
-        WHERE p.processed_at_utc IS NOT NULL 
-        AND p.posted_at_utc IS NULL
+        WHERE p.state = '{STATE_PROCESSED}' 
         AND t.text IS NOT NULL
         LIMIT ?
     """, (limit,))
     return cursor.fetchall()
 
-def mark_post_as_posted(post_id: int) -> None:
-    """Mark a post as posted."""
+def store_chunks(post_id: int, chunks: list[str], worker_id: str | None = None) -> bool:
+    """
+    Store the comment bodies a post's text is posted as, in order. Processed posts are split
+    without claiming them, so by default only a post nobody holds is stored. Returns whether
+    the chunks were stored.
+    """
     conn = get_db_connection()
     with _write_rlock:
-        current_time = _get_current_time()
         cursor = conn.cursor()
-        
         try:
             cursor.execute("BEGIN TRANSACTION")
             
-            # Update the post's posted timestamp
-            cursor.execute("""
+            cursor.execute(f"""
                 UPDATE posts 
-                SET posted_at_utc = ?
+                SET state = '{STATE_CHUNKED}'
                 WHERE id = ?
-            """, (current_time, post_id))
+                AND state = '{STATE_PROCESSED}'
+                AND {HELD_BY}
+            """, (post_id, worker_id))
+            stored = cursor.rowcount > 0
             
-            # Update stats
-            cursor.execute("""
-                UPDATE post_stats 
-                SET stat_value = stat_value + 1,
-                    last_updated_utc = ?
-                WHERE stat_name = 'posts_posted'
-            """, (current_time,))
+            # Another processor thread may have split the post already, keep its comment ids
+            if stored:
+                cursor.executemany("""
+                    INSERT OR IGNORE INTO chunks (post_id, position, body)
+                    VALUES (?, ?, ?)
+                """, [(post_id, position, body) for position, body in enumerate(chunks)])
+            
+            cursor.execute("COMMIT")
+            conn.commit()
+            return stored
+        except sqlite3.Error as e:
+            logger.error(f"Failed to store chunks of post {post_id}: {e}")
+            raise
+
+def claim_posts_to_post(
+    worker_id: str,
+    limit: int = 10,
+    lease_seconds: int = DEFAULT_LEASE_SECONDS
+) -> list[tuple[int, str, str, list[tuple[str, str | None]]]]:
+    """
+    Claim up to limit processed posts that have not been posted yet, newest submission first.
+    Returns (id, reddit_id, subreddit, chunks), chunks holding each comment's (body, comment_id),
+    comment_id being None until it is posted.
+    """
+    conn = get_db_connection()
+    with _write_rlock:
+        current_time = _get_current_time()
+        cursor = conn.cursor()
+        cursor.execute(f"""
+            UPDATE posts 
+            SET claimed_by = ?,
+                lease_expires_utc = ?
+            WHERE id IN (
+                SELECT p.id
+                FROM posts p
+                WHERE p.state = '{STATE_CHUNKED}' 
+                AND {UNCLAIMED}
+                ORDER BY p.created_utc DESC
+                LIMIT ?
+            )
+            RETURNING id, reddit_id, subreddit, created_utc
+        """, (worker_id, current_time + lease_seconds, current_time, limit))
+        claimed = cursor.fetchall()
+        conn.commit()
+    # RETURNING does not keep the subquery's order
+    claimed.sort(key=lambda row: row[3], reverse=True)
+    posts = [(post_id, reddit_id, subreddit) for post_id, reddit_id, subreddit, _ in claimed]
+    if not posts:
+        return []
+    
+    placeholders = ",".join("?" for _ in posts)
+    cursor.execute(f"""
+        SELECT post_id, body, comment_id
+        FROM chunks
+        WHERE post_id IN ({placeholders})
+        ORDER BY post_id, position
+    """, [post_id for post_id, _, _ in posts])
+    chunks: dict[int, list[tuple[str, str | None]]] = {}
+    for post_id, body, comment_id in cursor.fetchall():
+        chunks.setdefault(post_id, []).append((body, comment_id))
+    return [(post_id, reddit_id, subreddit, chunks[post_id]) for post_id, reddit_id, subreddit in posts]
+
+def mark_chunk_as_posted(post_id: int, position: int, comment_id: str, worker_id: str | None = None) -> bool:
+    """
+    Record the id of the comment a chunk was posted as, so a retry continues after it.
+    Returns False, recording nothing, if another worker has taken the post over.
+    """
+    conn = get_db_connection()
+    with _write_rlock:
+        cursor = conn.cursor()
+        try:
+            cursor.execute(f"""
+                UPDATE chunks 
+                SET comment_id = ?
+                WHERE post_id = ? AND position = ?
+                AND EXISTS (
+                    SELECT 1 FROM posts
+                    WHERE id = ?
+                    AND {HELD_BY}
+                )
+            """, (comment_id, post_id, position, post_id, worker_id))
+            conn.commit()
+            return cursor.rowcount > 0
+        except sqlite3.Error as e:
+            logger.error(f"Failed to mark chunk {position} of post {post_id} as posted: {e}")
+            raise
+
+def mark_post_as_posted(post_id: int, worker_id: str | None = None) -> bool:
+    """
+    Mark a post as posted, adding the time it waited since it was processed to the queue wait stats.
+    Returns whether worker_id still held it.
+    """
+    return bool(mark_posts_as_posted_many([post_id], worker_id))
+
+def mark_posts_as_posted_many(post_ids: list[int], worker_id: str | None = None) -> list[int]:
+    """
+    Mark posts as posted in a single transaction, adding their time since processing to the queue wait stats.
+    Posts whose lease another worker has taken over are left to it; returns the ids of the posts
+    that were marked.
+    """
+    if not post_ids:
+        return []
+    conn = get_db_connection()
+    with _write_rlock:
+        current_time = _get_current_time()
+        cursor = conn.cursor()
+        placeholders = ",".join("?" for _ in post_ids)
+        
+        try:
+            cursor.execute("BEGIN TRANSACTION")
+            
+            # Update the posts' posted timestamp, returning how long they waited since they were processed
+            cursor.execute(f"""
+                UPDATE posts 
+                SET posted_at_utc = ?,
+                    state = '{STATE_POSTED}',
+                    claimed_by = NULL,
+                    lease_expires_utc = NULL
+                WHERE id IN ({placeholders})
+                AND {HELD_BY}
+                RETURNING id, ? - COALESCE(processed_at_utc, ?)
+            """, (current_time, *post_ids, worker_id, current_time, current_time))
+            marked = cursor.fetchall()
             
             cursor.execute("COMMIT")
             conn.commit()
         except sqlite3.Error as e:
-            logger.error(f"Failed to mark post {post_id} as posted: {e}")
+            logger.error(f"Failed to mark posts {post_ids} as posted: {e}")
             raise
+    
+    if marked:
+        _update_stat('posting_queue_wait_seconds', sum(queue_wait for _, queue_wait in marked))
+    _update_stat('posting_queue_waits', len(marked))
+    _update_stat('posts_posted', len(marked))
+    return [post_id for post_id, _ in marked]
+
+def record_rate_limit_wait(seconds: int) -> None:
+    """Add the time posting was held back by Reddit's rate limit to its stat."""
+    _update_stat('rate_limit_wait_seconds', seconds)
 
 def mark_post_as_skipped() -> None:
     """Increment the posts_skipped stat."""
+    _update_stat('posts_skipped')
+
+def record_http_cache_lookups(hits: int, misses: int) -> None:
+    """Add to the counters of downloads served from and missed by the response cache."""
+    _update_stat('http_cache_hits', hits)
+    _update_stat('http_cache_misses', misses)
+
+def record_connection_reuse(requests: int, reused: int) -> None:
+    """Add to the counters of article requests made and of those sent over an already open connection."""
+    _update_stat('http_requests', requests)
+    _update_stat('http_connections_reused', reused)
+
+def get_cached_extraction(cache_key: str) -> str | None:
+    """Get the Markdown previously extracted for a cache key, marking it as recently used."""
+    conn = get_db_connection()
     with _write_rlock:
         try:
-            _update_stat('posts_skipped')
+            cursor = conn.cursor()
+            cursor.execute("""
+                UPDATE extraction_cache 
+                SET last_used_utc = ?
+                WHERE cache_key = ?
+                RETURNING text
+            """, (_get_current_time(), cache_key))
+            row = cursor.fetchone()
+            conn.commit()
+            return row[0] if row else None
         except sqlite3.Error as e:
-            logger.error(f"Failed to increment posts_skipped stat: {e}")
+            logger.error(f"Failed to read extraction cache: {e}")
             raise
 
-def handle_fetch_retry(post_id: int, retry_time: int) -> bool:
-    """Handle a fetch retry for a post. Returns True if post was skipped, False otherwise."""
+def cache_extraction(cache_key: str, text: str, max_bytes: int) -> None:
+    """Store extracted Markdown, evicting the least recently used entries beyond max_bytes."""
     conn = get_db_connection()
     with _write_rlock:
         try:
             cursor = conn.cursor()
+            cursor.execute("BEGIN TRANSACTION")
+            cursor.execute("""
+                INSERT OR REPLACE INTO extraction_cache (cache_key, text, size, last_used_utc)
+                VALUES (?, ?, ?, ?)
+            """, (cache_key, text, len(text.encode('utf-8')), _get_current_time()))
             
-            # Get current retry count
+            # Keep the most recently used entries that fit in max_bytes
             cursor.execute("""
-                SELECT retry_count 
-                FROM posts 
+                DELETE FROM extraction_cache 
+                WHERE cache_key IN (
+                    SELECT cache_key FROM (
+                        SELECT cache_key,
+                               SUM(size) OVER (ORDER BY last_used_utc DESC, rowid DESC) AS used_bytes
+                        FROM extraction_cache
+                    )
+                    WHERE used_bytes > ?
+                )
+            """, (max_bytes,))
+            
+            cursor.execute("COMMIT")
+            conn.commit()
+        except sqlite3.Error as e:
+            logger.error(f"Failed to cache extraction: {e}")
+            raise
+
+def record_extraction_cache_lookups(hits: int, misses: int) -> None:
+    """Add to the counters of articles served from and missed by the extraction cache."""
+    _update_stat('extraction_cache_hits', hits)
+    _update_stat('extraction_cache_misses', misses)
+
+def record_site_profile_extraction(domain: str, hit: bool, elapsed_ms: int) -> None:
+    """Count an article from a profiled site, as a hit if the profile's selectors extracted it
+    (in elapsed_ms milliseconds) or as a fallback to readability otherwise."""
+    conn = get_db_connection()
+    with _write_rlock:
+        try:
+            conn.execute("""
+                INSERT INTO site_profile_stats (domain, hits, fallbacks, hit_ms, last_updated_utc)
+                VALUES (?, ?, ?, ?, ?)
+                ON CONFLICT (domain) DO UPDATE SET
+                    hits = hits + excluded.hits,
+                    fallbacks = fallbacks + excluded.fallbacks,
+                    hit_ms = hit_ms + excluded.hit_ms,
+                    last_updated_utc = excluded.last_updated_utc
+            """, (domain, int(hit), int(not hit), elapsed_ms if hit else 0, _get_current_time()))
+            conn.commit()
+        except sqlite3.Error as e:
+            logger.error(f"Failed to record site profile stats for {domain}: {e}")
+            raise
+
+def get_site_profile_stats() -> list[tuple[str, int, int, int]]:
+    """Get (domain, hits, fallbacks, hit_ms) for every site profile that has been used."""
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    cursor.execute("""
+        SELECT domain, hits, fallbacks, hit_ms 
+        FROM site_profile_stats 
+        ORDER BY hits + fallbacks DESC
+    """)
+    return cursor.fetchall()
+
+# The column holding when a post became ready for each stage
+STAGE_READY_COLUMNS = {
+    'fetch': 'fetch_at_utc',
+    'process': 'fetched_at_utc',
+    'post': 'processed_at_utc',
+}
+
+def record_stage_idle(stage: str, post_ids: list[int]) -> None:
+    """Add how long posts sat ready for a stage before it picked them up to the stage's idle stats."""
+    if not post_ids:
+        return
+    column = STAGE_READY_COLUMNS[stage]
+    conn = get_db_connection()
+    with _write_rlock:
+        current_time = _get_current_time()
+        placeholders = ",".join("?" for _ in post_ids)
+        try:
+            conn.execute(f"""
+                INSERT INTO stage_idle_stats (stage, posts, idle_seconds, max_idle_seconds, last_updated_utc)
+                SELECT ?, COUNT(*), SUM(MAX(? - {column}, 0)), MAX(MAX(? - {column}, 0)), ?
+                FROM posts
+                WHERE id IN ({placeholders})
+                AND {column} IS NOT NULL
+                HAVING COUNT(*) > 0
+                ON CONFLICT (stage) DO UPDATE SET
+                    posts = posts + excluded.posts,
+                    idle_seconds = idle_seconds + excluded.idle_seconds,
+                    max_idle_seconds = MAX(max_idle_seconds, excluded.max_idle_seconds),
+                    last_updated_utc = excluded.last_updated_utc
+            """, (stage, current_time, current_time, current_time, *post_ids))
+            conn.commit()
+        except sqlite3.Error as e:
+            logger.error(f"Failed to record idle time for stage {stage}: {e}")
+            raise
+
+def get_stage_idle_stats() -> list[tuple[str, int, int, int]]:
+    """Get (stage, posts, idle_seconds, max_idle_seconds) of every stage that picked up posts."""
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    cursor.execute("""
+        SELECT stage, posts, idle_seconds, max_idle_seconds 
+        FROM stage_idle_stats
+    """)
+    return cursor.fetchall()
+
+def handle_fetch_retry(post_id: int, retry_time: int, worker_id: str | None = None) -> bool:
+    """
+    Handle a fetch retry for a post. Returns True if post was skipped, False otherwise.
+    A post another worker has taken over is left untouched and not skipped.
+    """
+    conn = get_db_connection()
+    with _write_rlock:
+        try:
+            cursor = conn.cursor()
+            cursor.execute("BEGIN TRANSACTION")
+            
+            # Update retry count and schedule next retry
+            cursor.execute(f"""
+                UPDATE posts 
+                SET retry_count = retry_count + 1,
+                    fetch_at_utc = ?,
+                    claimed_by = NULL,
+                    lease_expires_utc = NULL
                 WHERE id = ?
-            """, (post_id,))
-            current_retry = cursor.fetchone()[0]
-            new_retry = current_retry + 1
+                AND {HELD_BY}
+                RETURNING retry_count
+            """, (retry_time, post_id, worker_id))
+            row = cursor.fetchone()
+            
+            if row is None:
+                cursor.execute("COMMIT")
+                conn.commit()
+                logger.warning(f"Not retrying post {post_id}, another worker took it over")
+                return False
             
-            # If max retries reached, delete the post and increment skipped stat
-            if new_retry > 3:
-                # Delete post and its texts
+            # If max retries reached, delete the post and its texts
+            if row[0] > MAX_FETCH_RETRIES:
                 cursor.execute("DELETE FROM texts WHERE post_id = ?", (post_id,))
                 cursor.execute("DELETE FROM posts WHERE id = ?", (post_id,))
-                
+                cursor.execute("COMMIT")
                 conn.commit()
                 return True
             
-            # Update retry count and schedule next retry
-            cursor.execute("""
-                UPDATE posts 
-                SET retry_count = ?,
-                    fetch_at_utc = ?
-                WHERE id = ?
-            """, (new_retry, retry_time, post_id))
-            
+            cursor.execute("COMMIT")
             conn.commit()
             
             # Log the retry time
             retry_time_str = time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(retry_time))
-            logger.info(f"Post {post_id} will be retried at {retry_time_str} (retry count: {new_retry})")
+            logger.info(f"Post {post_id} will be retried at {retry_time_str} (retry count: {row[0]})")
             
             return False
             
         except sqlite3.Error as e:
             logger.error(f"Failed to handle fetch retry for post {post_id}: {e}")
-            raise 
\ No newline at end of file
+            raise
+
+def defer_posts(post_ids: list[int], fetch_at: int, worker_id: str | None = None) -> list[int]:
+    """
+    Postpone fetching several posts without counting it as a retry. Posts another worker has
+    taken over keep its schedule; returns the ids of the posts that were deferred.
+    """
+    if not post_ids:
+        return []
+    conn = get_db_connection()
+    with _write_rlock:
+        try:
+            placeholders = ",".join("?" for _ in post_ids)
+            cursor = conn.execute(f"""
+                UPDATE posts 
+                SET fetch_at_utc = ?,
+                    claimed_by = NULL,
+                    lease_expires_utc = NULL
+                WHERE id IN ({placeholders})
+                AND {HELD_BY}
+                RETURNING id
+            """, (fetch_at, *post_ids, worker_id))
+            deferred = [row[0] for row in cursor.fetchall()]
+            conn.commit()
+            return deferred
+        except sqlite3.Error as e:
+            logger.error(f"Failed to defer posts {post_ids}: {e}")
+            raise
+
+def release_claims(post_ids: list[int], worker_id: str) -> None:
+    """
+    Give up worker_id's leases on posts it could not finish, so any worker can claim them right away.
+    Posts another worker has taken over keep its lease.
+    """
+    if not post_ids:
+        return
+    conn = get_db_connection()
+    with _write_rlock:
+        try:
+            placeholders = ",".join("?" for _ in post_ids)
+            conn.execute(f"""
+                UPDATE posts 
+                SET claimed_by = NULL,
+                    lease_expires_utc = NULL
+                WHERE id IN ({placeholders})
+                AND claimed_by = ?
+            """, (*post_ids, worker_id))
+            conn.commit()
+        except sqlite3.Error as e:
+            logger.error(f"Failed to release claims on posts {post_ids}: {e}")
+            raise
+
+def renew_claims(post_ids: list[int], worker_id: str, lease_seconds: int = DEFAULT_LEASE_SECONDS) -> list[int]:
+    """
+    Extend worker_id's leases on posts it is still working on to lease_seconds from now, for
+    batches that take longer than a lease. Returns the ids of the posts it still holds.
+    """
+    if not post_ids:
+        return []
+    conn = get_db_connection()
+    with _write_rlock:
+        try:
+            placeholders = ",".join("?" for _ in post_ids)
+            cursor = conn.execute(f"""
+                UPDATE posts 
+                SET lease_expires_utc = ?
+                WHERE id IN ({placeholders})
+                AND claimed_by = ?
+                RETURNING id
+            """, (_get_current_time() + lease_seconds, *post_ids, worker_id))
+            held = [row[0] for row in cursor.fetchall()]
+            conn.commit()
+            return held
+        except sqlite3.Error as e:
+            logger.error(f"Failed to renew claims on posts {post_ids}: {e}")
+            raise
+
+def get_cached_redirect(short_url: str, max_age: int) -> str | None:
+    """Get the final URL a short link resolved to, if it was resolved within max_age seconds."""
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    cursor.execute("""
+        SELECT final_url 
+        FROM url_redirects 
+        WHERE short_url = ?
+        AND resolved_at_utc >= ?
+    """, (short_url, _get_current_time() - max_age))
+    row = cursor.fetchone()
+    return row[0] if row else None
+
+def cache_redirect(short_url: str, final_url: str) -> None:
+    """Remember the final URL a short link resolved to."""
+    conn = get_db_connection()
+    with _write_rlock:
+        try:
+            conn.execute("""
+                INSERT OR REPLACE INTO url_redirects (short_url, final_url, resolved_at_utc)
+                VALUES (?, ?, ?)
+            """, (short_url, final_url, _get_current_time()))
+            conn.commit()
+        except sqlite3.Error as e:
+            logger.error(f"Failed to cache redirect for {short_url}: {e}")
+            raise
+
+def delete_expired_redirects(max_age: int) -> None:
+    """Forget short links resolved more than max_age seconds ago."""
+    conn = get_db_connection()
+    with _write_rlock:
+        try:
+            conn.execute("""
+                DELETE FROM url_redirects 
+                WHERE resolved_at_utc < ?
+            """, (_get_current_time() - max_age,))
+            conn.commit()
+        except sqlite3.Error as e:
+            logger.error(f"Failed to delete expired redirects: {e}")
+            raise
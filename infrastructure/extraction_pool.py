@@ -0,0 +1,227 @@
+import logging
+import math
+import multiprocessing
+import resource
+import signal
+import time
+from multiprocessing.pool import Pool
+from multiprocessing.queues import SimpleQueue
+from typing import Callable, NamedTuple, Optional
+from utils.newspaper_processor import ArticleExtraction, extract_article
+from utils.readability_worker import node_is_available, set_node_available
+from utils.site_profiles import SiteProfile
+
+logger = logging.getLogger(__name__)
+
+# Failures that would happen again on the same article, the others are worth another try
+ARTICLE_FAILURES = frozenset({"timeout", "cpu_budget", "memory_budget"})
+# How often extract_many checks on running tasks
+POLL_INTERVAL = 0.05
+
+
+class ExtractionResult(NamedTuple):
+    """Outcome of extracting a single article. text is None when nothing could be extracted,
+    the remaining fields are copied from ArticleExtraction."""
+    post_id: int
+    text: Optional[str] = None
+    error: Optional[Exception] = None
+    profile: Optional[str] = None
+    profile_hit: bool = False
+    elapsed: float = 0.0
+    input_chars: int = 0
+    slimmed_chars: int = 0
+    slim_elapsed: float = 0.0
+    failure_reason: Optional[str] = None
+
+    @property
+    def retryable(self) -> bool:
+        """Whether the extraction failed for reasons other than the article itself, so it may succeed later."""
+        return self.error is not None and self.failure_reason not in ARTICLE_FAILURES
+
+
+class ExtractionBudgetExceeded(Exception):
+    """An extraction used more CPU time or memory than its budget allows."""
+
+    def __init__(self, reason: str):
+        super().__init__(f"extraction exceeded its {reason.replace('_', ' ')}")
+        self.reason = reason
+
+
+class _CpuBudgetExpired(BaseException):
+    """Raised from the SIGPROF handler. Not an Exception so the extractor's own error handling lets it through."""
+
+
+def _raise_cpu_budget_expired(signum, frame):
+    raise _CpuBudgetExpired()
+
+
+# Where a worker reports the tasks it starts, so their timeout runs from then
+_started: Optional[SimpleQueue] = None
+
+
+def _init_worker(memory_budget_mb: int, node_available: bool, started: SimpleQueue) -> None:
+    """Limit the worker's address space and arm the CPU budget handler."""
+    global _started
+    _started = started
+    # `node -v` and npm install would not start under the limit, use what the parent found
+    set_node_available(node_available)
+    if memory_budget_mb:
+        # Only the soft limit, so it can be lifted again while the Node worker is started
+        _, hard = resource.getrlimit(resource.RLIMIT_AS)
+        resource.setrlimit(resource.RLIMIT_AS, (memory_budget_mb * 1024 * 1024, hard))
+    signal.signal(signal.SIGPROF, _raise_cpu_budget_expired)
+
+
+def _extract_with_budget(extract: Callable, cpu_budget: float, post_id: int, *args) -> ArticleExtraction:
+    """Run an extraction in a worker, stopping it once it used cpu_budget seconds of CPU time."""
+    if _started is not None:
+        _started.put(post_id)
+    try:
+        if cpu_budget:
+            signal.setitimer(signal.ITIMER_PROF, cpu_budget)
+        try:
+            return extract(*args)
+        finally:
+            signal.setitimer(signal.ITIMER_PROF, 0)
+    except _CpuBudgetExpired:
+        raise ExtractionBudgetExceeded("cpu_budget") from None
+    except MemoryError:
+        raise ExtractionBudgetExceeded("memory_budget") from None
+
+
+class ExtractionPool:
+    """
+    Run extract_article in worker processes.
+
+    Readability, BeautifulSoup and markdownify are pure Python, so extracting
+    on the bot's own interpreter holds the GIL and uses a single core while
+    slowing down every other thread. Workers get the raw HTML and send back
+    the Markdown; each worker is replaced after max_tasks_per_child articles
+    to contain leaks. An article that takes longer than task_timeout seconds,
+    counted from when a worker starts on it, fails, and the pool is torn down
+    and recreated so the stuck worker does not hold a slot; articles that were
+    still queued then fail as retryable. So does whatever is left once a batch
+    runs past its deadline, as a worker that died before reporting an article
+    would otherwise be waited for forever. Each extraction also gets cpu_budget
+    seconds of CPU time and each worker memory_budget_mb of address space; an
+    article going over either fails with the budget as its failure_reason. Node's
+    own CPU and memory are not counted, the Readability worker has its own
+    timeout. With workers=0 articles are extracted in-process, without
+    budgets. The extract function must be importable by the workers.
+    """
+
+    def __init__(
+        self,
+        workers: int = 4,
+        max_tasks_per_child: int = 50,
+        task_timeout: int = 60,
+        cpu_budget: float = 30,
+        memory_budget_mb: int = 1024,
+        profiles: tuple[SiteProfile, ...] = (),
+        extract: Callable[[str, str, Optional[str], tuple[SiteProfile, ...]], ArticleExtraction] = extract_article
+    ):
+        self.extract = extract
+        self.profiles = profiles
+        self.workers = workers
+        self.max_tasks_per_child = max_tasks_per_child
+        self.task_timeout = task_timeout
+        self.cpu_budget = cpu_budget
+        self.memory_budget_mb = memory_budget_mb
+        self._pool: Optional[Pool] = None
+        self._started: Optional[SimpleQueue] = None
+
+    def _get_pool(self) -> Pool:
+        if self._pool is None:
+            # Spawn rather than fork, forking a process with running threads and open sqlite connections is unsafe
+            context = multiprocessing.get_context("spawn")
+            self._started = context.SimpleQueue()
+            self._pool = context.Pool(
+                processes=self.workers,
+                initializer=_init_worker,
+                initargs=(self.memory_budget_mb, node_is_available(), self._started),
+                maxtasksperchild=self.max_tasks_per_child
+            )
+        return self._pool
+
+    def extract_many(self, posts: list[tuple[int, str]], signature: str) -> list[ExtractionResult]:
+        """Extract all (post_id, html) pairs and return the results in input order."""
+        if not posts:
+            return []
+        if not self.workers:
+            return [self._extract_in_process(post_id, html, signature) for post_id, html in posts]
+
+        pool = self._get_pool()
+        pending = {
+            post_id: pool.apply_async(
+                _extract_with_budget, (self.extract, self.cpu_budget, post_id, html, signature, None, self.profiles)
+            )
+            for post_id, html in posts
+        }
+        results: dict[int, ExtractionResult] = {}
+        started_at: dict[int, float] = {}
+        timed_out = 0
+        # A task whose worker died before reporting it never starts, times out or finishes, and the
+        # pool does not resubmit it: give the batch as long as its articles could take back to back
+        deadline = time.monotonic() + (math.ceil(len(posts) / self.workers) + 1) * self.task_timeout
+        overdue = False
+        # Once every worker is stuck on an article nothing else will start
+        while pending and timed_out < self.workers:
+            next(iter(pending.values())).wait(POLL_INTERVAL)
+            now = time.monotonic()
+            if now > deadline:
+                overdue = True
+                break
+            while not self._started.empty():
+                started_at.setdefault(self._started.get(), now)
+            for post_id, async_result in list(pending.items()):
+                if async_result.ready():
+                    results[post_id] = self._collect(post_id, async_result)
+                elif post_id in started_at and now - started_at[post_id] > self.task_timeout:
+                    timed_out += 1
+                    error = multiprocessing.TimeoutError(f"extraction took over {self.task_timeout} seconds")
+                    results[post_id] = ExtractionResult(post_id, error=error, failure_reason="timeout")
+                else:
+                    continue
+                del pending[post_id]
+
+        for post_id in pending:
+            error = multiprocessing.TimeoutError("extraction did not finish before the worker pool was restarted")
+            results[post_id] = ExtractionResult(post_id, error=error, failure_reason="not_started")
+        if timed_out:
+            logger.warning("Extraction timed out, restarting the worker pool")
+            self._terminate()
+        elif overdue:
+            logger.warning(f"Extractions {sorted(pending)} were lost by the worker pool, restarting it")
+            self._terminate()
+        return [results[post_id] for post_id, _ in posts]
+
+    def _collect(self, post_id: int, async_result) -> ExtractionResult:
+        """Turn a finished task into a result, failures included."""
+        try:
+            return self._to_result(post_id, async_result.get())
+        except ExtractionBudgetExceeded as e:
+            return ExtractionResult(post_id, error=e, failure_reason=e.reason)
+        except Exception as e:
+            return ExtractionResult(post_id, error=e, failure_reason="error")
+
+    def _extract_in_process(self, post_id: int, html: str, signature: str) -> ExtractionResult:
+        try:
+            return self._to_result(post_id, self.extract(html, signature, None, self.profiles))
+        except Exception as e:
+            return ExtractionResult(post_id, error=e, failure_reason="error")
+
+    def _to_result(self, post_id: int, extraction: ArticleExtraction) -> ExtractionResult:
+        return ExtractionResult(post_id, **extraction._asdict())
+
+    def _terminate(self) -> None:
+        if self._pool is not None:
+            self._pool.terminate()
+            self._pool.join()
+            self._pool = None
+            # A worker killed while reporting a task may have left the queue unusable
+            self._started.close()
+            self._started = None
+
+    def close(self) -> None:
+        """Stop the worker processes."""
+        self._terminate()
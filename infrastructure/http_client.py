@@ -0,0 +1,319 @@
+import asyncio
+import codecs
+import logging
+import re
+from collections import OrderedDict
+from contextlib import aclosing
+from typing import NamedTuple, Optional
+from urllib.parse import urlparse
+from curl_cffi import CurlInfo, CurlOpt
+from curl_cffi.requests import AsyncSession
+from infrastructure.response_cache import CachedResponse, ResponseCache
+from utils.backoff import CircuitBreaker
+from utils.url_utils import canonicalize_url
+
+logger = logging.getLogger(__name__)
+
+HTML_CONTENT_TYPES = ('text/html', 'application/xhtml+xml')
+# How much of the body to look at for a <meta charset> when the header has none
+CHARSET_SNIFF_BYTES = 2048
+CHARSET_HEADER_REGEX = re.compile(r'charset\s*=\s*["\']?([\w.:-]+)', re.I)
+META_CHARSET_REGEX = re.compile(rb'<meta[^>]+charset\s*=\s*["\']?([\w.:-]+)', re.I)
+
+
+class FetchResult(NamedTuple):
+    """Outcome of a single article download.
+    skip_reason is set when the response is not worth retrying (e.g. not HTML),
+    truncated when the body was cut at the byte cap, circuit_open when the
+    request was not attempted because the host keeps failing and from_cache
+    when the server answered 304 and the cached body was reused.
+    """
+    post_id: int
+    url: str
+    status_code: Optional[int] = None
+    text: Optional[str] = None
+    error: Optional[Exception] = None
+    skip_reason: Optional[str] = None
+    truncated: bool = False
+    circuit_open: bool = False
+    from_cache: bool = False
+
+
+class HostStats(NamedTuple):
+    """Connection reuse counters for a single host."""
+    requests: int = 0
+    reused: int = 0
+
+
+def get_host(url: str) -> str:
+    """Return the lowercase host of a URL without credentials or port."""
+    netloc = urlparse(url).netloc.lower()
+    if '@' in netloc:
+        netloc = netloc.split('@')[-1]
+    return netloc.split(':')[0]
+
+
+def is_host_failure(status_code: int) -> bool:
+    """Check if a status code means the server itself is in trouble rather than the article."""
+    return status_code >= 500 or status_code == 429
+
+
+def is_html_content_type(content_type: str) -> bool:
+    """Check if a Content-Type header describes an HTML page. A missing header counts as HTML."""
+    media_type = content_type.split(';')[0].strip().lower()
+    return not media_type or media_type in HTML_CONTENT_TYPES
+
+
+def get_charset(content_type: str, prefix: bytes = b'') -> str:
+    """
+    Pick the charset to decode a page with: the Content-Type header first,
+    then a <meta charset> in the first bytes of the body, then UTF-8.
+    """
+    match = CHARSET_HEADER_REGEX.search(content_type)
+    candidates = [match.group(1)] if match else []
+    meta_match = META_CHARSET_REGEX.search(prefix)
+    if meta_match:
+        candidates.append(meta_match.group(1).decode('ascii', errors='ignore'))
+    for candidate in candidates:
+        try:
+            return codecs.lookup(candidate).name
+        except LookupError:
+            continue
+    return 'utf-8'
+
+
+class HostSessionPool:
+    """
+    Long-lived AsyncSessions keyed by host.
+
+    Each session keeps its own curl connection cache, so repeated downloads
+    from the same newspaper reuse TCP/TLS connections (and HTTP/2 when the
+    server offers it) and resolved addresses instead of paying a fresh
+    handshake and DNS lookup every time. Must be used from a single event loop.
+    """
+
+    def __init__(
+        self,
+        max_per_host: int = 2,
+        max_sessions: int = 32,
+        dns_cache_ttl: int = 300,
+        impersonate: str = "chrome"
+    ):
+        self.max_per_host = max_per_host
+        self.max_sessions = max_sessions
+        self.dns_cache_ttl = dns_cache_ttl
+        self.impersonate = impersonate
+        self._sessions: OrderedDict[str, AsyncSession] = OrderedDict()
+        self._stats: dict[str, HostStats] = {}
+
+    def get(self, host: str) -> AsyncSession:
+        """Return the session for a host, creating it on first use."""
+        session = self._sessions.get(host)
+        if session is None:
+            session = AsyncSession(
+                max_clients=self.max_per_host,
+                impersonate=self.impersonate,
+                http_version="v2tls",
+                curl_options={
+                    CurlOpt.DNS_CACHE_TIMEOUT: self.dns_cache_ttl,
+                    CurlOpt.TCP_KEEPALIVE: 1,
+                    CurlOpt.MAXCONNECTS: self.max_per_host,
+                },
+                curl_infos=[CurlInfo.NUM_CONNECTS],
+            )
+            self._sessions[host] = session
+        else:
+            self._sessions.move_to_end(host)
+        return session
+
+    def record(self, host: str, response) -> None:
+        """Count a completed request, noting whether it rode on an existing connection."""
+        reused = response.infos.get(CurlInfo.NUM_CONNECTS, 1) == 0
+        stats = self._stats.get(host, HostStats())
+        self._stats[host] = HostStats(stats.requests + 1, stats.reused + int(reused))
+
+    def stats(self) -> dict[str, HostStats]:
+        """Return per-host reuse counters since the pool was created."""
+        return dict(self._stats)
+
+    async def trim(self) -> None:
+        """Close the least recently used sessions beyond max_sessions."""
+        while len(self._sessions) > self.max_sessions:
+            _, session = self._sessions.popitem(last=False)
+            await session.close()
+
+    async def close(self) -> None:
+        """Close every pooled session."""
+        while self._sessions:
+            _, session = self._sessions.popitem()
+            await session.close()
+
+
+class ArticleFetcher:
+    """
+    Download many articles concurrently on a private event loop.
+
+    A global semaphore bounds the number of requests in flight and a
+    per-host semaphore keeps us from hammering a single newspaper.
+    Sessions live for the lifetime of the fetcher so connections are reused
+    across cycles. Bodies are streamed: non-HTML responses are dropped as soon
+    as the headers arrive and HTML is cut off at max_body_bytes. Hosts whose
+    circuit breaker is open are not contacted at all. With a response cache,
+    articles seen before are revalidated with a conditional request and the
+    cached body is reused when they have not changed.
+    """
+
+    def __init__(
+        self,
+        max_concurrency: int = 10,
+        max_per_host: int = 2,
+        timeout: int = 10,
+        max_sessions: int = 32,
+        dns_cache_ttl: int = 300,
+        max_body_bytes: int = 2 * 1024 * 1024,
+        breaker: Optional[CircuitBreaker] = None,
+        cache: Optional[ResponseCache] = None,
+        impersonate: str = "chrome"
+    ):
+        self.max_concurrency = max_concurrency
+        self.max_per_host = max_per_host
+        self.timeout = timeout
+        self.max_body_bytes = max_body_bytes
+        self.breaker = breaker or CircuitBreaker()
+        self.cache = cache
+        self.sessions = HostSessionPool(
+            max_per_host=max_per_host,
+            max_sessions=max_sessions,
+            dns_cache_ttl=dns_cache_ttl,
+            impersonate=impersonate
+        )
+        self._loop = asyncio.new_event_loop()
+        self._global_limit: Optional[asyncio.Semaphore] = None
+        self._host_limits: dict[str, asyncio.Semaphore] = {}
+
+    def fetch_many(self, posts: list[tuple[int, str]]) -> list[FetchResult]:
+        """Fetch all (post_id, url) pairs concurrently and return results in input order."""
+        if not posts:
+            return []
+        return self._loop.run_until_complete(self._fetch_all(posts))
+
+    def connection_stats(self) -> dict[str, HostStats]:
+        """Return per-host connection reuse counters."""
+        return self.sessions.stats()
+
+    def connection_totals(self) -> HostStats:
+        """Return the connection reuse counters summed over every host."""
+        stats = self.sessions.stats().values()
+        return HostStats(sum(host.requests for host in stats), sum(host.reused for host in stats))
+
+    def close(self) -> None:
+        """Close the pooled sessions and the event loop."""
+        if self._loop.is_closed():
+            return
+        self._loop.run_until_complete(self.sessions.close())
+        self._loop.close()
+
+    async def _fetch_all(self, posts: list[tuple[int, str]]) -> list[FetchResult]:
+        if self._global_limit is None:
+            # Semaphores must be created inside the running loop
+            self._global_limit = asyncio.Semaphore(self.max_concurrency)
+        await self.sessions.trim()
+        return await asyncio.gather(*(self._fetch(post_id, url) for post_id, url in posts))
+
+    def _get_host_limit(self, host: str) -> asyncio.Semaphore:
+        if host not in self._host_limits:
+            self._host_limits[host] = asyncio.Semaphore(self.max_per_host)
+        return self._host_limits[host]
+
+    async def _fetch(self, post_id: int, url: str) -> FetchResult:
+        host = get_host(url)
+        try:
+            async with self._get_host_limit(host), self._global_limit:
+                # Another request may have tripped the breaker while we waited for a slot
+                if not self.breaker.allow(host):
+                    return FetchResult(post_id, url, circuit_open=True)
+
+                cache_key = canonicalize_url(url)
+                # The cache reads and writes files, keep that off the event loop
+                cached = await asyncio.to_thread(self.cache.get, cache_key) if self.cache is not None else None
+                headers = {}
+                if cached and cached.etag:
+                    headers['If-None-Match'] = cached.etag
+                if cached and cached.last_modified:
+                    headers['If-Modified-Since'] = cached.last_modified
+
+                response = await self.sessions.get(host).get(
+                    url, headers=headers, timeout=self.timeout, stream=True
+                )
+                try:
+                    if is_host_failure(response.status_code):
+                        self.breaker.record_failure(host)
+                    else:
+                        self.breaker.record_success(host)
+
+                    if response.status_code == 304 and cached:
+                        return FetchResult(post_id, url, status_code=200, text=cached.text, from_cache=True)
+
+                    if response.status_code != 200:
+                        return FetchResult(post_id, url, status_code=response.status_code)
+
+                    content_type = response.headers.get('content-type') or ''
+                    if not is_html_content_type(content_type):
+                        return FetchResult(
+                            post_id, url, status_code=200, skip_reason=f"unsupported content type {content_type}"
+                        )
+
+                    text, truncated = await self._read_body(response, content_type)
+                    # A cut-off body would be served as complete on every later 304
+                    if self.cache is not None and not truncated:
+                        await asyncio.to_thread(self.cache.put, cache_key, CachedResponse(
+                            url=url,
+                            text=text,
+                            etag=response.headers.get('etag'),
+                            last_modified=response.headers.get('last-modified')
+                        ))
+                    return FetchResult(post_id, url, status_code=200, text=text, truncated=truncated)
+                finally:
+                    # Stop the transfer if we did not consume the whole body
+                    response.quit_now.set()
+                    await response.aclose()
+                    self.sessions.record(host, response)
+        except Exception as e:
+            # Timeouts and connection errors count against the host
+            self.breaker.record_failure(host)
+            return FetchResult(post_id, url, error=e)
+
+    async def _read_body(self, response, content_type: str) -> tuple[str, bool]:
+        """
+        Decode a streamed body incrementally, stopping at max_body_bytes.
+        Returns the text and whether it was truncated.
+        """
+        decoder = None
+        prefix = b''
+        pieces = []
+        received = 0
+        truncated = False
+        async with aclosing(response.aiter_content()) as chunks:
+            async for chunk in chunks:
+                if received + len(chunk) > self.max_body_bytes:
+                    chunk = chunk[:self.max_body_bytes - received]
+                    truncated = True
+                received += len(chunk)
+
+                if decoder is None:
+                    # Hold back the first bytes until we know which charset to use
+                    prefix += chunk
+                    if len(prefix) < CHARSET_SNIFF_BYTES and not truncated:
+                        continue
+                    decoder = codecs.getincrementaldecoder(get_charset(content_type, prefix))(errors='replace')
+                    chunk, prefix = prefix, b''
+
+                pieces.append(decoder.decode(chunk))
+                if truncated:
+                    break
+
+        if decoder is None:
+            decoder = codecs.getincrementaldecoder(get_charset(content_type, prefix))(errors='replace')
+            pieces.append(decoder.decode(prefix))
+        pieces.append(decoder.decode(b'', final=True))
+        return ''.join(pieces), truncated
@@ -0,0 +1,123 @@
+import hashlib
+import json
+import logging
+import os
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import NamedTuple, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class CachedResponse(NamedTuple):
+    """A previously downloaded article and the validators to revalidate it with."""
+    url: str
+    text: str
+    etag: Optional[str] = None
+    last_modified: Optional[str] = None
+
+
+class ResponseCache:
+    """
+    On-disk cache of article downloads keyed by canonical URL.
+
+    Only responses carrying an ETag or Last-Modified header are stored, so
+    every entry can be revalidated with a conditional request and reused
+    when the newspaper answers 304. Each entry is a small JSON file; once
+    the directory grows past max_bytes the least recently used entries are
+    deleted. Thread-safe, fetcher threads share one cache over a directory;
+    two caches must not use the same directory, each keeps its own index.
+    """
+
+    def __init__(self, directory: str | Path, max_bytes: int = 256 * 1024 * 1024):
+        self.directory = Path(directory)
+        self.max_bytes = max_bytes
+        self.directory.mkdir(parents=True, exist_ok=True)
+        # Entry file name -> size in bytes, least recently used first
+        self._entries: OrderedDict[str, int] = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+        self._load_index()
+
+    def _load_index(self) -> None:
+        """Rebuild the LRU order from the entries' modification times."""
+        files = []
+        for path in self.directory.glob('*.json'):
+            try:
+                stat = path.stat()
+            except OSError:
+                continue
+            files.append((stat.st_mtime, path.name, stat.st_size))
+        for _, name, size in sorted(files):
+            self._entries[name] = size
+            self._size += size
+
+    def _name(self, key: str) -> str:
+        return hashlib.sha256(key.encode('utf-8')).hexdigest() + '.json'
+
+    def get(self, key: str) -> Optional[CachedResponse]:
+        """Return the cached response for a key, marking it as recently used."""
+        with self._lock:
+            return self._get(key)
+
+    def _get(self, key: str) -> Optional[CachedResponse]:
+        name = self._name(key)
+        if name not in self._entries:
+            return None
+        path = self.directory / name
+        try:
+            with open(path, encoding='utf-8') as f:
+                entry = CachedResponse(**json.load(f))
+            os.utime(path)
+        except (OSError, ValueError, TypeError) as e:
+            logger.warning(f"Dropping unreadable cache entry for {key}: {e}")
+            self._remove(name)
+            return None
+        self._entries.move_to_end(name)
+        return entry
+
+    def put(self, key: str, entry: CachedResponse) -> None:
+        """Store a response if it can be revalidated later, evicting old entries as needed."""
+        with self._lock:
+            self._put(key, entry)
+
+    def _put(self, key: str, entry: CachedResponse) -> None:
+        if entry.etag is None and entry.last_modified is None:
+            return
+        name = self._name(key)
+        data = json.dumps(entry._asdict()).encode('utf-8')
+        if len(data) > self.max_bytes:
+            return
+
+        path = self.directory / name
+        tmp_path = path.with_suffix('.tmp')
+        try:
+            tmp_path.write_bytes(data)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            logger.warning(f"Failed to cache response for {key}: {e}")
+            return
+
+        self._size -= self._entries.pop(name, 0)
+        self._entries[name] = len(data)
+        self._size += len(data)
+        self._evict()
+
+    def size(self) -> int:
+        """Return the total size of the cached entries in bytes."""
+        return self._size
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _evict(self) -> None:
+        while self._size > self.max_bytes and self._entries:
+            self._remove(next(iter(self._entries)))
+
+    def _remove(self, name: str) -> None:
+        self._size -= self._entries.pop(name, 0)
+        try:
+            (self.directory / name).unlink()
+        except FileNotFoundError:
+            pass
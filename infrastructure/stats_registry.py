@@ -0,0 +1,77 @@
+import threading
+from typing import NamedTuple
+
+
+class PendingStats(NamedTuple):
+    """Stat changes not written to the database yet."""
+    increments: dict[str, int]
+    # Lowest and highest values seen, for stats that keep an extreme rather than a count
+    minimums: dict[str, int]
+    maximums: dict[str, int]
+
+
+class StatsRegistry:
+    """
+    Counters the pipeline updates in memory, to be flushed to post_stats now and then.
+
+    Updating a stat only takes a lock around a dict update, instead of a database write
+    under the global write lock. take() hands the pending changes to whoever flushes them
+    and starts over; if writing them fails they are put back with restore(), so nothing is
+    counted twice or lost while the process is running.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._pending = PendingStats({}, {}, {})
+
+    def increment(self, name: str, value: int = 1) -> None:
+        """Add value to a counter."""
+        if not value:
+            return
+        with self._lock:
+            increments = self._pending.increments
+            increments[name] = increments.get(name, 0) + value
+
+    def record_min(self, name: str, value: int) -> None:
+        """Lower a stat to value, if it is lower than what the stat holds."""
+        with self._lock:
+            minimums = self._pending.minimums
+            minimums[name] = min(minimums.get(name, value), value)
+
+    def record_max(self, name: str, value: int) -> None:
+        """Raise a stat to value, if it is higher than what the stat holds."""
+        with self._lock:
+            maximums = self._pending.maximums
+            maximums[name] = max(maximums.get(name, value), value)
+
+    def peek(self) -> PendingStats:
+        """A copy of the pending changes, leaving them pending."""
+        with self._lock:
+            return PendingStats(*(dict(values) for values in self._pending))
+
+    def take(self) -> PendingStats:
+        """Return the pending changes and start collecting new ones."""
+        with self._lock:
+            pending, self._pending = self._pending, PendingStats({}, {}, {})
+            return pending
+
+    def restore(self, pending: PendingStats) -> None:
+        """Put back changes take() returned that could not be written, merging them with newer ones."""
+        for name, value in pending.increments.items():
+            self.increment(name, value)
+        for name, value in pending.minimums.items():
+            self.record_min(name, value)
+        for name, value in pending.maximums.items():
+            self.record_max(name, value)
+
+    @staticmethod
+    def apply(stats: dict[str, int], pending: PendingStats) -> dict[str, int]:
+        """Stats as they will be once pending is written; minimums and maximums replace a stat of 0."""
+        live = dict(stats)
+        for name, value in pending.increments.items():
+            live[name] = live.get(name, 0) + value
+        for name, value in pending.minimums.items():
+            live[name] = value if not live.get(name) else min(live[name], value)
+        for name, value in pending.maximums.items():
+            live[name] = value if not live.get(name) else max(live[name], value)
+        return live
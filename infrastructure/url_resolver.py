@@ -0,0 +1,63 @@
+import logging
+import time
+from typing import Iterable
+from curl_cffi import requests
+from infrastructure.database import cache_redirect, delete_expired_redirects, get_cached_redirect
+from infrastructure.http_client import get_host
+
+logger = logging.getLogger(__name__)
+
+
+class UrlResolver:
+    """
+    Expand links from known URL shorteners to the article they point to.
+
+    Resolution only follows redirects (a HEAD request, falling back to a GET
+    whose body is never read), and results are cached in the database for
+    `ttl` seconds so the same short link is only expanded once.
+    """
+
+    def __init__(self, shorteners: Iterable[str], ttl: int = 7 * 24 * 60 * 60, timeout: int = 10):
+        self.shorteners = {shortener.lower() for shortener in shorteners}
+        self.ttl = ttl
+        self.timeout = timeout
+        self._last_purge = 0.0
+
+    def is_shortened(self, url: str) -> bool:
+        """Check if a URL points at one of the configured shorteners."""
+        host = get_host(url)
+        return host in self.shorteners or host.removeprefix('www.') in self.shorteners
+
+    def resolve(self, url: str) -> str:
+        """Return the final URL for a short link, or the URL itself if it is not one or can't be resolved."""
+        if not self.is_shortened(url):
+            return url
+
+        cached = get_cached_redirect(url, self.ttl)
+        if cached:
+            return cached
+
+        try:
+            final_url = self._follow_redirects(url)
+        except Exception as e:
+            logger.warning(f"Failed to resolve {url}: {e}")
+            return url
+
+        cache_redirect(url, final_url)
+        self._purge_expired()
+        return final_url
+
+    def _follow_redirects(self, url: str) -> str:
+        response = requests.head(url, impersonate="chrome", timeout=self.timeout, allow_redirects=True)
+        if response.status_code in (403, 405, 501):
+            # Some shorteners refuse HEAD, stop reading as soon as the headers arrive
+            response = requests.get(url, impersonate="chrome", timeout=self.timeout, allow_redirects=True, stream=True)
+            response.close()
+        return response.url
+
+    def _purge_expired(self) -> None:
+        """Drop expired cache entries at most once an hour."""
+        if time.time() - self._last_purge < 3600:
+            return
+        delete_expired_redirects(self.ttl)
+        self._last_purge = time.time()
@@ -1,5 +1,5 @@
 import time
-from typing import Dict
+from typing import Any, Dict, List
 from fastapi import FastAPI, Request, HTTPException
 from fastapi.responses import HTMLResponse, RedirectResponse
 from fastapi.templating import Jinja2Templates
@@ -8,20 +8,31 @@ import threading
 from pathlib import Path
 import logging
 
-from infrastructure.database import get_db_connection
+from infrastructure.database import (
+    STATE_CHUNKED,
+    STATE_FETCHED,
+    STATE_NEW,
+    STATE_PROCESSED,
+    get_db_connection,
+    get_extraction_failures,
+    get_site_profile_stats,
+    get_stats,
+    get_stage_idle_stats
+)
 from infrastructure.config import get_monitored_subreddits, get_distinguished_subreddits
+from threads.base_thread import BaseThread
 
 app = FastAPI(title="Bot Stats Dashboard")
 templates = Jinja2Templates(directory="templates")
 
 # Cache for stats
-stats_cache: Dict[str, int] = {}
+stats_cache: Dict[str, Any] = {}
 last_cache_update = 0
 CACHE_TTL = 60  # 1 minute
 
 logger = logging.getLogger(__name__)
 
-def get_stats_from_db() -> Dict[str, int]:
+def get_stats_from_db() -> Dict[str, Any]:
     """Get current stats from the database."""
     db_path = Path("data/bot.db")
     if not db_path.exists():
@@ -30,48 +41,79 @@ def get_stats_from_db() -> Dict[str, int]:
     conn = get_db_connection()
     cursor = conn.cursor()
     
-    # Get basic stats
-    cursor.execute("SELECT stat_name, stat_value FROM post_stats")
-    stats = dict(cursor.fetchall())
+    # Get basic stats, live from memory where they were not flushed yet
+    stats = get_stats()
     
-    # Get remaining posts to fetch
-    cursor.execute("""
-        SELECT COUNT(*) 
-        FROM posts 
-        WHERE fetched_at_utc IS NULL
-    """)
-    stats['remaining_to_fetch'] = cursor.fetchone()[0]
-    
-    # Calculate remaining posts to process
-    cursor.execute("""
-        SELECT COUNT(*) 
-        FROM posts 
-        WHERE fetched_at_utc IS NOT NULL 
-        AND processed_at_utc IS NULL
-    """)
-    stats['remaining_to_process'] = cursor.fetchone()[0]
-    
-    # Calculate remaining posts to post
-    cursor.execute("""
-        SELECT COUNT(*) 
-        FROM posts 
-        WHERE processed_at_utc IS NOT NULL 
-        AND posted_at_utc IS NULL
-    """)
-    stats['remaining_to_post'] = cursor.fetchone()[0]
+    # Count the posts in each state, read off the state index
+    cursor.execute("SELECT state, COUNT(*) FROM posts GROUP BY state")
+    states = dict(cursor.fetchall())
+    stats['remaining_to_fetch'] = states.get(STATE_NEW, 0)
+    stats['remaining_to_process'] = states.get(STATE_FETCHED, 0)
+    stats['remaining_to_post'] = states.get(STATE_PROCESSED, 0) + states.get(STATE_CHUNKED, 0)
     
     # Calculate skipped posts (posts that were fetched but not processed)
-    cursor.execute("""
+    cursor.execute(f"""
         SELECT COUNT(*) 
         FROM posts 
-        WHERE fetched_at_utc IS NOT NULL 
-        AND processed_at_utc IS NULL 
+        WHERE state = '{STATE_FETCHED}' 
         AND retry_count >= 3
     """)
     stats['remaining_skipped'] = cursor.fetchone()[0]
     
+    # Average seconds between a post being processed and its comment going out
+    queue_waits = stats.get('posting_queue_waits', 0)
+    stats['avg_posting_queue_wait'] = round(stats.get('posting_queue_wait_seconds', 0) / queue_waits) if queue_waits else 0
+    
+    # Share of article requests that went out over an already open connection
+    requests = stats.get('http_requests', 0)
+    stats['connection_reuse_percent'] = round(100 * stats.get('http_connections_reused', 0) / requests) if requests else 0
+    
+    # How long posts sat ready for each stage before it picked them up
+    stats['stage_idle'] = [
+        {
+            'stage': stage,
+            'posts': posts,
+            'avg_seconds': round(idle_seconds / posts) if posts else 0,
+            'max_seconds': max_idle_seconds
+        }
+        for stage, posts, idle_seconds, max_idle_seconds in get_stage_idle_stats()
+    ]
+    
+    # Hit rate and average extraction time of each site profile
+    stats['site_profiles'] = [
+        {
+            'domain': domain,
+            'hits': hits,
+            'total': hits + fallbacks,
+            'hit_rate': round(100 * hits / (hits + fallbacks)) if hits + fallbacks else 0,
+            'avg_ms': round(hit_ms / hits) if hits else 0
+        }
+        for domain, hits, fallbacks, hit_ms in get_site_profile_stats()
+    ]
+    
+    # Extractions abandoned for running over a budget or failing, per domain
+    stats['extraction_failures'] = [
+        {'domain': domain, 'reason': reason.replace('_', ' '), 'count': count}
+        for domain, reason, count in get_extraction_failures()
+    ]
+    
     return stats
 
+def get_thread_intervals() -> List[Dict[str, Any]]:
+    """Get how long each worker thread currently waits between cycles, read off the running threads."""
+    workers = sorted(
+        (thread for thread in threading.enumerate() if isinstance(thread, BaseThread)),
+        key=lambda thread: thread.name
+    )
+    return [
+        {
+            'name': thread.name,
+            'current_seconds': thread.current_interval,
+            'max_seconds': thread.max_interval
+        }
+        for thread in workers
+    ]
+
 def update_cache():
     """Update the stats cache periodically."""
     global stats_cache, last_cache_update
@@ -127,7 +169,9 @@ async def stats_page(request: Request):
                 "stats": display_stats,
                 "last_update": time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(last_cache_update)),
                 "monitored_subreddits": monitored_subreddits,
-                "distinguished_subreddits": distinguished_subreddits
+                "distinguished_subreddits": distinguished_subreddits,
+                # Live rather than cached, the intervals change from one cycle to the next
+                "thread_intervals": get_thread_intervals()
             }
         )
     except Exception as e:
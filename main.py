@@ -1,3 +1,4 @@
+import atexit
 import logging
 import signal
 import sys
@@ -5,15 +6,16 @@ import threading
 import os
 from logging.handlers import TimedRotatingFileHandler
 
-from infrastructure.config import load_config, get_monitored_subreddits, get_distinguished_subreddits
-from infrastructure.database import init_db
+from infrastructure.config import load_config, get_monitored_subreddits, get_distinguished_subreddits, get_url_shorteners
+from infrastructure.database import flush_stats, init_db
 from infrastructure.reddit import get_reddit_client, get_banned_domains
 from infrastructure.webserver import start_webserver
 from threads.reddit_fetch import RedditFetchThread
-from threads.reddit_post import RedditPostThread
+from threads.reddit_post import RedditPostThread, create_rate_limit_scheduler
 from threads.newspaper_processor import NewspaperProcessorThread
-from threads.newspaper_fetcher import NewspaperFetcherThread
+from threads.newspaper_fetcher import NewspaperFetcherThread, create_circuit_breaker, create_response_cache
 from threads.cleanup_thread import CleanupThread
+from threads.stats_flush_thread import StatsFlushThread
 
 # ANSI color codes
 class Colors:
@@ -36,6 +38,7 @@ class CustomFormatter(logging.Formatter):
             'NewspaperProcessorThread': Colors.CYAN,
             'RedditPostThread': Colors.GREEN,
             'CleanupThread': Colors.YELLOW,
+            'StatsFlushThread': Colors.YELLOW,
             'main': Colors.WHITE,
         }
         self.level_colors = {
@@ -115,6 +118,8 @@ def main():
         # Initialize database
         init_db()  # This will create the database and tables if they don't exist
         logger.info("Database initialized successfully!")
+        # Stats are counted in memory, write what the flush thread has not yet on the way out
+        atexit.register(flush_stats)
         
         # Set up signal handler for graceful shutdown
         signal.signal(signal.SIGINT, signal_handler)
@@ -128,33 +133,59 @@ def main():
         webserver_thread.start()
         logger.info("Stats webserver started at http://127.0.0.1:8000")
         
-        # Start threads
+        # Start threads, the claimed stages can run several threads side by side
         logger.info("Starting worker threads...")
+        fetcher_count = config.get('newspaper_fetcher', {}).get('threads', 1)
+        processor_count = config.get('newspaper_processor', {}).get('threads', 1)
+        poster_count = config['reddit'].get('post_threads', 1)
         fetch_thread = RedditFetchThread(
             reddit_client=reddit,
             logger=get_thread_logger('RedditFetchThread'),
             subreddits=monitored,
-            banned_domains=get_banned_domains()
-        )
-        newspaper_fetcher_thread = NewspaperFetcherThread(
-            logger=get_thread_logger('NewspaperFetcherThread')
-        )
-        processor_thread = NewspaperProcessorThread(
-            logger=get_thread_logger('NewspaperProcessorThread')
-        )
-        post_thread = RedditPostThread(
-            reddit=reddit,
-            logger=get_thread_logger('RedditPostThread')
+            banned_domains=get_banned_domains(),
+            url_shorteners=get_url_shorteners()
         )
+        # Threads of a stage share its logger, adding the handlers twice would print every line twice
+        newspaper_fetcher_logger = get_thread_logger('NewspaperFetcherThread')
+        # One response cache over the cache directory and one view of failing hosts for all fetchers
+        breaker = create_circuit_breaker(config.get('newspaper_fetcher', {}))
+        response_cache = create_response_cache(config.get('newspaper_fetcher', {}))
+        newspaper_fetcher_threads = [
+            NewspaperFetcherThread(logger=newspaper_fetcher_logger, breaker=breaker, cache=response_cache)
+            for _ in range(fetcher_count)
+        ]
+        processor_logger = get_thread_logger('NewspaperProcessorThread')
+        processor_threads = [
+            NewspaperProcessorThread(logger=processor_logger)
+            for _ in range(processor_count)
+        ]
+        post_logger = get_thread_logger('RedditPostThread')
+        # The post threads share the Reddit client, and with it a single rate limit
+        rate_limit_scheduler = create_rate_limit_scheduler(reddit, config['reddit'])
+        post_threads = [
+            RedditPostThread(reddit=reddit, logger=post_logger, scheduler=rate_limit_scheduler)
+            for _ in range(poster_count)
+        ]
         cleanup_thread = CleanupThread(
             logger=get_thread_logger('CleanupThread')
         )
+        stats_flush_thread = StatsFlushThread(
+            logger=get_thread_logger('StatsFlushThread'),
+            interval=config.get('stats', {}).get('flush_interval', 5)
+        )
         
         fetch_thread.start()
-        newspaper_fetcher_thread.start()
-        processor_thread.start()
-        post_thread.start()
+        for name, threads in (
+            ('NewspaperFetcherThread', newspaper_fetcher_threads),
+            ('NewspaperProcessorThread', processor_threads),
+            ('RedditPostThread', post_threads)
+        ):
+            for number, thread in enumerate(threads, start=1):
+                # Thread names are part of the worker id posts are claimed under
+                thread.name = f"{name}-{number}"
+                thread.start()
         cleanup_thread.start()
+        stats_flush_thread.start()
         
         # Keep main thread alive
         while True:
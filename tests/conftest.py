@@ -9,6 +9,8 @@ from pathlib import Path
 
 import pytest
 
+from infrastructure import database
+
 
 @pytest.fixture
 def test_db_path(tmp_path: Path) -> str:
@@ -59,6 +61,20 @@ def test_db(test_db_path: str) -> Generator[sqlite3.Connection, None, None]:
         os.remove(test_db_path)
 
 
+@pytest.fixture
+def bot_db(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> Generator[sqlite3.Connection, None, None]:
+    """Initialize the bot database in a temporary DATA_DIR."""
+    monkeypatch.setenv("DATA_DIR", str(tmp_path))
+    database.close_db_connection()
+    # Stats counted by earlier tests were never flushed
+    database._stats.take()
+    database.init_db()
+
+    yield database.get_db_connection()
+
+    database.close_db_connection()
+
+
 @pytest.fixture
 def test_config() -> dict:
     """Return a test configuration."""
@@ -0,0 +1,68 @@
+from utils.backoff import CircuitBreaker, compute_backoff
+
+
+class FakeClock:
+    def __init__(self, now: float = 1000.0):
+        self.now = now
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def no_jitter(low: float, high: float) -> float:
+    return 0
+
+
+def full_jitter(low: float, high: float) -> float:
+    return high
+
+
+def test_backoff_grows_with_retry_count():
+    assert compute_backoff(0, 300, 3600, no_jitter) == 150
+    assert compute_backoff(0, 300, 3600, full_jitter) == 300
+    assert compute_backoff(1, 300, 3600, full_jitter) == 600
+    assert compute_backoff(2, 300, 3600, full_jitter) == 1200
+
+
+def test_backoff_is_capped():
+    assert compute_backoff(10, 300, 3600, full_jitter) == 3600
+
+
+def test_backoff_jitter_stays_in_range():
+    delays = {compute_backoff(2, 300, 3600) for _ in range(50)}
+    assert all(600 <= delay <= 1200 for delay in delays)
+    assert len(delays) > 1
+
+
+def test_circuit_opens_after_threshold():
+    clock = FakeClock()
+    breaker = CircuitBreaker(threshold=3, cooldown=600, clock=clock)
+
+    assert not breaker.record_failure("clarin.com")
+    assert not breaker.record_failure("clarin.com")
+    assert breaker.allow("clarin.com")
+    assert breaker.record_failure("clarin.com")
+    assert not breaker.allow("clarin.com")
+    assert breaker.allow("lanacion.com.ar")
+    assert breaker.retry_at("clarin.com") == 1600
+
+
+def test_success_resets_failures():
+    breaker = CircuitBreaker(threshold=2, cooldown=600, clock=FakeClock())
+
+    breaker.record_failure("clarin.com")
+    breaker.record_success("clarin.com")
+    assert not breaker.record_failure("clarin.com")
+    assert breaker.allow("clarin.com")
+
+
+def test_failure_after_cooldown_reopens_circuit():
+    clock = FakeClock()
+    breaker = CircuitBreaker(threshold=2, cooldown=600, clock=clock)
+    breaker.record_failure("clarin.com")
+    breaker.record_failure("clarin.com")
+
+    clock.now += 600
+    assert breaker.allow("clarin.com")
+    assert breaker.record_failure("clarin.com")
+    assert not breaker.allow("clarin.com")
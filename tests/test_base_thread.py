@@ -0,0 +1,56 @@
+import logging
+import threading
+import time
+
+from threads.base_thread import BaseThread, notify_stage
+
+
+class CountingThread(BaseThread):
+    def __init__(self, stage: str):
+        super().__init__(logging.getLogger("test"), interval=60, stage=stage)
+        self.cycles = 0
+        self.cycle_done = threading.Event()
+
+    def process_cycle(self):
+        self.cycles += 1
+        self.cycle_done.set()
+
+
+def test_notified_stage_runs_without_waiting_for_its_interval(bot_db):
+    thread = CountingThread("test-wakeup")
+    thread.start()
+    try:
+        assert thread.cycle_done.wait(5)
+        thread.cycle_done.clear()
+
+        started = time.monotonic()
+        notify_stage("test-wakeup")
+        assert thread.cycle_done.wait(5)
+        assert time.monotonic() - started < 5
+        assert thread.cycles == 2
+    finally:
+        thread.stop()
+        thread.join(5)
+    assert not thread.is_alive()
+
+
+def test_interval_adapts_to_how_much_work_the_cycle_found():
+    thread = CountingThread("test-adaptive")
+    thread.interval = thread.current_interval = 10
+    thread.max_interval, thread.batch_limit = 60, 5
+
+    # A full batch means there is more waiting
+    assert thread.next_interval(5) == 0
+    assert thread.next_interval(2) == 10
+
+    # Idle cycles back off up to the ceiling
+    waits = []
+    for _ in range(4):
+        thread.current_interval = thread.next_interval(0)
+        waits.append(thread.current_interval)
+    assert waits == [20, 40, 60, 60]
+
+    # Any work resets the backoff, and threads that report nothing keep their interval
+    assert thread.next_interval(1) == 10
+    thread.batch_limit = None
+    assert thread.next_interval(0) == 10
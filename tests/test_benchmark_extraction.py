@@ -0,0 +1,75 @@
+import json
+import os
+
+import pytest
+
+from benchmarks.extraction import (
+    DEFAULT_BASELINE,
+    DEFAULT_CORPUS,
+    SIGNATURE,
+    extraction_steps,
+    find_regressions,
+    percentile,
+    run_benchmark
+)
+from utils.newspaper_processor import extract_article_text
+
+RAW_HTML_PATH = os.path.join(os.path.dirname(__file__), 'data', 'raw_text.html')
+
+
+def read_page() -> str:
+    with open(RAW_HTML_PATH, 'r', encoding='utf-8') as f:
+        return f.read()
+
+
+def test_steps_produce_the_same_text_as_extract_article_text():
+    html = read_page()
+    output = None
+    for step in extraction_steps(html).values():
+        output = step()
+
+    assert output == extract_article_text(html, SIGNATURE)
+
+
+@pytest.mark.parametrize("path", sorted(DEFAULT_CORPUS.glob("*.html")), ids=lambda path: path.stem)
+def test_steps_match_extract_article_text_on_the_corpus(path):
+    html = path.read_text(encoding="utf-8")
+    output = None
+    for step in extraction_steps(html).values():
+        output = step()
+
+    assert output == extract_article_text(html, SIGNATURE)
+
+
+def test_baseline_covers_every_step():
+    assert len(list(DEFAULT_CORPUS.glob("*.html"))) > 1
+    baseline = json.loads(DEFAULT_BASELINE.read_text())
+    assert list(baseline) == ["total", *extraction_steps("")]
+
+
+def test_percentile():
+    samples = [float(i) for i in range(1, 101)]
+    assert percentile(samples, 0.50) == 50
+    assert percentile(samples, 0.99) == 99
+    assert percentile([3.0], 0.95) == 3
+
+
+def test_find_regressions():
+    baseline = {"total": {"p50": 0.100, "peak_memory": 1000}, "slim_html": {"p50": 0.0001}}
+    results = {
+        "total": {"p50": 0.120, "peak_memory": 2000, "output_chars": 10},
+        "slim_html": {"p50": 0.0005},
+    }
+
+    # Growth under the threshold, sub-millisecond times and figures without a baseline pass
+    assert find_regressions(results, baseline, threshold=0.25) == ["total peak_memory: 2000 vs baseline 1000"]
+
+
+def test_run_benchmark_reports_every_step():
+    results = run_benchmark([read_page()], repeat=1)
+
+    assert list(results) == ["total", *extraction_steps("")]
+    assert results["total"]["output_chars"] > 0
+    for figures in results.values():
+        assert figures["p50"] <= figures["p95"] <= figures["p99"]
+        assert figures["peak_memory"] > 0
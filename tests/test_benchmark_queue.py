@@ -0,0 +1,25 @@
+import os
+
+from benchmarks.queue_queries import run_benchmark
+
+
+def test_run_benchmark_reports_every_queue_query(monkeypatch):
+    monkeypatch.setenv("DATA_DIR", "unchanged")
+    results = run_benchmark(rows=500, repeat=3)
+
+    assert set(results) == {
+        "claim_posts_to_fetch",
+        "claim_posts_to_process",
+        "get_posts_to_chunk",
+        "claim_posts_to_post",
+        "get_posts_with_processed_duplicate",
+    }
+    for figures in results.values():
+        assert 0 < figures["p50"] <= figures["p95"] <= figures["p99"]
+    assert os.environ["DATA_DIR"] == "unchanged"
+
+
+def test_run_benchmark_without_indexes():
+    results = run_benchmark(rows=500, repeat=1, with_indexes=False)
+
+    assert len(results) == 5
@@ -0,0 +1,88 @@
+import random
+
+from utils.comment_splitter import CONTINUATION_MESSAGE, COVERAGE_MESSAGE, split_comment
+
+
+class ReferenceSplitter:
+    """The posting thread's old splitter, copied verbatim, which copies the remaining text on every chunk."""
+
+    def __init__(self, max_length: int, coverage_subreddits: list[str]):
+        self.max_length = max_length
+        self.coverage_subreddits = coverage_subreddits
+
+    def split_text(self, text: str, subreddit: str) -> list[str]:
+        """Split text into chunks that fit within Reddit's comment length limit."""
+        if len(text) <= self.max_length:
+            return [text]
+            
+        chunks = []
+        continuation_msg = "\n> ***(continues in next comment)***"
+        continuation_msg_len = len(continuation_msg)
+        
+        while text:
+            # If remaining text is shorter than max_length, add it as the last chunk
+            if len(text) <= self.max_length:
+                chunks.append(text)
+                break
+                
+            # Find the last newline before max_length - continuation_msg_len
+            # to ensure we have room for the continuation message
+            split_point = text.rfind('\n', 0, self.max_length - continuation_msg_len)
+            
+            # If no newline found, try to split at the last space
+            if split_point == -1:
+                split_point = text.rfind(' ', 0, self.max_length - continuation_msg_len)
+                
+            # If still no good split point, force split at max_length - continuation_msg_len
+            if split_point == -1:
+                split_point = self.max_length - continuation_msg_len
+                
+            # Add the chunk with continuation message and continue with remaining text
+            chunk = text[:split_point].strip() + continuation_msg
+            chunks.append(chunk)
+            text = text[split_point:].strip()
+            
+        # Add CoverageAnalysisBot summoning to the last chunk if subreddit is in coverage list
+        if subreddit in self.coverage_subreddits:
+            chunks[-1] += "\n\nSummoning u/CoverageAnalysisBot"
+            
+        return chunks
+
+
+def reference_split(text: str, max_length: int, summon_coverage: bool) -> list[str]:
+    splitter = ReferenceSplitter(max_length, ["argentina"] if summon_coverage else [])
+    return splitter.split_text(text, "argentina")
+
+
+def test_short_text_is_a_single_chunk():
+    assert split_comment("  short text\n", 100) == ["  short text\n"]
+    assert split_comment("short", 100, summon_coverage=True) == ["short"]
+
+
+def test_chunks_fit_and_break_at_newlines():
+    text = "\n".join(f"> line {i} " + "x" * 30 for i in range(100))
+    chunks = split_comment(text, 500)
+
+    assert len(chunks) > 1
+    assert all(len(chunk) <= 500 for chunk in chunks)
+    assert all(chunk.endswith(CONTINUATION_MESSAGE) for chunk in chunks[:-1])
+    assert chunks[1].startswith("> line")
+
+
+def test_coverage_summon_goes_on_the_last_chunk_of_a_split_text():
+    text = "word " * 200
+    chunks = split_comment(text, 300, summon_coverage=True)
+
+    assert len(chunks) > 1
+    assert chunks[-1].endswith(COVERAGE_MESSAGE)
+    assert not any(COVERAGE_MESSAGE in chunk for chunk in chunks[:-1])
+
+
+def test_chunks_match_the_previous_splitter():
+    rng = random.Random(17)
+    pieces = ["word", " ", "\n", "  ", "\n\n", "x" * 120, "\t", "> quote"]
+    for _ in range(300):
+        text = "".join(rng.choice(pieces) for _ in range(rng.randint(0, 400)))
+        max_length = rng.randint(len(CONTINUATION_MESSAGE) + 1, 300)
+        summon_coverage = rng.random() < 0.5
+        assert split_comment(text, max_length, summon_coverage) == reference_split(text, max_length, summon_coverage)
@@ -0,0 +1,387 @@
+import sqlite3
+
+from infrastructure import database
+from infrastructure.database import (
+    DEFAULT_LEASE_SECONDS,
+    MAX_FETCH_RETRIES,
+    MIGRATIONS,
+    cache_extraction,
+    get_cached_extraction,
+    defer_posts,
+    delete_post,
+    get_extraction_failures,
+    claim_posts_to_fetch,
+    claim_posts_to_post,
+    claim_posts_to_process,
+    get_posts_to_chunk,
+    get_posts_with_processed_duplicate,
+    get_site_profile_stats,
+    get_stage_idle_stats,
+    get_stats,
+    handle_fetch_retry,
+    insert_post,
+    insert_posts_many,
+    mark_extraction_failed,
+    mark_post_as_duplicate,
+    mark_post_as_fetched,
+    mark_post_as_posted,
+    mark_posts_as_fetched_many,
+    mark_posts_as_posted_many,
+    mark_posts_as_processed_many,
+    mark_post_as_processed,
+    record_site_profile_extraction,
+    record_stage_idle,
+    mark_chunk_as_posted,
+    release_claims,
+    renew_claims,
+    store_chunks,
+)
+from utils.url_utils import canonicalize_url
+
+
+WORKER = "test-host:1:worker"
+
+
+def insert(reddit_id: str, subreddit: str, url: str, created_utc: int = 1_700_000_000) -> None:
+    insert_post(reddit_id, subreddit, url, created_utc, canonical_url=canonicalize_url(url))
+
+
+def post_ids(bot_db, reddit_ids):
+    placeholders = ",".join("?" for _ in reddit_ids)
+    rows = bot_db.execute(f"SELECT id FROM posts WHERE reddit_id IN ({placeholders}) ORDER BY id", reddit_ids)
+    return [row[0] for row in rows]
+
+
+def test_crossposts_are_fetched_once(bot_db):
+    insert("a", "argentina", "https://www.clarin.com/nota.html?utm_source=reddit")
+    insert("b", "RepublicaArgentina", "https://clarin.com/nota.html")
+    insert("c", "argentina", "https://clarin.com/otra.html")
+    first, _, other = post_ids(bot_db, ["a", "b", "c"])
+
+    assert sorted(post_id for post_id, _, _ in claim_posts_to_fetch(WORKER)) == [first, other]
+
+
+def test_crossposts_reuse_processed_text(bot_db):
+    insert("a", "argentina", "https://www.clarin.com/nota.html")
+    insert("b", "RepublicaArgentina", "https://clarin.com/nota.html#top")
+    first, second = post_ids(bot_db, ["a", "b"])
+
+    mark_post_as_fetched(first, "<html></html>")
+    assert get_posts_with_processed_duplicate() == []
+    assert claim_posts_to_fetch(WORKER) == []
+
+    mark_post_as_processed(first, "processed")
+    assert get_posts_with_processed_duplicate() == [(second, "processed")]
+
+    mark_post_as_duplicate(second, "processed")
+    assert get_posts_with_processed_duplicate() == []
+    posts = {post_id: (subreddit, text) for post_id, subreddit, text in get_posts_to_chunk()}
+    assert posts == {
+        first: ("argentina", "processed"),
+        second: ("RepublicaArgentina", "processed"),
+    }
+
+
+def test_posts_are_posted_from_stored_chunks(bot_db):
+    insert("a", "argentina", "https://www.clarin.com/nota.html")
+    insert("b", "argentina", "https://www.clarin.com/otra.html", created_utc=1_700_000_060)
+    first, second = post_ids(bot_db, ["a", "b"])
+    for post_id in (first, second):
+        mark_post_as_fetched(post_id, "<html></html>")
+        mark_post_as_processed(post_id, "processed")
+
+    # Not ready to post until the text has been split
+    assert claim_posts_to_post(WORKER) == []
+    store_chunks(first, ["one", "two", "three"])
+
+    assert [post_id for post_id, _, _ in get_posts_to_chunk()] == [second]
+    assert claim_posts_to_post(WORKER) == [(first, "a", "argentina", [("one", None), ("two", None), ("three", None)])]
+
+    # Newer submissions are posted on first
+    store_chunks(second, ["only"])
+    release_claims([first], WORKER)
+    assert [post_id for post_id, _, _, _ in claim_posts_to_post(WORKER)] == [second, first]
+
+
+def test_posts_without_canonical_url_are_independent(bot_db):
+    insert_post("a", "argentina", "https://clarin.com/nota.html", 1_700_000_000)
+    insert_post("b", "argentina", "https://clarin.com/nota.html", 1_700_000_000)
+
+    assert len(claim_posts_to_fetch(WORKER)) == 2
+
+
+def test_claimed_posts_are_not_handed_to_other_workers(bot_db):
+    insert("a", "argentina", "https://clarin.com/nota.html")
+    insert("b", "argentina", "https://clarin.com/otra.html")
+    first, second = post_ids(bot_db, ["a", "b"])
+
+    assert [post_id for post_id, _, _ in claim_posts_to_fetch(WORKER, limit=1)] == [first]
+    assert [post_id for post_id, _, _ in claim_posts_to_fetch("other", limit=2)] == [second]
+    assert claim_posts_to_fetch("third") == []
+    rows = bot_db.execute("SELECT claimed_by FROM posts ORDER BY id").fetchall()
+    assert rows == [(WORKER,), ("other",)]
+
+    # Finishing a stage hands the post to the next one unclaimed
+    mark_post_as_fetched(first, "<html></html>", WORKER)
+    assert [post_id for post_id, _, _ in claim_posts_to_process("other")] == [first]
+
+
+def test_expired_leases_are_reclaimed(bot_db):
+    insert("a", "argentina", "https://clarin.com/nota.html")
+    (post_id,) = post_ids(bot_db, ["a"])
+    claim_posts_to_fetch(WORKER, lease_seconds=DEFAULT_LEASE_SECONDS)
+    assert claim_posts_to_fetch("other") == []
+
+    # The worker died without finishing, its lease runs out
+    bot_db.execute("UPDATE posts SET lease_expires_utc = lease_expires_utc - ?", (DEFAULT_LEASE_SECONDS + 1,))
+    bot_db.commit()
+
+    assert claim_posts_to_fetch("other") == [(post_id, "https://clarin.com/nota.html", 0)]
+    assert bot_db.execute("SELECT claimed_by FROM posts").fetchall() == [("other",)]
+
+
+def test_workers_cannot_finish_posts_taken_over_from_them(bot_db):
+    insert("a", "argentina", "https://clarin.com/nota.html")
+    insert("b", "argentina", "https://clarin.com/otra.html")
+    first, second = post_ids(bot_db, ["a", "b"])
+    claim_posts_to_fetch(WORKER)
+
+    # The lease on the first post runs out and another worker claims it
+    bot_db.execute("UPDATE posts SET lease_expires_utc = 0 WHERE id = ?", (first,))
+    bot_db.commit()
+    assert [post_id for post_id, _, _ in claim_posts_to_fetch("other")] == [first]
+
+    assert mark_posts_as_fetched_many([(first, "<html>a</html>"), (second, "<html>b</html>")], WORKER) == [second]
+    release_claims([first], WORKER)
+    assert bot_db.execute("SELECT state, claimed_by FROM posts WHERE id = ?", (first,)).fetchall() == [("new", "other")]
+    assert bot_db.execute("SELECT post_id FROM texts").fetchall() == [(second,)]
+
+    claim_posts_to_process("processor")
+    assert mark_post_as_processed(second, "texto", "processor")
+    assert store_chunks(second, ["texto"])
+    claim_posts_to_post("poster")
+    assert not mark_chunk_as_posted(second, 0, "c1", WORKER)
+    assert mark_posts_as_posted_many([second], WORKER) == []
+    assert mark_chunk_as_posted(second, 0, "c1", "poster")
+    assert mark_posts_as_posted_many([second], "poster") == [second]
+
+
+def test_workers_cannot_retry_defer_or_drop_posts_taken_over_from_them(bot_db):
+    for reddit_id in "abc":
+        insert(reddit_id, "argentina", f"https://clarin.com/{reddit_id}.html")
+    first, second, third = post_ids(bot_db, ["a", "b", "c"])
+    claim_posts_to_fetch(WORKER)
+
+    # Every lease runs out and another worker claims the posts
+    bot_db.execute("UPDATE posts SET lease_expires_utc = 0")
+    bot_db.commit()
+    assert len(claim_posts_to_fetch("other")) == 3
+
+    assert handle_fetch_retry(first, 2_000_000_000, WORKER) is False
+    assert defer_posts([second], 2_000_000_000, WORKER) == []
+    assert not delete_post(third, WORKER)
+    rows = bot_db.execute("SELECT claimed_by, retry_count, fetch_at_utc < 2000000000 FROM posts ORDER BY id")
+    assert rows.fetchall() == [("other", 0, 1)] * 3
+
+    mark_posts_as_fetched_many([(first, "<html>a</html>")], "other")
+    claim_posts_to_process("processor")
+    bot_db.execute("UPDATE posts SET lease_expires_utc = 0 WHERE id = ?", (first,))
+    bot_db.commit()
+    claim_posts_to_process("other")
+    assert not mark_extraction_failed(first, "clarin.com", "timeout", "processor")
+    assert post_ids(bot_db, ["a"]) == [first]
+    assert get_extraction_failures() == []
+
+    assert defer_posts([second], 2_000_000_000, "other") == [second]
+    assert delete_post(third, "other")
+    assert post_ids(bot_db, ["c"]) == []
+
+
+def test_renewing_claims_extends_leases_still_held(bot_db):
+    insert("a", "argentina", "https://clarin.com/nota.html")
+    insert("b", "argentina", "https://clarin.com/otra.html")
+    first, second = post_ids(bot_db, ["a", "b"])
+    claim_posts_to_fetch(WORKER, lease_seconds=10)
+    bot_db.execute("UPDATE posts SET claimed_by = 'other' WHERE id = ?", (second,))
+    bot_db.commit()
+
+    assert renew_claims([first, second], WORKER, lease_seconds=DEFAULT_LEASE_SECONDS) == [first]
+    (lease_expires,), (other_lease_expires,) = bot_db.execute("SELECT lease_expires_utc FROM posts ORDER BY id")
+    assert lease_expires - other_lease_expires >= DEFAULT_LEASE_SECONDS - 10
+
+
+def test_fetch_retry_increments_and_eventually_skips(bot_db):
+    insert("a", "argentina", "https://clarin.com/nota.html")
+    (post_id,) = post_ids(bot_db, ["a"])
+    assert claim_posts_to_fetch(WORKER) == [(post_id, "https://clarin.com/nota.html", 0)]
+
+    for expected_retry in range(1, MAX_FETCH_RETRIES + 1):
+        assert handle_fetch_retry(post_id, 0, WORKER) is False
+        assert claim_posts_to_fetch(WORKER) == [(post_id, "https://clarin.com/nota.html", expected_retry)]
+
+    assert handle_fetch_retry(post_id, 0, WORKER) is True
+    assert post_ids(bot_db, ["a"]) == []
+
+
+def test_defer_posts_does_not_count_as_retry(bot_db):
+    insert("a", "argentina", "https://clarin.com/nota.html")
+    insert("b", "argentina", "https://clarin.com/otra.html")
+    first, second = post_ids(bot_db, ["a", "b"])
+
+    defer_posts([first, second], 2_000_000_000)
+
+    assert claim_posts_to_fetch(WORKER) == []
+    rows = bot_db.execute("SELECT retry_count, fetch_at_utc FROM posts ORDER BY id").fetchall()
+    assert rows == [(0, 2_000_000_000), (0, 2_000_000_000)]
+
+
+def test_failed_extractions_are_dropped_and_counted(bot_db):
+    insert("a", "argentina", "https://www.clarin.com/nota.html")
+    insert("b", "argentina", "https://www.clarin.com/otra.html")
+    first, second = post_ids(bot_db, ["a", "b"])
+    mark_post_as_fetched(first, "<html>a</html>")
+    mark_post_as_fetched(second, "<html>b</html>")
+    assert sorted(claim_posts_to_process(WORKER)) == [
+        (first, "https://www.clarin.com/nota.html", "<html>a</html>"),
+        (second, "https://www.clarin.com/otra.html", "<html>b</html>"),
+    ]
+
+    assert mark_extraction_failed(first, "clarin.com", "cpu_budget", WORKER)
+    assert mark_extraction_failed(second, "clarin.com", "cpu_budget", WORKER)
+
+    assert claim_posts_to_process(WORKER) == []
+    assert post_ids(bot_db, ["a", "b"]) == []
+    assert get_extraction_failures() == [("clarin.com", "cpu_budget", 2)]
+
+
+def test_stage_idle_time_is_measured_from_when_posts_became_ready(bot_db):
+    insert("a", "argentina", "https://www.clarin.com/nota.html")
+    insert("b", "argentina", "https://www.clarin.com/otra.html")
+    first, second = post_ids(bot_db, ["a", "b"])
+    bot_db.execute("UPDATE posts SET fetch_at_utc = fetch_at_utc - 30 WHERE id = ?", (first,))
+    bot_db.execute("UPDATE posts SET fetch_at_utc = fetch_at_utc - 10 WHERE id = ?", (second,))
+    bot_db.commit()
+
+    record_stage_idle("fetch", [first, second])
+    # Not fetched yet, so not ready to process
+    record_stage_idle("process", [first])
+
+    [(stage, posts, idle_seconds, max_idle_seconds)] = get_stage_idle_stats()
+    assert (stage, posts) == ("fetch", 2)
+    assert 40 <= idle_seconds <= 42
+    assert 30 <= max_idle_seconds <= 31
+
+
+def test_site_profile_stats_accumulate(bot_db):
+    record_site_profile_extraction("lanacion.com.ar", True, 12)
+    record_site_profile_extraction("lanacion.com.ar", True, 8)
+    record_site_profile_extraction("lanacion.com.ar", False, 500)
+    record_site_profile_extraction("clarin.com", False, 300)
+
+    assert get_site_profile_stats() == [("lanacion.com.ar", 2, 1, 20), ("clarin.com", 0, 1, 0)]
+
+
+def test_extraction_cache_evicts_least_recently_used(bot_db):
+    cache_extraction("a", "x" * 100, max_bytes=250)
+    cache_extraction("b", "y" * 100, max_bytes=250)
+    bot_db.execute("UPDATE extraction_cache SET last_used_utc = last_used_utc - 10")
+    assert get_cached_extraction("a") == "x" * 100
+
+    cache_extraction("c", "z" * 100, max_bytes=250)
+
+    assert get_cached_extraction("a") == "x" * 100
+    assert get_cached_extraction("b") is None
+    assert get_cached_extraction("c") == "z" * 100
+
+
+def test_databases_from_before_migrations_are_upgraded_in_place(tmp_path, monkeypatch):
+    # The posts and chunks tables as they were before crosspost deduplication
+    conn = sqlite3.connect(tmp_path / "bot.db")
+    conn.executescript("""
+        CREATE TABLE posts (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            reddit_id TEXT UNIQUE,
+            subreddit TEXT,
+            url TEXT,
+            created_utc INTEGER,
+            fetch_at_utc INTEGER DEFAULT NULL,
+            fetched_at_utc INTEGER DEFAULT NULL,
+            processed_at_utc INTEGER DEFAULT NULL,
+            posted_at_utc INTEGER DEFAULT NULL,
+            retry_count INTEGER DEFAULT 0
+        );
+        CREATE TABLE texts (id INTEGER PRIMARY KEY AUTOINCREMENT, post_id INTEGER, text TEXT, raw_text TEXT);
+        CREATE TABLE chunks (post_id INTEGER, position INTEGER, body TEXT, PRIMARY KEY (post_id, position));
+        INSERT INTO posts (reddit_id, url, fetch_at_utc, fetched_at_utc, processed_at_utc, posted_at_utc) VALUES
+            ('new', 'https://a.com/1', 0, NULL, NULL, NULL),
+            ('fetched', 'https://a.com/2', NULL, 1, NULL, NULL),
+            ('processed', 'https://a.com/3', NULL, 1, 2, NULL),
+            ('chunked', 'https://a.com/4', NULL, 1, 2, NULL),
+            ('posted', 'https://a.com/5', NULL, 1, 2, 3);
+        INSERT INTO chunks (post_id, position, body) VALUES (4, 0, 'one');
+    """)
+    conn.close()
+
+    monkeypatch.setenv("DATA_DIR", str(tmp_path))
+    database.close_db_connection()
+    database.init_db()
+    # Running it again finds nothing left to do
+    database.init_db()
+    bot_db = database.get_db_connection()
+    try:
+        assert bot_db.execute("PRAGMA user_version").fetchone()[0] == len(MIGRATIONS)
+        rows = bot_db.execute("SELECT reddit_id, state, canonical_url, claimed_by FROM posts ORDER BY id").fetchall()
+        assert rows == [(state, state, None, None) for state in ("new", "fetched", "processed", "chunked", "posted")]
+        indexes = {row[0] for row in bot_db.execute("SELECT name FROM sqlite_master WHERE type = 'index'")}
+        assert {"idx_posts_state", "idx_posts_new", "idx_posts_chunked", "idx_texts_post_id"} <= indexes
+        assert [post_id for post_id, _, _ in claim_posts_to_fetch(WORKER)] == [1]
+    finally:
+        database.close_db_connection()
+
+
+def test_state_follows_the_post_through_the_pipeline(bot_db):
+    insert("a", "argentina", "https://www.clarin.com/nota.html")
+    (post_id,) = post_ids(bot_db, ["a"])
+
+    def state():
+        return bot_db.execute("SELECT state FROM posts WHERE id = ?", (post_id,)).fetchone()[0]
+
+    assert state() == "new"
+    mark_post_as_fetched(post_id, "<html></html>")
+    assert state() == "fetched"
+    mark_post_as_processed(post_id, "processed")
+    assert state() == "processed"
+    store_chunks(post_id, ["processed"])
+    assert state() == "chunked"
+    mark_post_as_posted(post_id)
+    assert state() == "posted"
+
+
+def test_batches_move_through_the_pipeline_in_one_transaction_each(bot_db):
+    def stats():
+        return get_stats()
+
+    insert("a", "argentina", "https://clarin.com/nota.html", created_utc=1_700_000_100)
+    inserted = insert_posts_many([
+        ("a", "argentina", "https://clarin.com/nota.html", 1_700_000_100, "clarin.com/nota.html"),
+        ("b", "argentina", "https://clarin.com/otra.html", 1_700_000_000, "clarin.com/otra.html"),
+        ("c", "argentina", "https://clarin.com/tercera.html", 1_700_000_200, "clarin.com/tercera.html"),
+    ])
+    assert inserted == 2
+    assert stats()["total_posts"] == stats()["posts_fetched"] == 3
+    assert (stats()["oldest_post"], stats()["newest_post"]) == (1_700_000_000, 1_700_000_200)
+
+    ids = post_ids(bot_db, ["a", "b", "c"])
+    mark_posts_as_fetched_many([(post_id, f"<html>{post_id}</html>") for post_id in ids])
+    assert stats()["content_fetched"] == 3
+    mark_posts_as_processed_many([(post_id, f"text {post_id}") for post_id in ids])
+    assert stats()["posts_processed"] == 3
+    for post_id in ids:
+        store_chunks(post_id, [f"text {post_id}"])
+    mark_posts_as_posted_many(ids)
+
+    assert stats()["posts_posted"] == stats()["posting_queue_waits"] == 3
+    rows = bot_db.execute("SELECT state, claimed_by FROM posts ORDER BY id").fetchall()
+    assert rows == [("posted", None)] * 3
+    texts = bot_db.execute("SELECT post_id, raw_text, text FROM texts ORDER BY post_id").fetchall()
+    assert texts == [(post_id, f"<html>{post_id}</html>", f"text {post_id}") for post_id in ids]
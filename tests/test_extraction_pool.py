@@ -0,0 +1,155 @@
+import multiprocessing
+import os
+import time
+
+import pytest
+
+from infrastructure.extraction_pool import ExtractionPool
+from utils.newspaper_processor import ArticleExtraction
+from utils.site_profiles import SiteProfile
+
+
+def fake_extract(html: str, signature: str, article_url, profiles) -> ArticleExtraction:
+    """Stand-in for extract_article that behaves according to the HTML it gets."""
+    if html == "slow":
+        time.sleep(30)
+    if html == "spin":
+        while True:
+            pass
+    if html == "hungry":
+        bytearray(512 * 1024 * 1024)
+    if html == "broken":
+        raise ValueError("broken page")
+    if html == "pid":
+        return ArticleExtraction(str(os.getpid()))
+    if html == "profiled":
+        return ArticleExtraction(profiles[0].domain, profile=profiles[0].domain, profile_hit=True, elapsed=0.5)
+    return ArticleExtraction(f"{html} {signature}" if html else None)
+
+
+@pytest.fixture
+def pool():
+    pool = ExtractionPool(workers=2, max_tasks_per_child=1, task_timeout=5, extract=fake_extract)
+    yield pool
+    pool.close()
+
+
+@pytest.mark.parametrize("workers", [0, 2])
+def test_results_are_returned_in_order(workers):
+    pool = ExtractionPool(workers=workers, task_timeout=5, extract=fake_extract)
+    try:
+        results = pool.extract_many([(1, "first"), (2, ""), (3, "broken"), (4, "last")], "signed")
+    finally:
+        pool.close()
+
+    assert [result.post_id for result in results] == [1, 2, 3, 4]
+    assert results[0].text == "first signed"
+    assert results[1].text is None
+    assert results[1].error is None
+    assert isinstance(results[2].error, ValueError)
+    assert results[3].text == "last signed"
+
+
+def test_extraction_runs_in_worker_processes(pool):
+    results = pool.extract_many([(i, "pid") for i in range(4)], "")
+
+    pids = {result.text for result in results}
+    assert str(os.getpid()) not in pids
+    # Workers are recycled after a single task each
+    assert len(pids) == 4
+
+
+def test_timed_out_tasks_fail_and_pool_recovers():
+    # Long enough for a freshly spawned worker to start on a busy machine
+    pool = ExtractionPool(workers=2, task_timeout=3, extract=fake_extract)
+    try:
+        results = pool.extract_many([(1, "slow"), (2, "fast")], "signed")
+        assert results[0].error is not None
+        assert results[0].failure_reason == "timeout"
+        assert results[1].text == "fast signed"
+
+        assert pool.extract_many([(3, "again")], "signed")[0].text == "again signed"
+    finally:
+        pool.close()
+
+
+def test_profiles_are_passed_to_workers():
+    profiles = (SiteProfile("example.com", "article"),)
+    pool = ExtractionPool(workers=1, task_timeout=5, profiles=profiles, extract=fake_extract)
+    try:
+        result = pool.extract_many([(1, "profiled")], "signed")[0]
+    finally:
+        pool.close()
+
+    assert result.text == "example.com"
+    assert result.profile == "example.com"
+    assert result.profile_hit
+    assert result.elapsed == 0.5
+
+
+def test_cpu_budget_stops_runaway_extraction():
+    pool = ExtractionPool(workers=1, task_timeout=10, cpu_budget=0.5, extract=fake_extract)
+    try:
+        started = time.monotonic()
+        results = pool.extract_many([(1, "spin"), (2, "after")], "signed")
+    finally:
+        pool.close()
+
+    assert results[0].failure_reason == "cpu_budget"
+    assert time.monotonic() - started < 10
+    # The worker survives the overrun and keeps extracting
+    assert results[1].text == "after signed"
+
+
+def test_memory_budget_stops_runaway_extraction():
+    pool = ExtractionPool(workers=1, task_timeout=10, memory_budget_mb=256, extract=fake_extract)
+    try:
+        results = pool.extract_many([(1, "hungry"), (2, "after")], "signed")
+    finally:
+        pool.close()
+
+    assert results[0].failure_reason == "memory_budget"
+    assert results[1].text == "after signed"
+
+
+def test_failures_without_budget_overrun_are_errors(pool):
+    assert pool.extract_many([(1, "broken")], "signed")[0].failure_reason == "error"
+
+
+def test_queued_tasks_do_not_time_out_before_starting():
+    # The only worker is stuck on the first article, the second never gets to start
+    pool = ExtractionPool(workers=1, task_timeout=3, extract=fake_extract)
+    try:
+        results = pool.extract_many([(1, "slow"), (2, "fast")], "signed")
+    finally:
+        pool.close()
+
+    assert results[0].failure_reason == "timeout"
+    assert not results[0].retryable
+    assert results[1].failure_reason == "not_started"
+    assert results[1].retryable
+
+
+def test_only_article_failures_are_final(pool):
+    broken, fine = pool.extract_many([(1, "broken"), (2, "fine")], "signed")
+
+    assert broken.retryable
+    assert not fine.retryable
+
+
+def test_tasks_lost_by_the_pool_fail_at_the_batch_deadline():
+    pool = ExtractionPool(workers=1, task_timeout=1, extract=fake_extract)
+    try:
+        pool._get_pool()
+        # Starts are reported where the pool no longer looks, like a worker killed before reporting one
+        pool._started = multiprocessing.get_context("spawn").SimpleQueue()
+        started = time.monotonic()
+        results = pool.extract_many([(1, "slow")], "signed")
+
+        assert time.monotonic() - started < 10
+        assert results[0].failure_reason == "not_started"
+        assert results[0].retryable
+        assert pool._pool is None
+        assert pool.extract_many([(2, "fast")], "signed")[0].text == "fast signed"
+    finally:
+        pool.close()
@@ -0,0 +1,82 @@
+import os
+
+import bs4
+
+from utils.html_slimmer import slim_html
+
+
+def test_slim_html_drops_unused_markup():
+    html = """
+    <html>
+        <head>
+            <link rel="canonical" href="https://example.com/article">
+            <meta property="og:image" content="https://example.com/image.jpg">
+            <style>body { color: red; }</style>
+            <script src="/tracker.js"></script>
+            <SCRIPT type="text/javascript">var a = "<div>";</SCRIPT>
+        </head>
+        <body>
+            <!-- <script> inside a comment -->
+            <p>First</p>
+            <svg viewBox="0 0 10 10"><path d="M0 0"/></svg>
+            <ins class="adsbygoogle" data-ad-slot="1"><iframe></iframe></ins>
+            <div id="div-gpt-ad-123"> </div>
+            <noscript><iframe src="https://www.googletagmanager.com/ns.html"></iframe></noscript>
+            <p>Second</p>
+        </body>
+    </html>
+    """
+    slimmed = slim_html(html)
+
+    dropped = ("color: red", "tracker.js", "var a", "a comment", "<svg", "adsbygoogle", "div-gpt-ad", "googletagmanager")
+    for text in dropped:
+        assert text not in slimmed
+    assert '<link rel="canonical" href="https://example.com/article">' in slimmed
+    assert '<meta property="og:image" content="https://example.com/image.jpg">' in slimmed
+    assert "<p>First</p>" in slimmed
+    assert "<p>Second</p>" in slimmed
+
+
+def test_slim_html_keeps_what_readability_reads():
+    html = """
+    <script type="application/ld+json">{"headline": "Title"}</script>
+    <noscript><img src="https://example.com/lazy.jpg"></noscript>
+    """
+    assert slim_html(html) == html
+
+
+def test_slim_html_keeps_article_metadata():
+    raw_html_path = os.path.join(os.path.dirname(__file__), 'data', 'raw_text.html')
+    with open(raw_html_path, 'r', encoding='utf-8') as f:
+        raw_html = f.read()
+
+    slimmed = slim_html(raw_html)
+    assert len(slimmed) < len(raw_html) / 2
+
+    original, slim = bs4.BeautifulSoup(raw_html, "lxml"), bs4.BeautifulSoup(slimmed, "lxml")
+    assert slim.find("link", rel="canonical") == original.find("link", rel="canonical")
+    for prop in ("og:url", "og:image", "og:title"):
+        assert slim.find("meta", property=prop) == original.find("meta", property=prop)
+    assert slim.title == original.title
+    assert slim.find("h1").get_text() == original.find("h1").get_text()
+
+
+def test_slim_html_drops_self_closing_svg_alone():
+    html = '<button><svg class="icon" viewBox="0 0 24 24"/></button><p>Keep</p><svg><path d="M0 0"/></svg><p>After</p>'
+    assert slim_html(html) == '<button></button><p>Keep</p><p>After</p>'
+
+    assert slim_html('<SVG width="1" />\n<p>Keep</p>') == '\n<p>Keep</p>'
+
+
+def test_slim_html_drops_nested_svg_whole():
+    html = """<p>Before</p><svg viewBox="0 0 24 24">
+        <svg viewBox="0 0 12 12"><circle r="5"/></svg>
+        <svg x="12"/>
+        <path d="M15 15l6 6"/>
+    </svg><p>After</p>"""
+    assert slim_html(html) == "<p>Before</p><p>After</p>"
+
+
+def test_slim_html_keeps_unclosed_svg():
+    html = '<p>Before</p><svg viewBox="0 0 24 24"><path d="M0 0"/><p>After</p>'
+    assert slim_html(html) == html
@@ -1,12 +1,21 @@
+import glob
 import os
 import sys
+
+import pytest
+
+from utils import newspaper_processor
+from utils.site_profiles import SiteProfile
 from utils.newspaper_processor import (
     extract_article_text, 
     replace_ru_domains,
     get_base_url,
     is_same_domain,
-    convert_relative_urls
+    convert_relative_urls,
+    _parse_page,
+    extraction_cache_key
 )
+from utils.page_metadata import PageMetadata
 
 # Add project root to Python path
 project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
@@ -303,6 +312,71 @@ def test_convert_relative_urls():
     assert 'src="https://other.com/image.jpg"' in result
 
 
+def test_convert_relative_urls_keeps_fragments_as_given():
+    base_url = "https://example.com/article"
+
+    html = '<p>Ver <a href="/nota">la nota</a></p><img src="foto.jpg">'
+    assert convert_relative_urls(html, base_url) == (
+        '<p>Ver <a href="https://example.com/nota">la nota</a></p><img src="https://example.com/article/foto.jpg"/>'
+    )
+
+    # Not wrapped in <html><body>, nor restructured like a full page would be
+    html = '<li><a href="/uno">Uno</a></li><td>celda</td>'
+    assert convert_relative_urls(html, base_url) == '<li><a href="https://example.com/uno">Uno</a></li><td>celda</td>'
+
+
+def test_parse_page():
+    """Test that the single parse reads the metadata and makes every relative URL absolute."""
+    raw_html_path = os.path.join(os.path.dirname(__file__), 'data', 'raw_text.html')
+    with open(raw_html_path, 'r', encoding='utf-8') as f:
+        raw_html = f.read()
+
+    soup, base_url, metadata = _parse_page(raw_html)
+    assert base_url == get_base_url(raw_html)
+    assert metadata.og_image is not None
+    assert all(a['href'].startswith(("http://", "https://", "#", "mailto:")) for a in soup.find_all('a', href=True))
+
+    html = """
+    <html>
+        <head>
+            <meta property="og:url" content="https://example.com/article">
+            <meta property="og:image" content="https://example.com/image.jpg">
+        </head>
+        <body><a href="/path">Link</a><img src="foto.jpg"></body>
+    </html>
+    """
+    soup, base_url, metadata = _parse_page(html)
+    assert base_url == "https://example.com/article"
+    assert soup.a['href'] == "https://example.com/path"
+    assert soup.img['src'] == "https://example.com/article/foto.jpg"
+    assert metadata.og_image == "https://example.com/image.jpg"
+
+    # The article URL the post was submitted with wins over the page's own
+    soup, base_url, _ = _parse_page(html, "https://example.org/nota")
+    assert base_url == "https://example.org/nota"
+    assert soup.a['href'] == "https://example.org/path"
+
+    # Without a base URL nothing needs the tree, so the page is not parsed
+    assert _parse_page('<a href="/path">Link</a>') == (None, None, PageMetadata())
+
+
+CORPUS_PAGES = sorted(glob.glob(os.path.join(os.path.dirname(__file__), '..', 'benchmarks', 'corpus', '*.html')))
+
+
+@pytest.mark.parametrize("path", CORPUS_PAGES, ids=lambda path: os.path.basename(path)[:-len('.html')])
+def test_page_parser_does_not_change_the_markdown(path, monkeypatch):
+    """Test that pages parsed with lxml give the same Markdown they did with html.parser."""
+    with open(path, 'r', encoding='utf-8') as f:
+        raw_html = f.read()
+    article_url = get_base_url(raw_html)
+
+    markdown = extract_article_text(raw_html, TEST_SIGNATURE, article_url)
+    monkeypatch.setattr(newspaper_processor, "HTML_PARSER", "html.parser")
+
+    assert markdown is not None
+    assert markdown == extract_article_text(raw_html, TEST_SIGNATURE, article_url)
+
+
 def test_article_with_relative_urls():
     """Test processing an article with relative URLs."""
     html = """
@@ -347,3 +421,12 @@ def test_article_with_domain_redirect():
     result = extract_article_text(html, signature=TEST_SIGNATURE)
     assert "> Here is a [link](https://redirected.com/path/to/page)." in result
     assert "[Photo](https://redirected.com/images/photo.jpg)" in result
+
+
+def test_extraction_cache_key():
+    """Test that the cache key changes with anything that changes the extracted text."""
+    key = extraction_cache_key("<p>Article</p>", TEST_SIGNATURE)
+    assert key == extraction_cache_key("<p>Article</p>", TEST_SIGNATURE)
+    assert key != extraction_cache_key("<p>Article!</p>", TEST_SIGNATURE)
+    assert key != extraction_cache_key("<p>Article</p>", "<p>Other signature</p>")
+    assert key != extraction_cache_key("<p>Article</p>", TEST_SIGNATURE, [SiteProfile("example.com", "article")])
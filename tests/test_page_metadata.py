@@ -0,0 +1,60 @@
+import os
+
+from utils.page_metadata import PageMetadata, read_page_metadata
+
+
+def test_read_page_metadata():
+    html = """
+    <!DOCTYPE html>
+    <html lang="es-AR">
+        <head>
+            <title>Article</title>
+            <script>var html = "<body><link rel='canonical' href='https://wrong.com'>";</script>
+            <noscript><img src="https://tracker.com/pixel.gif"></noscript>
+            <link rel="Canonical" href="https://example.com/article?a=1&amp;b=2">
+            <meta property="og:url" content="https://example.com/og-article">
+            <meta property="og:image" content="https://example.com/image.jpg">
+            <meta property="og:image" content="https://example.com/second.jpg">
+            <meta property="og:title" content="Title">
+            <meta property="article:published_time" content="2025-03-18T03:01:00Z">
+        </head>
+        <body>
+            <meta property="og:title" content="Body title">
+        </body>
+    </html>
+    """
+    assert read_page_metadata(html) == PageMetadata(
+        canonical_url="https://example.com/article?a=1&b=2",
+        og_url="https://example.com/og-article",
+        og_image="https://example.com/image.jpg",
+        og_title="Title",
+        published_time="2025-03-18T03:01:00Z",
+        language="es-AR"
+    )
+
+
+def test_read_page_metadata_stops_at_body():
+    html = """
+    <meta http-equiv="Content-Language" content="en">
+    <div><link rel="canonical" href="https://example.com/body-link"></div>
+    """
+    metadata = read_page_metadata(html)
+
+    assert metadata.canonical_url is None
+    assert metadata.language == "en"
+    assert metadata.base_url is None
+
+
+def test_base_url_prefers_canonical():
+    assert PageMetadata(canonical_url="https://a.com", og_url="https://b.com").base_url == "https://a.com"
+    assert PageMetadata(canonical_url=None, og_url="https://b.com").base_url == "https://b.com"
+
+
+def test_read_page_metadata_from_file():
+    raw_html_path = os.path.join(os.path.dirname(__file__), 'data', 'raw_text.html')
+    with open(raw_html_path, 'r', encoding='utf-8') as f:
+        metadata = read_page_metadata(f.read())
+
+    assert metadata.canonical_url.startswith("https://www.lanacion.com.ar/autos/")
+    assert metadata.og_image.startswith("https://resizer.glanacion.com/")
+    assert metadata.language == "es"
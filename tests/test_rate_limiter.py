@@ -0,0 +1,59 @@
+from utils.rate_limiter import RateLimitScheduler
+
+
+def scheduler(limits: dict, reserve: int = 0) -> tuple[RateLimitScheduler, list[float]]:
+    slept = []
+    return RateLimitScheduler(lambda: limits, reserve=reserve, clock=lambda: 1000.0, sleep=slept.append), slept
+
+
+def test_unknown_limits_do_not_wait():
+    limiter, slept = scheduler({})
+    assert limiter.wait_for(5) == 0
+    assert slept == []
+
+
+def test_requests_within_the_remaining_quota_go_now():
+    limiter, slept = scheduler({"remaining": 5.0, "reset_timestamp": 1300.0}, reserve=2)
+    assert limiter.wait_for(3) == 0
+    assert slept == []
+
+
+def test_waits_exactly_until_the_window_resets():
+    limiter, slept = scheduler({"remaining": 5.0, "reset_timestamp": 1300.0}, reserve=2)
+    assert limiter.delay_for(4) == 300
+    assert limiter.wait_for(4) == 300
+    assert slept == [300]
+
+
+def test_a_window_that_already_reset_does_not_wait():
+    limiter, slept = scheduler({"remaining": 0.0, "reset_timestamp": 990.0})
+    assert limiter.wait_for(1) == 0
+    assert slept == []
+
+
+def test_without_a_reset_time_waits_for_the_next_window():
+    # 1000 is 400 seconds into the window that started at 600
+    limiter, slept = scheduler({"remaining": 0, "used": 600})
+    assert limiter.wait_for(1) == 200
+    assert slept == [200]
+
+
+def test_limits_from_a_past_window_do_not_wait():
+    now = [1000.0]
+    limiter = RateLimitScheduler(lambda: {"remaining": 0, "used": 600}, clock=lambda: now[0], sleep=lambda _: None)
+    assert limiter.wait_for(1) == 200
+
+    # No request was made since, so the limits were not refreshed for the new window
+    now[0] = 1250.0
+    assert limiter.wait_for(1) == 0
+
+
+def test_held_requests_count_against_the_quota_until_released():
+    limiter, slept = scheduler({"remaining": 5.0, "reset_timestamp": 1300.0}, reserve=1)
+    with limiter.hold(3) as waited:
+        assert waited == 0
+        # Another thread sharing the scheduler sees only one request left
+        assert limiter.delay_for(2) == 300
+        assert limiter.delay_for(1) == 0
+    assert limiter.delay_for(4) == 0
+    assert slept == []
@@ -0,0 +1,89 @@
+import resource
+import shutil
+
+import pytest
+
+from utils.readability_worker import ReadabilityWorker, WorkerError
+
+pytestmark = pytest.mark.skipif(shutil.which("node") is None, reason="node is not installed")
+
+STUB_PARSER = """
+module.exports = (html) => {
+    if (html === 'crash') process.exit(1);
+    if (html === 'hang') while (true) {}
+    if (html === 'throw') throw new Error('bad page');
+    if (html === 'none') return null;
+    return { title: 'Title', content: html, pid: process.pid };
+};
+"""
+
+
+@pytest.fixture
+def worker(tmp_path):
+    parser = tmp_path / "stub_parser.js"
+    parser.write_text(STUB_PARSER)
+    worker = ReadabilityWorker(timeout=2, parser=str(parser))
+    yield worker
+    worker.stop()
+
+
+def test_worker_is_reused_between_articles(worker):
+    first = worker.parse("  <p>one</p>  ")
+    second = worker.parse("<p>" + "ñ" * 200_000 + "</p>")
+
+    assert first["content"] == "<p>one</p>"
+    assert second["content"] == "<p>" + "ñ" * 200_000 + "</p>"
+    assert first["pid"] == second["pid"]
+
+
+def test_worker_reports_articles_without_content(worker):
+    assert worker.parse("none") is None
+
+
+def test_worker_errors_do_not_kill_it(worker):
+    pid = worker.parse("<p>one</p>")["pid"]
+    with pytest.raises(WorkerError, match="bad page"):
+        worker.parse("throw")
+
+    assert worker.parse("<p>two</p>")["pid"] == pid
+
+
+@pytest.mark.parametrize("html", ["crash", "hang"])
+def test_worker_is_restarted_after_it_dies(worker, html):
+    pid = worker.parse("<p>one</p>")["pid"]
+    with pytest.raises(WorkerError):
+        worker.parse(html)
+    assert not worker.is_alive()
+
+    assert worker.parse("<p>two</p>")["pid"] != pid
+
+
+class Interrupted(BaseException):
+    """Like the CPU budget, raised in the middle of a request."""
+
+
+def test_interrupted_request_does_not_leave_its_reply_for_the_next(worker, monkeypatch):
+    worker.start()
+
+    def interrupt(size, deadline):
+        raise Interrupted()
+    monkeypatch.setattr(worker, "_read_exact", interrupt)
+    with pytest.raises(Interrupted):
+        worker.parse("<p>one</p>")
+    monkeypatch.undo()
+
+    assert not worker.is_alive()
+    assert worker.parse("<p>two</p>")["content"] == "<p>two</p>"
+
+
+def test_worker_starts_under_a_pool_memory_budget(worker):
+    soft, hard = resource.getrlimit(resource.RLIMIT_AS)
+    # What a pool worker with a 256 MiB budget runs under, far less than Node reserves
+    resource.setrlimit(resource.RLIMIT_AS, (256 * 1024 * 1024, hard))
+    try:
+        worker.start()
+        assert resource.getrlimit(resource.RLIMIT_AS) == (256 * 1024 * 1024, hard)
+    finally:
+        resource.setrlimit(resource.RLIMIT_AS, (soft, hard))
+
+    assert worker.parse("<p>one</p>")["content"] == "<p>one</p>"
@@ -0,0 +1,79 @@
+import logging
+import time
+from types import SimpleNamespace
+
+import pytest
+
+from threads.reddit_fetch import RedditFetchThread
+
+
+def submission(reddit_id: str) -> SimpleNamespace:
+    return SimpleNamespace(
+        id=reddit_id,
+        url=f"https://www.clarin.com/{reddit_id}.html",
+        created_utc=time.time(),
+        subreddit=SimpleNamespace(display_name="argentina")
+    )
+
+
+class FakeStream:
+    """
+    A submission stream that records every poll, and every response with nothing new.
+    Like PRAW's, it polls again right away after a response with new submissions.
+    """
+
+    def __init__(self, responses, events):
+        self.responses = responses
+        self.events = events
+        self.pause_after = None
+
+    def submissions(self, skip_existing, pause_after=None):
+        self.pause_after = pause_after
+        for response in self.responses:
+            self.events.append("poll")
+            yield from response
+            if not response:
+                self.events.append("nothing new")
+                yield None
+
+
+def test_polls_are_paced_when_reddit_has_nothing_new(bot_db):
+    events = []
+    stream = FakeStream([[submission("a"), submission("b")], [], [submission("c")], [], [], []], events)
+    reddit = SimpleNamespace(subreddit=lambda name: SimpleNamespace(stream=stream))
+    thread = RedditFetchThread(reddit, logging.getLogger("test"), ["argentina"], banned_domains=[])
+
+    def wait(timeout):
+        events.append(("pause", timeout))
+        # Stop once the stream has been drained
+        if events.count("poll") == len(stream.responses):
+            thread._stop_event.set()
+        return False
+    thread._stop_event.wait = wait
+
+    thread.process_cycle()
+
+    # Each response without new submissions is followed by a growing pause before the next poll
+    for previous, following in zip(events, events[1:]):
+        if previous == "nothing new":
+            assert following[0] == "pause"
+    assert stream.pause_after >= 0
+    pauses = [event[1] for event in events if event[0] == "pause"]
+    assert len(pauses) == 4
+    assert 0 < pauses[0] and pauses[1] < pauses[2] < pauses[3]
+    assert sorted(row[0] for row in bot_db.execute("SELECT reddit_id FROM posts")) == ["a", "b", "c"]
+
+
+def test_submissions_seen_before_a_failed_poll_are_stored(bot_db):
+    def submissions(skip_existing, pause_after=None):
+        yield submission("a")
+        yield submission("b")
+        raise RuntimeError("received 503 HTTP response")
+    stream = SimpleNamespace(submissions=submissions)
+    reddit = SimpleNamespace(subreddit=lambda name: SimpleNamespace(stream=stream))
+    thread = RedditFetchThread(reddit, logging.getLogger("test"), ["argentina"], banned_domains=[])
+
+    with pytest.raises(RuntimeError):
+        thread.process_cycle()
+
+    assert sorted(row[0] for row in bot_db.execute("SELECT reddit_id FROM posts")) == ["a", "b"]
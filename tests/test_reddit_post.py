@@ -0,0 +1,125 @@
+import itertools
+import logging
+from types import SimpleNamespace
+
+from infrastructure.database import claim_posts_to_post, get_stats, insert_post, mark_post_as_fetched, mark_post_as_processed, store_chunks
+from threads.reddit_post import RedditPostThread
+from utils.rate_limiter import RateLimitScheduler
+
+
+class FakeComment:
+    """A comment or submission that can be replied to, like PRAW's."""
+
+    def __init__(self, reddit: "FakeReddit", comment_id: str, body: str = ""):
+        self.reddit = reddit
+        self.id = comment_id
+        self.body = body
+        self.replies: list["FakeComment"] = []
+        self.mod = self
+        self.stickied = False
+
+    def reply(self, body: str) -> "FakeComment":
+        if body in self.reddit.failing_bodies:
+            raise RuntimeError("RATELIMIT: you are doing that too much")
+        comment = FakeComment(self.reddit, f"c{next(self.reddit.ids)}", body)
+        self.replies.append(comment)
+        self.reddit.comments[comment.id] = comment
+        return comment
+
+    def distinguish(self, sticky: bool = False) -> None:
+        self.stickied = sticky
+
+
+class FakeReddit:
+    """Stands in for praw.Reddit, keeping every comment tree in memory."""
+
+    def __init__(self):
+        self.ids = itertools.count(1)
+        self.submissions: dict[str, FakeComment] = {}
+        self.comments: dict[str, FakeComment] = {}
+        self.failing_bodies: set[str] = set()
+        # What PRAW read from the X-Ratelimit headers of the last response
+        self.auth = SimpleNamespace(limits={})
+
+    def submission(self, id: str) -> FakeComment:
+        return self.submissions.setdefault(id, FakeComment(self, id))
+
+    def comment(self, id: str) -> FakeComment:
+        return self.comments[id]
+
+
+def add_processed_post(bot_db, reddit_id: str, chunks: list[str]) -> int:
+    insert_post(reddit_id, "testempleadoestatal", f"https://www.clarin.com/{reddit_id}.html", 1_700_000_000)
+    post_id = bot_db.execute("SELECT id FROM posts WHERE reddit_id = ?", (reddit_id,)).fetchone()[0]
+    mark_post_as_fetched(post_id, "<html></html>")
+    mark_post_as_processed(post_id, "\n".join(chunks))
+    store_chunks(post_id, chunks)
+    return post_id
+
+
+def chain(comment: FakeComment) -> list[str]:
+    """Bodies of a comment tree that must be a single reply chain."""
+    bodies = []
+    while comment.replies:
+        assert len(comment.replies) == 1
+        comment = comment.replies[0]
+        bodies.append(comment.body)
+    return bodies
+
+
+def test_posting_resumes_after_the_last_posted_comment(bot_db):
+    reddit = FakeReddit()
+    thread = RedditPostThread(reddit, logging.getLogger("test"))
+    add_processed_post(bot_db, "abc", ["one", "two", "three"])
+
+    # Rate limited on the second comment
+    reddit.failing_bodies = {"two"}
+    thread.process_cycle()
+    assert chain(reddit.submission("abc")) == ["one"]
+    rows = bot_db.execute("SELECT comment_id FROM chunks ORDER BY position").fetchall()
+    assert rows == [("c1",), (None,), (None,)]
+
+    reddit.failing_bodies = set()
+    thread.process_cycle()
+
+    submission = reddit.submission("abc")
+    assert chain(submission) == ["one", "two", "three"]
+    assert submission.replies[0].stickied
+    assert claim_posts_to_post("test") == []
+
+
+def test_posting_waits_for_the_rate_limit_window_to_reset(bot_db):
+    reddit = FakeReddit()
+    thread = RedditPostThread(reddit, logging.getLogger("test"))
+    thread.scheduler.reserve = 0
+    thread.scheduler.clock = lambda: 1000.0
+    slept = []
+    thread.scheduler.sleep = slept.append
+    add_processed_post(bot_db, "abc", ["one", "two", "three"])
+
+    # Three comments and the pin do not fit in the two requests left
+    reddit.auth.limits = {"remaining": 2.0, "reset_timestamp": 1042.0, "used": 598}
+    thread.process_cycle()
+
+    assert slept == [42.0]
+    assert chain(reddit.submission("abc")) == ["one", "two", "three"]
+    stats = get_stats()
+    assert stats["rate_limit_wait_seconds"] == 42
+    assert stats["posting_queue_waits"] == 1
+
+
+def test_post_threads_sharing_a_scheduler_wait_for_each_others_comments(bot_db):
+    reddit = FakeReddit()
+    slept = []
+    scheduler = RateLimitScheduler(lambda: reddit.auth.limits, clock=lambda: 1000.0, sleep=slept.append)
+    poster = RedditPostThread(reddit, logging.getLogger("test"), scheduler=scheduler)
+    add_processed_post(bot_db, "abc", ["one", "two"])
+
+    # Two comments and the pin fit in the six requests left, but not next to four another thread is posting
+    reddit.auth.limits = {"remaining": 6.0, "reset_timestamp": 1042.0, "used": 594}
+    with scheduler.hold(4):
+        poster.process_cycle()
+
+    assert slept == [42.0]
+    assert chain(reddit.submission("abc")) == ["one", "two"]
+    assert scheduler.delay_for(6) == 0
@@ -0,0 +1,79 @@
+import os
+import threading
+
+from infrastructure.response_cache import CachedResponse, ResponseCache
+
+
+def entry(url: str, text: str = "<p>Article</p>") -> CachedResponse:
+    return CachedResponse(url=url, text=text, etag='"v1"')
+
+
+def test_put_and_get(tmp_path):
+    cache = ResponseCache(tmp_path)
+    cache.put("https://example.com/a", entry("https://example.com/a"))
+
+    assert cache.get("https://example.com/a") == entry("https://example.com/a")
+    assert cache.get("https://example.com/b") is None
+
+
+def test_responses_without_validators_are_not_stored(tmp_path):
+    cache = ResponseCache(tmp_path)
+    cache.put("https://example.com/a", CachedResponse(url="https://example.com/a", text="<p>Article</p>"))
+
+    assert cache.get("https://example.com/a") is None
+    assert len(cache) == 0
+
+
+def test_least_recently_used_entries_are_evicted(tmp_path):
+    text = "x" * 1000
+    cache = ResponseCache(tmp_path, max_bytes=2500)
+    cache.put("a", entry("a", text))
+    cache.put("b", entry("b", text))
+    cache.get("a")
+    cache.put("c", entry("c", text))
+
+    assert cache.get("a") is not None
+    assert cache.get("b") is None
+    assert cache.get("c") is not None
+    assert cache.size() <= 2500
+    assert len(os.listdir(tmp_path)) == 2
+
+
+def test_index_survives_restart(tmp_path):
+    ResponseCache(tmp_path).put("a", entry("a"))
+
+    cache = ResponseCache(tmp_path)
+    assert cache.get("a") == entry("a")
+    assert cache.size() > 0
+
+
+def test_unreadable_entries_are_dropped(tmp_path):
+    cache = ResponseCache(tmp_path)
+    cache.put("a", entry("a"))
+    for name in os.listdir(tmp_path):
+        (tmp_path / name).write_text("not json")
+
+    assert cache.get("a") is None
+    assert len(cache) == 0
+
+
+def test_threads_sharing_a_cache_stay_within_max_bytes(tmp_path):
+    text = "x" * 1000
+    cache = ResponseCache(tmp_path, max_bytes=10_000)
+
+    def fill(thread: int) -> None:
+        for i in range(50):
+            key = f"{thread}-{i}"
+            cache.put(key, entry(key, text))
+            cache.get(f"{thread}-{i // 2}")
+
+    threads = [threading.Thread(target=fill, args=(thread,)) for thread in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    files = list(tmp_path.glob("*.json"))
+    assert cache.size() == sum(path.stat().st_size for path in files) <= 10_000
+    assert len(cache) == len(files)
+    assert not list(tmp_path.glob("*.tmp"))
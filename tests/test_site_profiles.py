@@ -0,0 +1,87 @@
+import bs4
+
+from utils.newspaper_processor import extract_article
+from utils.site_profiles import SiteProfile, extract_with_profile, load_site_profiles, match_site_profile
+
+SIGNATURE = '<div id="firma"><hr><p><a href="https://example.com">Source Code</a></p></div>'
+
+PROFILE = SiteProfile(
+    domain="example.com",
+    title="h1.headline",
+    body="div.story",
+    image="meta[property='og:image']",
+    drop=(".ad", "script")
+)
+
+HTML = """
+<html>
+    <head>
+        <title>Example | Site name</title>
+        <link rel="canonical" href="https://www.example.com/news/article">
+        <meta property="og:image" content="https://example.com/lead.jpg">
+    </head>
+    <body>
+        <h1 class="headline">Headline</h1>
+        <div class="story">
+            <p>First paragraph with a <a href="/other">link</a>.</p>
+            <div class="ad">Buy now</div>
+            <script>track()</script>
+            <p>Second paragraph.</p>
+        </div>
+    </body>
+</html>
+"""
+
+
+def test_load_site_profiles():
+    profiles = load_site_profiles({
+        "Example.com": {"body": "article", "title": "h1", "drop": [".ad"]},
+        "other.com": {"body": "main"},
+    })
+
+    assert profiles == (
+        SiteProfile("example.com", "article", title="h1", drop=(".ad",)),
+        SiteProfile("other.com", "main"),
+    )
+    assert load_site_profiles(None) == ()
+
+
+def test_match_site_profile():
+    assert match_site_profile([PROFILE], "https://example.com/a") == PROFILE
+    assert match_site_profile([PROFILE], "https://www.example.com:443/a") == PROFILE
+    assert match_site_profile([PROFILE], "https://notexample.com/a") is None
+    assert match_site_profile([PROFILE], None) is None
+
+
+def test_extract_with_profile():
+    article = extract_with_profile(bs4.BeautifulSoup(HTML, "lxml"), PROFILE)
+
+    assert article["title"] == "Headline"
+    assert article["lead_image_url"] == "https://example.com/lead.jpg"
+    assert "Second paragraph." in article["content"]
+    assert "Buy now" not in article["content"]
+    assert "track()" not in article["content"]
+
+
+def test_extract_with_profile_falls_back_to_page_title():
+    profile = PROFILE._replace(title=None)
+    article = extract_with_profile(bs4.BeautifulSoup(HTML, "lxml"), profile)
+
+    assert article["title"] == "Example | Site name"
+
+
+def test_extract_with_profile_without_body():
+    profile = PROFILE._replace(body="div.missing")
+
+    assert extract_with_profile(bs4.BeautifulSoup(HTML, "lxml"), profile) is None
+
+
+def test_extract_article_uses_matching_profile():
+    result = extract_article(HTML, SIGNATURE, profiles=[PROFILE])
+
+    assert result.profile == "example.com"
+    assert result.profile_hit
+    assert "> # [Headline](https://example.com/lead.jpg)" in result.text
+    assert "> First paragraph with a [link](https://www.example.com/other)." in result.text
+    assert "Buy now" not in result.text
+    assert result.text.endswith("[Source Code](https://example.com)")
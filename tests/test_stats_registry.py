@@ -0,0 +1,151 @@
+import logging
+import os
+import sqlite3
+import subprocess
+import sys
+import textwrap
+from pathlib import Path
+
+import pytest
+
+from infrastructure import database
+from infrastructure.database import (
+    flush_stats,
+    get_stats,
+    mark_post_as_skipped,
+    record_connection_reuse,
+    record_http_cache_lookups
+)
+from infrastructure.stats_registry import PendingStats, StatsRegistry
+from threads.stats_flush_thread import StatsFlushThread
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+
+
+def stored_stats(bot_db) -> dict[str, int]:
+    return dict(bot_db.execute("SELECT stat_name, stat_value FROM post_stats"))
+
+
+def test_registry_hands_over_pending_changes_once():
+    registry = StatsRegistry()
+    registry.increment("posts_posted")
+    registry.increment("posts_posted", 2)
+    registry.increment("posts_skipped", 0)
+    registry.record_min("oldest_post", 20)
+    registry.record_min("oldest_post", 10)
+    registry.record_max("newest_post", 30)
+
+    pending = registry.take()
+    assert pending == PendingStats({"posts_posted": 3}, {"oldest_post": 10}, {"newest_post": 30})
+    assert registry.take() == PendingStats({}, {}, {})
+
+    # Changes that failed to be written are merged with those counted since
+    registry.increment("posts_posted")
+    registry.record_min("oldest_post", 15)
+    registry.restore(pending)
+    assert registry.peek() == PendingStats({"posts_posted": 4}, {"oldest_post": 10}, {"newest_post": 30})
+
+    stats = {"posts_posted": 1, "oldest_post": 0, "newest_post": 40}
+    assert StatsRegistry.apply(stats, registry.peek()) == {"posts_posted": 5, "oldest_post": 10, "newest_post": 40}
+
+
+def test_stats_are_live_before_they_are_flushed(bot_db):
+    mark_post_as_skipped()
+    record_http_cache_lookups(3, 1)
+    record_connection_reuse(5, 4)
+
+    assert stored_stats(bot_db)["posts_skipped"] == 0
+    assert get_stats()["posts_skipped"] == 1
+
+    flush_stats()
+    stats = stored_stats(bot_db)
+    assert (stats["posts_skipped"], stats["http_cache_hits"], stats["http_cache_misses"]) == (1, 3, 1)
+    assert (stats["http_requests"], stats["http_connections_reused"]) == (5, 4)
+    assert get_stats() == stats
+
+
+def test_failed_flush_writes_nothing_and_is_retried(bot_db):
+    mark_post_as_skipped()
+    record_http_cache_lookups(2, 0)
+    bot_db.execute("""
+        CREATE TRIGGER fail_flush BEFORE UPDATE ON post_stats
+        WHEN NEW.stat_name = 'http_cache_hits'
+        BEGIN SELECT RAISE(ABORT, 'disk I/O error'); END
+    """)
+    bot_db.commit()
+
+    with pytest.raises(sqlite3.Error):
+        flush_stats()
+    # The skipped count was written before the failing update, and rolled back with it
+    assert stored_stats(bot_db)["posts_skipped"] == 0
+    mark_post_as_skipped()
+    assert get_stats()["posts_skipped"] == 2
+
+    bot_db.execute("DROP TRIGGER fail_flush")
+    bot_db.commit()
+    flush_stats()
+    flush_stats()
+    stats = stored_stats(bot_db)
+    assert (stats["posts_skipped"], stats["http_cache_hits"]) == (2, 2)
+
+
+def test_stopping_the_flush_thread_writes_what_is_left(bot_db):
+    thread = StatsFlushThread(logging.getLogger("test"), interval=3600)
+    thread.start()
+    mark_post_as_skipped()
+    thread.stop()
+    thread.join(timeout=5)
+
+    # stop() closes the calling thread's connection
+    assert stored_stats(database.get_db_connection())["posts_skipped"] == 1
+
+
+def run_child(data_dir: Path, code: str) -> subprocess.CompletedProcess:
+    return subprocess.run(
+        [sys.executable, "-c", textwrap.dedent(code)],
+        cwd=PROJECT_ROOT,
+        env={**os.environ, "DATA_DIR": str(data_dir)},
+        timeout=60
+    )
+
+
+def test_a_crash_loses_only_what_was_not_flushed(tmp_path):
+    child = run_child(tmp_path, """
+        import os
+        from infrastructure.database import flush_stats, init_db, insert_post, mark_post_as_skipped
+
+        init_db()
+        insert_post("a", "argentina", "https://clarin.com/nota.html", 1_700_000_000)
+        mark_post_as_skipped()
+        flush_stats()
+        insert_post("b", "argentina", "https://clarin.com/otra.html", 1_700_000_100)
+        mark_post_as_skipped()
+        # Killed before the next flush
+        os._exit(1)
+    """)
+    assert child.returncode == 1
+
+    conn = sqlite3.connect(tmp_path / "bot.db")
+    try:
+        assert conn.execute("PRAGMA integrity_check").fetchone() == ("ok",)
+        stats = dict(conn.execute("SELECT stat_name, stat_value FROM post_stats"))
+        assert (stats["total_posts"], stats["posts_skipped"], stats["newest_post"]) == (1, 1, 1_700_000_000)
+        # The posts themselves were committed when they were inserted
+        assert conn.execute("SELECT COUNT(*) FROM posts").fetchone() == (2,)
+    finally:
+        conn.close()
+
+    # Restarting neither loses nor repeats the flushed counts
+    child = run_child(tmp_path, """
+        from infrastructure.database import flush_stats, init_db, mark_post_as_skipped
+
+        init_db()
+        mark_post_as_skipped()
+        flush_stats()
+    """)
+    assert child.returncode == 0
+    conn = sqlite3.connect(tmp_path / "bot.db")
+    try:
+        assert conn.execute("SELECT stat_value FROM post_stats WHERE stat_name = 'posts_skipped'").fetchone() == (2,)
+    finally:
+        conn.close()
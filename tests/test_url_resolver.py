@@ -0,0 +1,71 @@
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from infrastructure.database import get_cached_redirect
+from infrastructure.url_resolver import UrlResolver
+
+
+class ShortenerHandler(BaseHTTPRequestHandler):
+    """Redirect /s/<code> to /article/<code>, counting requests."""
+    protocol_version = "HTTP/1.1"
+    requests = 0
+
+    def do_HEAD(self):
+        ShortenerHandler.requests += 1
+        if self.path.startswith("/s/"):
+            self.send_response(301)
+            self.send_header("Location", f"/article/{self.path[3:]}")
+        else:
+            self.send_response(200)
+            self.send_header("Content-Type", "text/html")
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture
+def server_url():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), ShortenerHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    ShortenerHandler.requests = 0
+    yield f"http://127.0.0.1:{server.server_address[1]}"
+    server.shutdown()
+    server.server_close()
+
+
+def test_is_shortened():
+    resolver = UrlResolver(["t.co", "bit.ly"])
+
+    assert resolver.is_shortened("https://t.co/abc")
+    assert resolver.is_shortened("https://www.bit.ly/abc")
+    assert not resolver.is_shortened("https://clarin.com/nota.html")
+
+
+def test_non_shortened_urls_are_returned_untouched():
+    resolver = UrlResolver(["t.co"])
+
+    assert resolver.resolve("https://clarin.com/nota.html") == "https://clarin.com/nota.html"
+
+
+def test_short_links_are_resolved_and_cached(bot_db, server_url):
+    resolver = UrlResolver(["127.0.0.1"], timeout=5)
+    short_url = f"{server_url}/s/abc"
+
+    assert resolver.resolve(short_url) == f"{server_url}/article/abc"
+    assert get_cached_redirect(short_url, 60) == f"{server_url}/article/abc"
+    requests_after_first_resolve = ShortenerHandler.requests
+
+    assert resolver.resolve(short_url) == f"{server_url}/article/abc"
+    assert ShortenerHandler.requests == requests_after_first_resolve
+
+
+def test_unreachable_short_links_fall_back_to_the_original_url(bot_db):
+    resolver = UrlResolver(["127.0.0.1"], timeout=5)
+
+    assert resolver.resolve("http://127.0.0.1:1/s/abc") == "http://127.0.0.1:1/s/abc"
+    assert get_cached_redirect("http://127.0.0.1:1/s/abc", 60) is None
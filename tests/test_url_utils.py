@@ -0,0 +1,36 @@
+from utils.url_utils import canonicalize_url
+
+
+def test_tracking_params_and_fragments_are_dropped():
+    assert canonicalize_url(
+        "https://www.lanacion.com.ar/politica/nota-nid123/?utm_source=twitter&fbclid=abc#comentarios"
+    ) == "https://lanacion.com.ar/politica/nota-nid123"
+
+
+def test_scheme_www_and_trailing_slash_are_ignored():
+    assert canonicalize_url("http://lanacion.com.ar/politica/nota-nid123/") == canonicalize_url(
+        "https://www.lanacion.com.ar/politica/nota-nid123"
+    )
+
+
+def test_amp_variants_share_a_key():
+    expected = "https://clarin.com/politica/nota.html"
+    assert canonicalize_url("https://www.clarin.com/politica/nota.html") == expected
+    assert canonicalize_url("https://amp.clarin.com/politica/nota.html") == expected
+    assert canonicalize_url("https://www.clarin.com/amp/politica/nota.html") == expected
+    assert canonicalize_url("https://www.clarin.com/politica/nota.html?outputType=amp") == expected
+    assert canonicalize_url("https://infobae.com/politica/nota/amp/") == "https://infobae.com/politica/nota"
+
+
+def test_meaningful_query_params_are_kept_and_sorted():
+    assert canonicalize_url("https://example.com/nota?id=2&page=1&utm_medium=social") == (
+        "https://example.com/nota?id=2&page=1"
+    )
+    assert canonicalize_url("https://example.com/nota?page=1&id=2") == canonicalize_url(
+        "https://example.com/nota?id=2&page=1"
+    )
+
+
+def test_non_default_port_is_kept():
+    assert canonicalize_url("https://example.com:8080/nota") == "https://example.com:8080/nota"
+    assert canonicalize_url("https://example.com:443/nota") == "https://example.com/nota"
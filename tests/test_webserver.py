@@ -0,0 +1,35 @@
+import logging
+import threading
+import time
+
+from infrastructure.webserver import get_thread_intervals
+from threads.base_thread import BaseThread
+
+
+class IdleThread(BaseThread):
+    def __init__(self):
+        super().__init__(logging.getLogger("test"), interval=10, max_interval=80, batch_limit=5)
+        self.cycle_done = threading.Event()
+
+    def process_cycle(self):
+        self.cycle_done.set()
+        return 0
+
+
+def test_thread_intervals_are_read_off_running_threads(bot_db):
+    thread = IdleThread()
+    thread.name = "IdleThread-1"
+    thread.start()
+    try:
+        assert thread.cycle_done.wait(5)
+        # The idle cycle doubles the interval right after it returns
+        deadline = time.monotonic() + 5
+        while thread.current_interval == 10 and time.monotonic() < deadline:
+            time.sleep(0.01)
+        intervals = [entry for entry in get_thread_intervals() if entry['name'] == "IdleThread-1"]
+    finally:
+        thread.stop()
+        thread.join(5)
+
+    assert intervals == [{'name': "IdleThread-1", 'current_seconds': 20, 'max_seconds': 80}]
+    assert not any(entry['name'] == "IdleThread-1" for entry in get_thread_intervals())
@@ -1,15 +1,41 @@
+import os
+import socket
 import threading
 import time
 import logging
 from abc import ABC, abstractmethod
-from infrastructure.database import close_db_connection
+from typing import Optional
+from infrastructure.database import DEFAULT_LEASE_SECONDS, close_db_connection
+
+# Stages a thread can be woken up for, named after the work they pick up
+STAGE_FETCH = 'fetch'
+STAGE_PROCESS = 'process'
+STAGE_POST = 'post'
+
+_stage_events: dict[str, threading.Event] = {}
+_stage_events_lock = threading.Lock()
+
+
+def stage_event(stage: str) -> threading.Event:
+    """Return the event a stage's thread waits on between cycles."""
+    with _stage_events_lock:
+        return _stage_events.setdefault(stage, threading.Event())
+
+
+def notify_stage(stage: str) -> None:
+    """Wake the thread of a stage, called once work for it has been committed."""
+    stage_event(stage).set()
+
 
 class BaseThread(threading.Thread, ABC):
     def __init__(
         self,
         logger: logging.Logger,
         interval: int = 60,
-        error_interval: int = 60
+        error_interval: int = 60,
+        stage: Optional[str] = None,
+        max_interval: Optional[int] = None,
+        batch_limit: Optional[int] = None
     ):
         super().__init__()
         self.daemon = True  # Thread will exit when main program exits
@@ -17,16 +43,48 @@ class BaseThread(threading.Thread, ABC):
         self.interval = interval
         self.error_interval = error_interval
         self.logger = logger
+        # Threads with a stage also run as soon as upstream work arrives, the interval is a fallback poll
+        self.stage = stage
+        self._wake_event = stage_event(stage) if stage else threading.Event()
+        # With a batch limit, cycles that fill a batch are followed by another one straight away and
+        # idle cycles double the wait up to max_interval; current_interval is the wait in effect
+        self.max_interval = max_interval or interval
+        self.batch_limit = batch_limit
+        self.current_interval = interval
+        # Posts a thread claims are its own for this long, then another worker may take them over
+        self.lease_seconds = DEFAULT_LEASE_SECONDS
+
+    @property
+    def worker_id(self) -> str:
+        """Identify this thread as the holder of the posts it claims, across processes and hosts."""
+        return f"{socket.gethostname()}:{os.getpid()}:{self.name}"
 
     def stop(self):
         """Stop the thread gracefully."""
         self._stop_event.set()
+        self._wake_event.set()
         close_db_connection()
 
     @abstractmethod
-    def process_cycle(self) -> None:
-        """Implement the main processing logic for each cycle."""
-        pass
+    def process_cycle(self) -> Optional[int]:
+        """
+        Implement the main processing logic for each cycle.
+        Returns how many items the cycle picked up, or None to always wait the interval.
+        """
+
+    def next_interval(self, picked_up: Optional[int]) -> float:
+        """Return how long to wait after a cycle that picked up `picked_up` items."""
+        if picked_up is None or self.batch_limit is None:
+            return self.interval
+        if picked_up >= self.batch_limit:
+            # There is probably a backlog, keep draining it
+            return 0
+        if picked_up:
+            return self.interval
+        return min(self.max_interval, max(self.current_interval * 2, self.interval))
+
+    def cleanup(self) -> None:
+        """Release resources held by the thread. Runs on the thread before it exits."""
 
     def run(self):
         """Main thread loop that handles the common thread lifecycle."""
@@ -36,12 +94,17 @@ class BaseThread(threading.Thread, ABC):
             while not self._stop_event.is_set():
                 try:
                     self.logger.debug("Starting processing cycle...")
-                    self.process_cycle()
-                    self.logger.debug("Processing cycle completed")
-                    time.sleep(self.interval)
+                    # Cleared first, so work committed while the cycle runs triggers another one
+                    self._wake_event.clear()
+                    picked_up = self.process_cycle()
+                    self.current_interval = self.next_interval(picked_up)
+                    self.logger.debug(f"Processing cycle completed, next one in {self.current_interval} seconds")
+                    if self.current_interval:
+                        self._wake_event.wait(self.current_interval)
                 except Exception as e:
                     self.logger.error(f"Error: {e}")
                     time.sleep(self.error_interval)
         finally:
+            self.cleanup()
             close_db_connection()
             self.logger.info("Thread stopped") 
\ No newline at end of file
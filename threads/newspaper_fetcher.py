@@ -1,53 +1,173 @@
 import logging
+import os
 import time
-from curl_cffi import requests
-from .base_thread import BaseThread
+from collections import defaultdict
+from pathlib import Path
+from typing import Optional
+from .base_thread import BaseThread, STAGE_FETCH, STAGE_PROCESS, notify_stage
+from infrastructure.config import load_config
+from infrastructure.http_client import ArticleFetcher, get_host
+from infrastructure.response_cache import ResponseCache
 from infrastructure.database import (
-    get_posts_to_fetch, 
-    mark_post_as_fetched, 
-    handle_fetch_retry
+    claim_posts_to_fetch,
+    mark_posts_as_fetched_many,
+    mark_post_as_skipped,
+    handle_fetch_retry,
+    defer_posts,
+    delete_post,
+    record_connection_reuse,
+    record_http_cache_lookups,
+    record_stage_idle,
+    release_claims
 )
+from utils.backoff import CircuitBreaker, compute_backoff
+
+def create_circuit_breaker(fetcher_config: dict) -> CircuitBreaker:
+    """Build the circuit breaker the fetcher threads share, so they agree on which hosts are failing."""
+    return CircuitBreaker(
+        threshold=fetcher_config.get('circuit_breaker_threshold', 3),
+        cooldown=fetcher_config.get('circuit_breaker_cooldown', 600)
+    )
+
+def create_response_cache(fetcher_config: dict) -> Optional[ResponseCache]:
+    """Build the response cache the fetcher threads share, None if it is disabled."""
+    # Setting http_cache_max_bytes to 0 disables the response cache
+    cache_max_bytes = fetcher_config.get('http_cache_max_bytes', 256 * 1024 * 1024)
+    if not cache_max_bytes:
+        return None
+    cache_dir = Path(os.environ.get("DATA_DIR", "data")) / "http_cache"
+    return ResponseCache(cache_dir, max_bytes=cache_max_bytes)
 
 class NewspaperFetcherThread(BaseThread):
-    def __init__(self, logger: logging.Logger):
-        super().__init__(logger)
-    
-    def process_cycle(self):
-        """Fetch and process newspaper articles."""
+    def __init__(
+        self,
+        logger: logging.Logger,
+        breaker: Optional[CircuitBreaker] = None,
+        cache: Optional[ResponseCache] = None
+    ):
+        super().__init__(logger, stage=STAGE_FETCH, max_interval=300)
+        self.config = load_config()
+        fetcher_config = self.config.get('newspaper_fetcher', {})
+        self.batch_size = fetcher_config.get('batch_size', 10)
+        self.batch_limit = self.batch_size
+        self.retry_base_delay = fetcher_config.get('retry_base_delay', 300)
+        self.retry_max_delay = fetcher_config.get('retry_max_delay', 3600)
+        # Threads of the stage must share these, the cache directory holds a single cache; a thread
+        # started on its own builds them. An empty cache is falsy, hence the None checks.
+        self.breaker = breaker if breaker is not None else create_circuit_breaker(fetcher_config)
+        self.cache = cache if cache is not None else create_response_cache(fetcher_config)
+        self.fetcher = ArticleFetcher(
+            max_concurrency=fetcher_config.get('max_concurrency', 10),
+            max_per_host=fetcher_config.get('max_per_host', 2),
+            timeout=fetcher_config.get('timeout', 10),
+            max_sessions=fetcher_config.get('max_sessions', 32),
+            dns_cache_ttl=fetcher_config.get('dns_cache_ttl', 300),
+            max_body_bytes=fetcher_config.get('max_body_bytes', 2 * 1024 * 1024),
+            breaker=self.breaker,
+            cache=self.cache
+        )
+
+    def schedule_retry(self, post_id: int, retry_count: int) -> None:
+        """Schedule another fetch attempt for a post, skipping it once retries run out."""
+        # Exponential backoff with jitter: ~5 minutes, ~10 minutes, ~20 minutes...
+        retry_time = int(time.time()) + compute_backoff(retry_count, self.retry_base_delay, self.retry_max_delay)
+        if handle_fetch_retry(post_id, retry_time, self.worker_id):
+            self.logger.info(f"Post {post_id} was skipped due to max retries")
+
+    def store_fetched(self, fetched: list[tuple[int, str]]) -> None:
+        """Store the pages of a batch, releasing the posts to be fetched again if that fails."""
+        if not fetched:
+            return
         try:
-            # Get posts that are ready to be fetched
-            posts = get_posts_to_fetch()
+            stored = mark_posts_as_fetched_many(fetched, self.worker_id)
+        except Exception as e:
+            self.logger.error(f"Error storing {len(fetched)} fetched pages: {e}")
+            release_claims([post_id for post_id, _ in fetched], self.worker_id)
+            return
+        if len(stored) < len(fetched):
+            lost = sorted({post_id for post_id, _ in fetched} - set(stored))
+            self.logger.warning(f"Dropped the pages of posts {lost}, another worker took them over")
+        if stored:
+            notify_stage(STAGE_PROCESS)
+
+    def defer_open_circuits(self, post_ids_by_host: dict[str, list[int]]) -> None:
+        """Push back every post of a host whose circuit is open until it may be tried again."""
+        for host, post_ids in post_ids_by_host.items():
+            retry_at = self.breaker.retry_at(host)
+            deferred = defer_posts(post_ids, retry_at, self.worker_id)
+            retry_at_str = time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(retry_at))
+            self.logger.warning(f"Circuit open for {host}, deferred {len(deferred)} posts until {retry_at_str}")
+
+    def process_cycle(self) -> int:
+        """Fetch and process newspaper articles. Returns how many posts were picked up."""
+        try:
+            # Claim posts that are ready to be fetched, other fetcher threads skip them
+            posts = claim_posts_to_fetch(self.worker_id, self.batch_size, self.lease_seconds)
             if posts:
                 self.logger.info(f"Found {len(posts)} posts ready to fetch")
-                
-                for post_id, url in posts:
+                record_stage_idle(STAGE_FETCH, [post_id for post_id, _, _ in posts])
+                retry_counts = {post_id: retry_count for post_id, _, retry_count in posts}
+                deferred = defaultdict(list)
+                fetched = []
+                cache_hits = cache_misses = 0
+                connections = self.fetcher.connection_totals()
+
+                # Download the whole batch concurrently
+                for result in self.fetcher.fetch_many([(post_id, url) for post_id, url, _ in posts]):
+                    post_id, url = result.post_id, result.url
                     try:
-                        # Fetch the article
-                        self.logger.info(f"Fetching article from {url}")
-
-                        response = requests.get(url, impersonate="chrome", timeout=10)
-                        if response.status_code != 200:
-                            self.logger.error(f"Failed to fetch {url}: {response.status_code}")
-                            # Calculate retry time: 5 minutes * (2 ^ retry_count)
-                            retry_time = int(time.time()) + (300 * (2 ** 0))  # Start with 5 minutes
-                            if handle_fetch_retry(post_id, retry_time):
-                                self.logger.info(f"Post {post_id} was skipped due to max retries")
+                        if result.circuit_open:
+                            deferred[get_host(url)].append(post_id)
+                            continue
+
+                        if result.error is not None:
+                            self.logger.error(f"Error processing {url}: {result.error}")
+                            self.schedule_retry(post_id, retry_counts[post_id])
                             continue
-                            
-                        # Store the raw text
-                        raw_text = response.text
-                        mark_post_as_fetched(post_id, raw_text)
-                        self.logger.info(f"Fetched {len(raw_text)} characters from {url}")
-                        
-                        
+
+                        if result.status_code != 200:
+                            self.logger.error(f"Failed to fetch {url}: {result.status_code}")
+                            self.schedule_retry(post_id, retry_counts[post_id])
+                            continue
+
+                        if result.skip_reason:
+                            # Retrying would not change what the newspaper serves us
+                            self.logger.info(f"Skipping {url}: {result.skip_reason}")
+                            if delete_post(post_id, self.worker_id):
+                                mark_post_as_skipped()
+                            continue
+
+                        if result.truncated:
+                            self.logger.warning(f"Truncated {url} at {self.fetcher.max_body_bytes} bytes")
+
+                        # Stored with the rest of the batch, in one transaction
+                        fetched.append((post_id, result.text))
+                        if result.from_cache:
+                            cache_hits += 1
+                            self.logger.info(f"Reused cached {len(result.text)} characters for {url}")
+                        else:
+                            cache_misses += 1
+                            self.logger.info(f"Fetched {len(result.text)} characters from {url}")
+
                     except Exception as e:
                         self.logger.error(f"Error processing {url}: {e}")
-                        # Calculate retry time: 5 minutes * (2 ^ retry_count)
-                        retry_time = int(time.time()) + (300 * (2 ** 0))  # Start with 5 minutes
-                        if handle_fetch_retry(post_id, retry_time):
-                            self.logger.info(f"Post {post_id} was skipped due to max retries")
+                        self.schedule_retry(post_id, retry_counts[post_id])
                         continue
-                        
+
+                self.store_fetched(fetched)
+                self.defer_open_circuits(deferred)
+                if self.cache is not None:
+                    record_http_cache_lookups(cache_hits, cache_misses)
+                # How many of the batch's requests went out over a connection kept from before
+                totals = self.fetcher.connection_totals()
+                record_connection_reuse(totals.requests - connections.requests, totals.reused - connections.reused)
+
+            return len(posts)
+
         except Exception as e:
             self.logger.error(f"Error in fetch cycle: {e}")
-            raise 
\ No newline at end of file
+            raise
+
+    def cleanup(self):
+        """Close the pooled HTTP sessions."""
+        self.fetcher.close()
@@ -1,43 +1,204 @@
 import logging
-from .base_thread import BaseThread
-from utils.newspaper_processor import extract_article_text
+from .base_thread import BaseThread, STAGE_POST, STAGE_PROCESS, notify_stage
 from infrastructure.config import load_config
-from infrastructure.database import get_posts_to_process, mark_post_as_processed, delete_post
+from infrastructure.extraction_pool import ExtractionPool
+from infrastructure.http_client import get_host
+from utils.comment_splitter import split_comment
+from utils.newspaper_processor import extraction_cache_key
+from utils.site_profiles import load_site_profiles
+from infrastructure.database import (
+    claim_posts_to_process,
+    mark_posts_as_processed_many,
+    mark_extraction_failed,
+    delete_post,
+    get_posts_with_processed_duplicate,
+    mark_post_as_duplicate,
+    record_site_profile_extraction,
+    get_cached_extraction,
+    cache_extraction,
+    record_extraction_cache_lookups,
+    get_posts_to_chunk,
+    store_chunks,
+    record_stage_idle,
+    release_claims
+)
 
 class NewspaperProcessorThread(BaseThread):
     def __init__(self, logger: logging.Logger):
-        super().__init__(logger)
+        super().__init__(logger, stage=STAGE_PROCESS, max_interval=300)
         self.config = load_config()
         self.signature = self.config['newspaper_processor']['signature']
         self.logger.info(f"Loaded signature: {self.signature}")
+        processor_config = self.config['newspaper_processor']
+        self.batch_size = processor_config.get('batch_size', 10)
+        self.batch_limit = self.batch_size
+        self.max_length = processor_config['max_length']
+        self.coverage_subreddits = processor_config['coverage']
+        self.profiles = load_site_profiles(processor_config.get('site_profiles'))
+        self.logger.info(f"Loaded {len(self.profiles)} site profiles")
+        # Setting extraction_cache_max_bytes to 0 disables the extraction cache
+        self.extraction_cache_max_bytes = processor_config.get('extraction_cache_max_bytes', 64 * 1024 * 1024)
+        self.extraction_pool = ExtractionPool(
+            workers=processor_config.get('workers', 4),
+            max_tasks_per_child=processor_config.get('max_tasks_per_child', 50),
+            task_timeout=processor_config.get('task_timeout', 60),
+            cpu_budget=processor_config.get('cpu_budget', 30),
+            memory_budget_mb=processor_config.get('memory_budget_mb', 1024),
+            profiles=self.profiles
+        )
     
-    def process_cycle(self):
-        """Process newspaper articles."""
+    def take_cached_extractions(self, posts: list[tuple[int, str]]) -> tuple[list[tuple[int, str]], dict[int, str]]:
+        """
+        Mark posts whose exact HTML was extracted before as processed.
+        Returns the posts that still need extracting and the cache key of every post.
+        """
+        cache_keys = {
+            post_id: extraction_cache_key(raw_text, self.signature, self.profiles)
+            for post_id, raw_text in posts
+        }
+        if not self.extraction_cache_max_bytes:
+            return posts, cache_keys
+        
+        cached, remaining = [], []
+        for post_id, raw_text in posts:
+            try:
+                processed_text = get_cached_extraction(cache_keys[post_id])
+                if processed_text:
+                    cached.append((post_id, processed_text))
+                    continue
+            except Exception as e:
+                self.logger.error(f"Error reusing cached extraction for post {post_id}: {e}")
+            remaining.append((post_id, raw_text))
+        
+        if self.store_processed(cached):
+            self.logger.info(f"Reused cached extractions for posts {[post_id for post_id, _ in cached]}")
+        record_extraction_cache_lookups(len(cached), len(remaining))
+        return remaining, cache_keys
+    
+    def cache_processed(self, processed: list[tuple[int, str]], cache_keys: dict[int, str]) -> None:
+        """Keep extracted texts in the extraction cache, for the same page arriving again."""
+        for post_id, processed_text in processed:
+            try:
+                cache_extraction(cache_keys[post_id], processed_text, self.extraction_cache_max_bytes)
+            except Exception as e:
+                self.logger.error(f"Error caching extraction of post {post_id}: {e}")
+    
+    def store_processed(self, processed: list[tuple[int, str]]) -> bool:
+        """
+        Store the texts of a batch in one transaction. Returns whether they were stored,
+        if not the posts are released to be processed again.
+        """
+        if not processed:
+            return False
+        try:
+            stored = mark_posts_as_processed_many(processed, self.worker_id)
+        except Exception as e:
+            self.logger.error(f"Error storing {len(processed)} processed texts: {e}")
+            release_claims([post_id for post_id, _ in processed], self.worker_id)
+            return False
+        if len(stored) < len(processed):
+            lost = sorted({post_id for post_id, _ in processed} - set(stored))
+            self.logger.warning(f"Dropped the texts of posts {lost}, another worker took them over")
+        return bool(stored)
+    
+    def process_cycle(self) -> int:
+        """Process newspaper articles. Returns how many posts were picked up for extraction."""
         try:
-            # Get posts that have been fetched but not processed
-            posts = get_posts_to_process()
+            # Claim posts that have been fetched but not processed, other processor threads skip them
+            posts = claim_posts_to_process(self.worker_id, self.batch_size, self.lease_seconds)
+            picked_up = len(posts)
             if posts:
                 self.logger.info(f"Found {len(posts)} posts to process")
+                record_stage_idle(STAGE_PROCESS, [post_id for post_id, _, _ in posts])
+                domains = {post_id: get_host(url).removeprefix('www.') for post_id, url, _ in posts}
+                posts = [(post_id, raw_text) for post_id, _, raw_text in posts]
+                posts, cache_keys = self.take_cached_extractions(posts)
+                processed = []
                 
-                for post_id, raw_text in posts:
+                # Extract the whole batch, in worker processes if configured
+                for result in self.extraction_pool.extract_many(posts, self.signature):
+                    post_id, processed_text = result.post_id, result.text
                     try:
-                        # Process the article text
-                        self.logger.info(f"Processing post {post_id}")
-                        processed_text = extract_article_text(raw_text, self.signature)
+                        if result.retryable:
+                            # The worker pool failed rather than the article, extract it again next cycle
+                            self.logger.warning(
+                                f"Extraction of post {post_id} failed ({result.failure_reason}), "
+                                f"releasing it to be retried: {result.error!r}"
+                            )
+                            release_claims([post_id], self.worker_id)
+                            continue
+                        
+                        if result.error is not None:
+                            # Timeouts and budget overruns would just repeat, so give up on the article
+                            if not mark_extraction_failed(post_id, domains[post_id], result.failure_reason, self.worker_id):
+                                self.logger.warning(f"Left post {post_id} to the worker that took it over")
+                                continue
+                            self.logger.error(
+                                f"Deleted post {post_id} from {domains[post_id]} after failed extraction "
+                                f"({result.failure_reason}): {result.error!r}"
+                            )
+                            continue
+                        
+                        if result.input_chars:
+                            saved = result.input_chars - result.slimmed_chars
+                            self.logger.info(
+                                f"Slimmed post {post_id} from {result.input_chars} to {result.slimmed_chars} characters "
+                                f"(-{100 * saved // result.input_chars}%) in {result.slim_elapsed * 1000:.1f} ms, "
+                                f"extracted in {result.elapsed * 1000:.0f} ms"
+                            )
+                        
+                        if result.profile:
+                            elapsed_ms = int(result.elapsed * 1000)
+                            record_site_profile_extraction(result.profile, result.profile_hit, elapsed_ms)
+                            if not result.profile_hit:
+                                self.logger.warning(f"Site profile for {result.profile} found no article in post {post_id}")
                         
                         if processed_text:
-                            # Mark post as processed and store the processed text
-                            mark_post_as_processed(post_id, processed_text)
-                            self.logger.info(f"Successfully processed post {post_id}")
+                            # Stored with the rest of the batch, in one transaction
+                            processed.append((post_id, processed_text))
                         else:
                             # If no text could be extracted, delete the post
-                            delete_post(post_id)
-                            self.logger.info(f"Deleted post {post_id} due to no extractable text")
+                            if delete_post(post_id, self.worker_id):
+                                self.logger.info(f"Deleted post {post_id} due to no extractable text")
                             
                     except Exception as e:
                         self.logger.error(f"Error processing post {post_id}: {e}")
+                        release_claims([post_id], self.worker_id)
+                        continue
+                
+                if self.store_processed(processed):
+                    self.logger.info(f"Successfully processed posts {[post_id for post_id, _ in processed]}")
+                    if self.extraction_cache_max_bytes:
+                        self.cache_processed(processed, cache_keys)
+
+            # Crossposts of an article we already processed reuse its text
+            for post_id, processed_text in get_posts_with_processed_duplicate():
+                try:
+                    mark_post_as_duplicate(post_id, processed_text)
+                    self.logger.info(f"Reused processed text for crosspost {post_id}")
+                except Exception as e:
+                    self.logger.error(f"Error reusing processed text for post {post_id}: {e}")
+                    continue
+            
+            # Split processed texts into comments here, so posting only has to send them
+            for post_id, subreddit, processed_text in get_posts_to_chunk():
+                try:
+                    chunks = split_comment(processed_text, self.max_length, subreddit in self.coverage_subreddits)
+                    if not store_chunks(post_id, chunks):
+                        # Another processor thread split it first
                         continue
+                    notify_stage(STAGE_POST)
+                    self.logger.info(f"Split post {post_id} into {len(chunks)} comments")
+                except Exception as e:
+                    self.logger.error(f"Error splitting text of post {post_id}: {e}")
+                    continue
+            
+            return picked_up
                         
         except Exception as e:
             self.logger.error(f"Error in process cycle: {e}")
             raise
+
+    def cleanup(self):
+        """Stop the extraction workers."""
+        self.extraction_pool.close()
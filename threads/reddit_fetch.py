@@ -1,10 +1,13 @@
 import logging
 import time
-from typing import List
+from typing import List, Optional
 import praw
+from praw.models.util import ExponentialCounter
 from utils.domain_utils import compile_domain_patterns, is_domain_banned
-from infrastructure.database import insert_post, mark_post_as_skipped
-from .base_thread import BaseThread
+from utils.url_utils import canonicalize_url
+from infrastructure.database import insert_posts_many, mark_post_as_skipped
+from infrastructure.url_resolver import UrlResolver
+from .base_thread import BaseThread, STAGE_FETCH, STAGE_PROCESS, notify_stage
 
 class RedditFetchThread(BaseThread):
     def __init__(
@@ -13,58 +16,100 @@ class RedditFetchThread(BaseThread):
         logger: logging.Logger,
         subreddits: List[str],
         banned_domains: List[str],
+        url_shorteners: Optional[List[str]] = None,
         interval: int = 300
     ):
         super().__init__(logger, interval)
         self.reddit = reddit_client
         self.subreddits = subreddits
         self.banned_patterns = compile_domain_patterns(banned_domains)
+        self.url_resolver = UrlResolver(url_shorteners or [])
+        # Paces polling between responses with nothing new, as the stream itself does without pause_after
+        self.backoff = ExponentialCounter(max_counter=16)
 
     def is_domain_banned(self, url: str) -> bool:
         """Check if a URL's domain is in the banned list."""
         return is_domain_banned(url, self.banned_patterns)
 
+    def store_posts(self, posts: list[tuple[str, str, str, int, str]]) -> None:
+        """Insert the posts found since the last response with nothing new, in a single transaction."""
+        if not posts:
+            return
+        try:
+            inserted = insert_posts_many(posts)
+            self.logger.info(f"Inserted {inserted} new posts: {[reddit_id for reddit_id, _, _, _, _ in posts]}")
+        except Exception as e:
+            self.logger.error(f"Error inserting posts {[reddit_id for reddit_id, _, _, _, _ in posts]}: {e}")
+            return
+        # New articles are fetched, crossposts of processed ones picked up by the processor
+        notify_stage(STAGE_FETCH)
+        notify_stage(STAGE_PROCESS)
+
     def process_cycle(self):
         """Process new submissions from Reddit."""
         
         # Join subreddits with + for multi-subreddit stream
         subreddit_str = "+".join(self.subreddits)
         subreddit = self.reddit.subreddit(subreddit_str)
+        posts = []
         
-        # Use PRAW's submission stream to monitor new submissions
-        for submission in subreddit.stream.submissions(skip_existing=True):
-            if self._stop_event.is_set():
-                break
+        # Use PRAW's submission stream to monitor new submissions. With pause_after=0 it yields
+        # None after a response with nothing new instead of sleeping; the submissions seen until
+        # then are stored together, and the thread sleeps in its place.
+        try:
+            for submission in subreddit.stream.submissions(skip_existing=True, pause_after=0):
+                if self._stop_event.is_set():
+                    break
+                if submission is None:
+                    self.store_posts(posts)
+                    posts = []
+                    self._stop_event.wait(self.backoff.counter())
+                    continue
+                self.backoff.reset()
                 
-            try:
-                # Calculate timestamp for 1 day ago
-                one_day_ago = int(time.time()) - (24 * 60 * 60)
+                try:
+                    # Calculate timestamp for 1 day ago
+                    one_day_ago = int(time.time()) - (24 * 60 * 60)
 
-                # Skip if no URL
-                if not submission.url:
-                    continue
+                    # Skip if no URL
+                    if not submission.url:
+                        continue
                     
-                # Skip if domain is banned
-                if self.is_domain_banned(submission.url):
-                    self.logger.info(f"Skipping banned domain: {submission.url}")
-                    mark_post_as_skipped()
-                    continue
+                    # Skip if domain is banned
+                    if self.is_domain_banned(submission.url):
+                        self.logger.info(f"Skipping banned domain: {submission.url}")
+                        mark_post_as_skipped()
+                        continue
                 
-                # Skip if post is older than 1 day
-                if submission.created_utc < one_day_ago:
-                    self.logger.info(f"Skipping old post: {submission.id} (created {submission.created_utc})")
-                    mark_post_as_skipped()
-                    continue
+                    # Skip if post is older than 1 day
+                    if submission.created_utc < one_day_ago:
+                        self.logger.info(f"Skipping old post: {submission.id} (created {submission.created_utc})")
+                        mark_post_as_skipped()
+                        continue
+
+                    # Expand shortened links so the ban list applies to where they really go
+                    url = submission.url
+                    if self.url_resolver.is_shortened(url):
+                        url = self.url_resolver.resolve(url)
+                        self.logger.info(f"Resolved {submission.url} to {url}")
+                        if self.is_domain_banned(url):
+                            self.logger.info(f"Skipping banned domain behind short link: {url}")
+                            mark_post_as_skipped()
+                            continue
                     
-                # Insert post if it doesn't exist
-                self.logger.info(f"Inserting post: {submission.id}")
-                insert_post(
-                    reddit_id=submission.id,
-                    subreddit=submission.subreddit.display_name,
-                    url=submission.url,
-                    created_utc=int(submission.created_utc)
-                )
+                    # Inserted, if it doesn't exist yet, with the rest of the response
+                    posts.append((
+                        submission.id,
+                        submission.subreddit.display_name,
+                        url,
+                        int(submission.created_utc),
+                        canonicalize_url(url)
+                    ))
                     
-            except Exception as e:
-                self.logger.error(f"Error processing submission {submission.id}: {str(e)}")
-                continue
+                except Exception as e:
+                    self.logger.error(f"Error processing submission {submission.id}: {str(e)}")
+                    continue
+        finally:
+            # Posts seen before the thread was stopped, or before a poll failed: the restarted
+            # stream skips what was already listed, so they would not be seen again
+            self.store_posts(posts)
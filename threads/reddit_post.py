@@ -1,100 +1,115 @@
-import time
 import praw
 import logging
-from .base_thread import BaseThread
+from typing import Optional
+from .base_thread import BaseThread, STAGE_POST
 from infrastructure.config import load_config
-from infrastructure.database import get_posts_to_post, mark_post_as_posted
+from infrastructure.database import (
+    claim_posts_to_post,
+    mark_chunk_as_posted,
+    mark_posts_as_posted_many,
+    record_rate_limit_wait,
+    release_claims,
+    renew_claims,
+    record_stage_idle
+)
+from utils.rate_limiter import RateLimitScheduler
+
+def create_rate_limit_scheduler(reddit: praw.Reddit, reddit_config: dict) -> RateLimitScheduler:
+    """Build the scheduler the post threads share, so they draw on one view of the client's rate limit."""
+    return RateLimitScheduler(
+        lambda: reddit.auth.limits,
+        reserve=reddit_config.get('rate_limit_reserve', 10)
+    )
 
 class RedditPostThread(BaseThread):
-    def __init__(self, reddit: praw.Reddit, logger: logging.Logger):
-        super().__init__(logger)
+    def __init__(
+        self,
+        reddit: praw.Reddit,
+        logger: logging.Logger,
+        scheduler: Optional[RateLimitScheduler] = None
+    ):
+        super().__init__(logger, stage=STAGE_POST, max_interval=300, batch_limit=10)
         self.reddit = reddit
         self.config = load_config()
-        self.max_length = self.config['newspaper_processor']['max_length']
         self.distinguishable_subreddits = self.config['reddit']['distinguishable']
-        self.coverage_subreddits = self.config['newspaper_processor']['coverage']
-    
-    def split_text(self, text: str, subreddit: str) -> list[str]:
-        """Split text into chunks that fit within Reddit's comment length limit."""
-        if len(text) <= self.max_length:
-            return [text]
-            
-        chunks = []
-        continuation_msg = "\n> ***(continues in next comment)***"
-        continuation_msg_len = len(continuation_msg)
-        
-        while text:
-            # If remaining text is shorter than max_length, add it as the last chunk
-            if len(text) <= self.max_length:
-                chunks.append(text)
-                break
-                
-            # Find the last newline before max_length - continuation_msg_len
-            # to ensure we have room for the continuation message
-            split_point = text.rfind('\n', 0, self.max_length - continuation_msg_len)
-            
-            # If no newline found, try to split at the last space
-            if split_point == -1:
-                split_point = text.rfind(' ', 0, self.max_length - continuation_msg_len)
-                
-            # If still no good split point, force split at max_length - continuation_msg_len
-            if split_point == -1:
-                split_point = self.max_length - continuation_msg_len
-                
-            # Add the chunk with continuation message and continue with remaining text
-            chunk = text[:split_point].strip() + continuation_msg
-            chunks.append(chunk)
-            text = text[split_point:].strip()
-            
-        # Add CoverageAnalysisBot summoning to the last chunk if subreddit is in coverage list
-        if subreddit in self.coverage_subreddits:
-            chunks[-1] += "\n\nSummoning u/CoverageAnalysisBot"
-            
-        return chunks
+        # Threads posting through the same client must share one, or each spends the same remaining quota
+        self.scheduler = scheduler if scheduler is not None else create_rate_limit_scheduler(reddit, self.config['reddit'])
     
-    def process_cycle(self):
-        """Process and post content to Reddit."""
+    def process_cycle(self) -> int:
+        """
+        Process and post content to Reddit. Returns how many posts were posted, posts that
+        keep failing must not keep the thread from waiting between cycles.
+        """
         try:
-            # Get posts that have been processed but not posted yet
-            posts = get_posts_to_post()
+            # Claim posts that have been processed but not posted yet, newest first so they get their comment early
+            posts = claim_posts_to_post(self.worker_id, self.batch_limit, self.lease_seconds)
+            # Resumed posts were already counted when they were first picked up
+            record_stage_idle(STAGE_POST, [post_id for post_id, _, _, chunks in posts if not chunks[0][1]])
+            posted = []
+            failed = []
             
-            for post_id, reddit_id, subreddit, processed_text in posts:
+            for index, (post_id, reddit_id, subreddit, chunks) in enumerate(posts):
                 try:
-                    self.logger.info(f"Found post to comment on: {reddit_id} in r/{subreddit}")
+                    # The processor already split the text into comments
+                    self.logger.info(f"Found post to comment on: {reddit_id} in r/{subreddit}, {len(chunks)} comments")
                     
-                    # Split the text into chunks
-                    text_chunks = self.split_text(processed_text, subreddit)
-                    self.logger.info(f"Split text into {len(text_chunks)} chunks")
+                    # Continue after the last comment a previous attempt posted instead of starting a second tree
+                    posted_ids = [comment_id for _, comment_id in chunks if comment_id]
+                    # Wait until the rate limit has room for every remaining comment, and the pin
+                    cost = len(chunks) - len(posted_ids)
+                    if not posted_ids and subreddit in self.distinguishable_subreddits:
+                        cost += 1
+                    # The requests stay held until this post's comments are out, other post threads wait for them
+                    with self.scheduler.hold(cost) as waited:
+                        if waited:
+                            self.logger.info(f"Waited {waited:.0f} seconds for Reddit's rate limit before posting on {reddit_id}")
+                            record_rate_limit_wait(round(waited))
                     
-                    # Get the Reddit submission
-                    submission = self.reddit.submission(id=reddit_id)
+                        # Waiting for the rate limit can take most of a lease, and the batch several
+                        # such waits; extend the leases of the posts still to go each time
+                        held = renew_claims([post[0] for post in posts[index:]], self.worker_id, self.lease_seconds)
+                        if post_id not in held:
+                            self.logger.warning(f"Skipping post {post_id}, another worker took it over")
+                            continue
                     
-                    # Post the first comment
-                    current_comment = submission.reply(text_chunks[0])
-                    self.logger.info(f"Posted first comment on submission {reddit_id}")
+                        if posted_ids:
+                            current_comment = self.reddit.comment(id=posted_ids[-1])
+                            self.logger.info(f"Resuming submission {reddit_id} at comment {len(posted_ids) + 1} of {len(chunks)}")
+                        else:
+                            current_comment = self.reddit.submission(id=reddit_id)
                     
-                    # Pin the first comment if the subreddit is in the distinguishable list
-                    if subreddit in self.distinguishable_subreddits:
-                        try:
-                            current_comment.mod.distinguish(sticky=True)
-                            self.logger.info(f"Pinned first comment on submission {reddit_id}")
-                        except Exception as e:
-                            self.logger.error(f"Failed to pin comment on submission {reddit_id}: {e}")
+                        for position in range(len(posted_ids), len(chunks)):
+                            body, _ = chunks[position]
+                            current_comment = current_comment.reply(body)
+                            if not mark_chunk_as_posted(post_id, position, current_comment.id, self.worker_id):
+                                raise RuntimeError(f"Post {post_id} was taken over by another worker while posting")
+                        
+                            if position == 0:
+                                self.logger.info(f"Posted first comment on submission {reddit_id}")
+                                # Pin the first comment if the subreddit is in the distinguishable list
+                                if subreddit in self.distinguishable_subreddits:
+                                    try:
+                                        current_comment.mod.distinguish(sticky=True)
+                                        self.logger.info(f"Pinned first comment on submission {reddit_id}")
+                                    except Exception as e:
+                                        self.logger.error(f"Failed to pin comment on submission {reddit_id}: {e}")
+                            else:
+                                self.logger.info(f"Posted continuation comment on submission {reddit_id}")
                     
-                    # If there are more chunks, post them as replies to the previous comment
-                    for chunk in text_chunks[1:]:
-                        current_comment = current_comment.reply(chunk)
-                        self.logger.info(f"Posted continuation comment on submission {reddit_id}")
-                        # Add a small delay between comments to avoid rate limiting
-                        time.sleep(2)
-                    
-                    # Mark the post as posted
-                    mark_post_as_posted(post_id)
-                    self.logger.info(f"Successfully marked post {post_id} as posted")
+                    # Marked with the rest of the batch, should that fail the stored comment ids keep it from being posted twice
+                    posted.append(post_id)
                     
                 except Exception as e:
                     self.logger.error(f"Error processing post {post_id}: {e}")
+                    failed.append(post_id)
                     continue
+            
+            # Let the next cycle, on any thread, pick failed posts up again
+            release_claims(failed, self.worker_id)
+            posted = mark_posts_as_posted_many(posted, self.worker_id)
+            if posted:
+                self.logger.info(f"Successfully marked posts {posted} as posted")
+            return len(posted)
         except Exception as e:
             self.logger.error(f"Error in post cycle: {e}")
             raise
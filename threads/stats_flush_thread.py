@@ -0,0 +1,16 @@
+import logging
+from .base_thread import BaseThread
+from infrastructure.database import flush_stats
+
+class StatsFlushThread(BaseThread):
+    def __init__(self, logger: logging.Logger, interval: int = 5):
+        # Stats are counted in memory, write them to the database every few seconds
+        super().__init__(logger, interval=interval, error_interval=interval)
+    
+    def process_cycle(self):
+        """Write the stats counted since the last cycle."""
+        flush_stats()
+
+    def cleanup(self):
+        """Write what was counted since the last cycle before the thread exits."""
+        flush_stats()
@@ -0,0 +1,65 @@
+import random
+import threading
+import time
+from typing import Callable
+
+
+def compute_backoff(
+    retry_count: int,
+    base_delay: int,
+    max_delay: int,
+    uniform: Callable[[float, float], float] = random.uniform
+) -> int:
+    """
+    Return the seconds to wait before the next attempt.
+    The delay doubles with every retry up to max_delay, and half of it is
+    randomized so posts that failed together don't all come back together.
+    """
+    delay = min(max_delay, base_delay * (2 ** retry_count))
+    return int(delay / 2 + uniform(0, delay / 2))
+
+
+class CircuitBreaker:
+    """
+    Track consecutive failures per host.
+
+    After `threshold` failures in a row the circuit for that host opens and
+    stays open for `cooldown` seconds, during which requests to it should
+    not be attempted. Once the cooldown passes requests are allowed again;
+    a single further failure reopens the circuit, a success closes it.
+    Thread-safe, so fetcher threads can share one breaker per host.
+    """
+
+    def __init__(self, threshold: int = 3, cooldown: int = 600, clock: Callable[[], float] = time.time):
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self.clock = clock
+        self._failures: dict[str, int] = {}
+        self._open_until: dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    def allow(self, host: str) -> bool:
+        """Check if a request to the host may be attempted now."""
+        with self._lock:
+            return self.clock() >= self._open_until.get(host, 0)
+
+    def retry_at(self, host: str) -> int:
+        """Return when requests to the host will be allowed again."""
+        with self._lock:
+            return int(max(self._open_until.get(host, 0), self.clock()))
+
+    def record_success(self, host: str) -> None:
+        """Close the circuit for a host."""
+        with self._lock:
+            self._failures.pop(host, None)
+            self._open_until.pop(host, None)
+
+    def record_failure(self, host: str) -> bool:
+        """Count a failure for a host. Returns True if this opened the circuit."""
+        with self._lock:
+            failures = self._failures.get(host, 0) + 1
+            self._failures[host] = failures
+            if failures >= self.threshold and self.clock() >= self._open_until.get(host, 0):
+                self._open_until[host] = self.clock() + self.cooldown
+                return True
+            return False
@@ -0,0 +1,44 @@
+CONTINUATION_MESSAGE = "\n> ***(continues in next comment)***"
+COVERAGE_MESSAGE = "\n\nSummoning u/CoverageAnalysisBot"
+
+
+def split_comment(text: str, max_length: int, summon_coverage: bool = False) -> list[str]:
+    """
+    Split text into chunks that fit within Reddit's comment length limit, preferring
+    to break at a newline, then at a space. Every chunk but the last ends with a
+    continuation message; when the text is split, summon_coverage adds a CoverageAnalysisBot
+    summon to the last.
+
+    The text is never copied as a whole: split points are searched for between two
+    indices, so splitting takes time linear in the length of the text.
+    """
+    if len(text) <= max_length:
+        return [text]
+
+    chunks = []
+    limit = max_length - len(CONTINUATION_MESSAGE)
+    start, end = 0, len(text)
+    stripped_end = len(text.rstrip())
+    while start < end:
+        # If the remaining text fits, it is the last chunk
+        if end - start <= max_length:
+            chunks.append(text[start:end])
+            break
+
+        # Leave room for the continuation message, breaking at a newline, a space or anywhere
+        split_point = text.rfind('\n', start, start + limit)
+        if split_point == -1:
+            split_point = text.rfind(' ', start, start + limit)
+        if split_point == -1:
+            split_point = start + limit
+
+        chunks.append(text[start:split_point].strip() + CONTINUATION_MESSAGE)
+
+        # The rest of the text is stripped before it is split again
+        start, end = split_point, stripped_end
+        while start < end and text[start].isspace():
+            start += 1
+
+    if summon_coverage:
+        chunks[-1] += COVERAGE_MESSAGE
+    return chunks
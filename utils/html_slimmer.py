@@ -0,0 +1,73 @@
+import re
+from typing import Optional
+
+# One alternation so the page is scanned once, left to right: whichever construct starts first wins,
+# so a "<script>" inside a comment (or a "<!--" inside a script) is not mistaken for the other.
+# The leading "<" is shared, so the regex engine tries the alternatives only where one can start.
+SLIM_REGEX = re.compile(
+    r'<(?:'
+    r'!--.*?-->'
+    r'|(script|style|noscript|template)\b([^>]*)>.*?</\1\s*>'
+    # Only the opening tag: <svg> may close itself or hold further <svg>s, _svg_end finds its end
+    r'|(svg)\b[^>]*>'
+    # AdSense slots and empty Google Publisher Tag containers
+    r'|ins\b[^>]*\badsbygoogle\b[^>]*>.*?</ins\s*>'
+    r'|div\b[^>]*\bid\s*=\s*["\']?div-gpt-ad[^>]*>\s*</div\s*>'
+    r')',
+    re.I | re.S
+)
+# An opening, closing or self-closing <svg> tag
+SVG_TAG_REGEX = re.compile(r'<(/)?svg\b[^>]*?(/)?\s*>', re.I)
+LD_JSON_REGEX = re.compile(r'\btype\s*=\s*["\']?application/ld\+json', re.I)
+IMG_REGEX = re.compile(r'<img\b', re.I)
+
+
+def _keep(match: re.Match) -> bool:
+    """Readability reads JSON-LD for the title and byline and unwraps images found in <noscript>."""
+    tag, attributes = match.group(1), match.group(2)
+    if tag is None:
+        return False
+    tag = tag.lower()
+    if tag == 'script':
+        return bool(LD_JSON_REGEX.search(attributes))
+    if tag == 'noscript':
+        return bool(IMG_REGEX.search(match.group(0)))
+    return False
+
+
+def _svg_end(html: str, start: int) -> Optional[int]:
+    """Return where the <svg> element opened at start ends, counting nested ones, or None if it never does."""
+    depth = 0
+    for tag in SVG_TAG_REGEX.finditer(html, start):
+        if tag.group(1):
+            depth -= 1
+        elif not tag.group(2):
+            depth += 1
+        if depth <= 0:
+            return tag.end()
+    return None
+
+
+def slim_html(html: str) -> str:
+    """
+    Drop the parts of a page no extractor uses before it gets parsed: comments, scripts,
+    styles, inline SVG, templates, <noscript> without images and known ad slots.
+    <head> metadata (canonical, og:*, title) is left untouched.
+    """
+    kept = []
+    position = 0
+    while (match := SLIM_REGEX.search(html, position)) is not None:
+        start, end = match.span()
+        if match.group(3):
+            end = _svg_end(html, start)
+            if end is None:
+                # An <svg> that is never closed runs to the end of the page, leave it to the parser
+                kept.append(html[position:match.end()])
+                position = match.end()
+                continue
+        kept.append(html[position:start])
+        if match.group(3) is None and _keep(match):
+            kept.append(match.group(0))
+        position = end
+    kept.append(html[position:])
+    return ''.join(kept)
@@ -1,13 +1,27 @@
+import hashlib
 import logging
 import re
-from typing import Optional
-from readabilipy import simple_json_from_html_string
+import time
+from typing import Iterable, NamedTuple, Optional
 from markdownify import markdownify as html2md
 import bs4
 from urllib.parse import urlparse
+from utils.html_slimmer import slim_html
+from utils.page_metadata import PageMetadata, read_page_metadata
+from utils.readability_worker import simple_json_from_html
+from utils.site_profiles import SiteProfile, extract_with_profile, match_site_profile
 
 logger = logging.getLogger(__name__)
 
+# Bump whenever a change alters the Markdown produced for the same page, cached extractions are keyed by it
+EXTRACTOR_VERSION = 3
+
+# Whole pages are parsed with lxml, which builds the same tree as html.parser for well-formed
+# pages in about half the time. It wraps fragments in <html><body> and rebuilds malformed markup
+# though, so HTML given to convert_relative_urls, which may be either, keeps going through html.parser.
+HTML_PARSER = "lxml"
+FRAGMENT_PARSER = "html.parser"
+
 SPECIAL_HEADER = "#####&#009;\n\n######&#009;\n\n####&#009;\n\n"
 EMAIL_REGEX = re.compile(r"[A-Z0-9._%+-]+@[A-Z0-9.-]+\.[A-Z]{2,4}\b", re.I)
 # Match any Markdown link to /tema/...
@@ -22,6 +36,51 @@ IMAGE_MARKDOWN_REGEX = re.compile(r'!\[([^\]]+)\]\(([^)]+)\)')
 # Match URLs in markdown links
 URL_REGEX = re.compile(r'\[([^\]]+)\]\((https?://[^)]+)\)')
 
+class ArticleExtraction(NamedTuple):
+    """Result of extract_article. profile is the matched site profile's domain and
+    profile_hit whether its selectors found the article; input_chars and slimmed_chars
+    are the page's size before and after slimming. Times are in seconds."""
+    text: Optional[str]
+    profile: Optional[str] = None
+    profile_hit: bool = False
+    elapsed: float = 0.0
+    input_chars: int = 0
+    slimmed_chars: int = 0
+    slim_elapsed: float = 0.0
+
+
+def extraction_cache_key(html_content: str, signature: str, profiles: Iterable[SiteProfile] = ()) -> str:
+    """Return a key identifying what extract_article would produce for these inputs."""
+    digest = hashlib.sha256()
+    for part in (str(EXTRACTOR_VERSION), signature, repr(tuple(profiles)), html_content):
+        digest.update(part.encode('utf-8', errors='surrogatepass'))
+        digest.update(b'\0')
+    return digest.hexdigest()
+
+
+def _absolutize(url: str, base_url_parsed, base_path: str) -> Optional[str]:
+    """Return the absolute form of a relative URL, or None if it is already absolute."""
+    # Skip if already absolute URL
+    if url.startswith(("http://", "https://")):
+        return None
+    # Convert relative URL to absolute
+    if url.startswith('/'):
+        # Path-absolute URL
+        return f"{base_url_parsed.scheme}://{base_url_parsed.netloc}{url}"
+    # Path-relative URL
+    return f"{base_url_parsed.scheme}://{base_url_parsed.netloc}{base_path}/{url}"
+
+def _convert_relative_urls_in_place(soup: bs4.BeautifulSoup, base_url: str) -> None:
+    """Rewrite relative <a href> and <img src> attributes of a parsed page to absolute URLs."""
+    base_url_parsed = urlparse(base_url)
+    base_path = base_url_parsed.path.rstrip('/')
+    
+    for tag_name, attribute in (("a", "href"), ("img", "src")):
+        for tag in soup.find_all(tag_name, attrs={attribute: True}):
+            absolute_url = _absolutize(tag[attribute], base_url_parsed, base_path)
+            if absolute_url is not None:
+                tag[attribute] = absolute_url
+
 def get_base_url(html_content: str, article_url: Optional[str] = None) -> Optional[str]:
     """
     Extract the base URL from HTML content or use the provided article URL.
@@ -30,19 +89,7 @@ def get_base_url(html_content: str, article_url: Optional[str] = None) -> Option
     if article_url:
         return article_url
     
-    soup = bs4.BeautifulSoup(html_content, "html.parser")
-    
-    # Try to get canonical URL
-    canonical = soup.find("link", rel="canonical")
-    if canonical and canonical.get("href"):
-        return canonical["href"]
-    
-    # Try to get og:url
-    og_url = soup.find("meta", property="og:url")
-    if og_url and og_url.get("content"):
-        return og_url["content"]
-    
-    return None
+    return read_page_metadata(html_content).base_url
 
 def is_same_domain(url1: str, url2: str) -> bool:
     """Check if two URLs belong to the same domain."""
@@ -59,45 +106,33 @@ def is_same_domain(url1: str, url2: str) -> bool:
 def convert_relative_urls(html_content: str, base_url: Optional[str]) -> str:
     """
     Convert all relative URLs in HTML content to absolute URLs.
-    Returns the modified HTML content.
+    Returns the modified HTML content, otherwise serialised as it was given.
     """
     if not base_url:
         return html_content
     
-    soup = bs4.BeautifulSoup(html_content, "html.parser")
-    base_url_parsed = urlparse(base_url)
-    base_path = base_url_parsed.path.rstrip('/')
-    
-    # Process all <a> tags
-    for a_tag in soup.find_all("a", href=True):
-        href = a_tag["href"]
-        # Skip if already absolute URL
-        if href.startswith(("http://", "https://")):
-            continue
-        # Convert relative URL to absolute
-        if href.startswith('/'):
-            # Path-absolute URL
-            a_tag["href"] = f"{base_url_parsed.scheme}://{base_url_parsed.netloc}{href}"
-        else:
-            # Path-relative URL
-            a_tag["href"] = f"{base_url_parsed.scheme}://{base_url_parsed.netloc}{base_path}/{href}"
-    
-    # Process all <img> tags
-    for img_tag in soup.find_all("img", src=True):
-        src = img_tag["src"]
-        # Skip if already absolute URL
-        if src.startswith(("http://", "https://")):
-            continue
-        # Convert relative URL to absolute
-        if src.startswith('/'):
-            # Path-absolute URL
-            img_tag["src"] = f"{base_url_parsed.scheme}://{base_url_parsed.netloc}{src}"
-        else:
-            # Path-relative URL
-            img_tag["src"] = f"{base_url_parsed.scheme}://{base_url_parsed.netloc}{base_path}/{src}"
-    
+    soup = bs4.BeautifulSoup(html_content, FRAGMENT_PARSER)
+    _convert_relative_urls_in_place(soup, base_url)
     return str(soup)
 
+def _parse_page(
+    html_content: str,
+    article_url: Optional[str] = None
+) -> tuple[Optional[bs4.BeautifulSoup], Optional[str], PageMetadata]:
+    """
+    Read the page's metadata from its head and, if a base URL is known, parse the
+    whole page once and make its relative URLs absolute. Returns the tree (None
+    without a base URL, as nothing needs it then), the base URL and the metadata.
+    """
+    metadata = read_page_metadata(html_content)
+    base_url = article_url or metadata.base_url
+    if not base_url:
+        return None, None, metadata
+    
+    soup = bs4.BeautifulSoup(html_content, HTML_PARSER)
+    _convert_relative_urls_in_place(soup, base_url)
+    return soup, base_url, metadata
+
 def replace_ru_domains(text: str) -> str:
     """Replace any .ru domain links with example.com."""
     def replace_url(match):
@@ -113,107 +148,156 @@ def extract_article_text(html_content: str, signature: str, article_url: Optiona
     Extract the main article text from raw HTML content, sanitize, convert to Markdown, and sign it.
     Returns a Markdown string. The signature parameter is required and will be appended as HTML before Markdown conversion.
     """
-    try:
-        # Get base URL and convert relative URLs
-        base_url = get_base_url(html_content, article_url)
-        if base_url:
-            html_content = convert_relative_urls(html_content, base_url)
-        
-        # Use readabilipy to extract the main content
-        try:
-            article = simple_json_from_html_string(html_content, use_readability=True)
-            
-            # Extract content from the article
-            if article and 'content' in article and article['content']:
-                html = article['content']
-            else:
-                logger.warning("No content found in article")
-                return None
-
-            # Remove emails from the HTML content
-            html = EMAIL_REGEX.sub(lambda m: m.group(0).replace('@', ' at '), html)
-
-            # Convert main content to Markdown (preserve links)
-            markdown = html2md(html)
-            markdown = markdown.strip()
-
-            # Replace .ru domain links with example.com
-            markdown = replace_ru_domains(markdown)
-
-            # Prepare blockquoted title (with image link if available)
-            title_line = None
-            image_url = None
-            # Try to get og:image from the HTML meta tag
-            soup = bs4.BeautifulSoup(html_content, "html.parser")
-            og_image = soup.find("meta", property="og:image")
-            if og_image and og_image.get("content"):
-                image_url = og_image["content"]
-            # Fallback to readabilipy's image fields if not found
-            if not image_url:
-                for key in ['lead_image_url', 'image', 'url']:
-                    if key in article and article[key]:
-                        image_url = article[key]
-                        break
-            if 'title' in article and article['title']:
-                title = article['title'].strip()
-                if image_url:
-                    title_line = f"> # [{title}]({image_url})"
-                else:
-                    title_line = f"> # {title}"
-
-            # Blockquote only the main article content, preserving blank lines and indentation
-            # Skip all leading blank lines
-            content_lines = markdown.splitlines()
-            while content_lines and content_lines[0].strip() == '':
-                content_lines.pop(0)
-
-            blockquoted_lines = []
-            if title_line:
-                blockquoted_lines.append(title_line)
-                blockquoted_lines.append('>   ')
-                blockquoted_lines.append('>   ')
-                blockquoted_lines.append('>   ')
-            for line in content_lines:
-                if line.strip() == '':
-                    blockquoted_lines.append('>   ')
-                else:
-                    # Convert topic links to simple text
-                    line = TOPIC_LINK_WITH_TITLE_REGEX.sub(r'\1', line)
-                    line = TOPIC_LINK_REGEX.sub(r'\1', line)
-                    # Convert image markdown to link format
-                    line = IMAGE_MARKDOWN_REGEX.sub(r'[\1](\2)', line)
-                    # Convert horizontal rules
-                    line = line.replace('---', '- - - - - -')
-                    blockquoted_lines.append('> ' + line)
-
-            # Remove trailing horizontal rules and blank lines before the signature
-            while blockquoted_lines and (blockquoted_lines[-1].strip() in ('> - - - - - -', '>   ', '>')):
-                blockquoted_lines.pop()
-            # Add the last horizontal rule
-            blockquoted_lines.append('> - - - - - -')
-
-            blockquoted = '\n'.join(blockquoted_lines)
-
-            # Convert signature to Markdown separately, preserving links
-            signature_md = html2md(signature).strip()
-            # Remove leading horizontal rule if present
-            signature_lines = signature_md.splitlines()
-            if signature_lines and signature_lines[0].strip() == '---':
-                signature_md = '\n'.join(signature_lines[1:]).lstrip()
-
-            # Replace .ru domain links in signature
-            signature_md = replace_ru_domains(signature_md)
-
-            # Add special header, blockquoted content, two blank lines, horizontal rule, one blank line, and signature
-            result = f"{SPECIAL_HEADER}{blockquoted}\n\n\n- - - - - -\n\n{signature_md}"
-            return result
-
-        except Exception as e:
-            logger.warning(f"Failed to extract text with readabilipy: {e}")
-
-        logger.warning("Could not find article content in HTML")
-        return None
+    return extract_article(html_content, signature, article_url).text
 
+def extract_article(
+    html_content: str,
+    signature: str,
+    article_url: Optional[str] = None,
+    profiles: Iterable[SiteProfile] = ()
+) -> ArticleExtraction:
+    """
+    Like extract_article_text, but pages from a domain with a site profile are extracted
+    with its CSS selectors, falling back to readability when they match nothing.
+    Also reports which profile was used and how long the extraction took.
+    Scripts, styles and other parts no extractor reads are dropped before parsing.
+    """
+    start = time.perf_counter()
+    input_chars = len(html_content)
+    html_content = slim_html(html_content)
+    slim_elapsed = time.perf_counter() - start
+    profile = None
+    article = None
+    try:
+        # Parse once: convert relative URLs and read the metadata we need later
+        soup, base_url, metadata = _parse_page(html_content, article_url)
+        profile = match_site_profile(profiles, base_url)
+        if profile:
+            article = extract_with_profile(soup, profile)
+        if article is None and base_url:
+            html_content = str(soup)
+        text = _article_to_markdown(html_content, article, metadata.og_image, signature)
+    except MemoryError:
+        # Running out of memory is not the same as a page without an article
+        raise
     except Exception as e:
         logger.error(f"Error processing article HTML: {e}")
-        return None 
\ No newline at end of file
+        text = None
+    
+    return ArticleExtraction(
+        text,
+        profile=profile.domain if profile else None,
+        profile_hit=article is not None,
+        elapsed=time.perf_counter() - start,
+        input_chars=input_chars,
+        slimmed_chars=len(html_content),
+        slim_elapsed=slim_elapsed
+    )
+
+def _article_to_markdown(
+    html_content: str,
+    article: Optional[dict],
+    image_url: Optional[str],
+    signature: str
+) -> Optional[str]:
+    """
+    Turn an extracted article into the signed, blockquoted Markdown we post.
+    Without an article, Readability (through the persistent Node worker) extracts it from html_content.
+    """
+    try:
+        if article is None:
+            article = simple_json_from_html(html_content)
+
+        # Extract content from the article
+        if article and 'content' in article and article['content']:
+            html = article['content']
+        else:
+            logger.warning("No content found in article")
+            return None
+
+        # Remove emails from the HTML content
+        html = EMAIL_REGEX.sub(lambda m: m.group(0).replace('@', ' at '), html)
+
+        # Convert main content to Markdown (preserve links)
+        markdown = html2md(html)
+        return format_article_markdown(markdown, article, image_url, signature)
+
+    except MemoryError:
+        raise
+    except Exception as e:
+        logger.warning(f"Failed to extract text with readabilipy: {e}")
+
+    logger.warning("Could not find article content in HTML")
+    return None
+
+def format_article_markdown(markdown: str, article: dict, image_url: Optional[str], signature: str) -> str:
+    """
+    Blockquote the article's Markdown under its title and append the signature.
+    image_url is linked from the title, falling back to the extractor's image fields.
+    """
+    markdown = markdown.strip()
+
+    # Replace .ru domain links with example.com
+    markdown = replace_ru_domains(markdown)
+
+    # Prepare blockquoted title (with image link if available)
+    title_line = None
+    # Prefer the og:image from the HTML meta tag, fallback to the extractor's image fields
+    if not image_url:
+        for key in ['lead_image_url', 'image', 'url']:
+            if key in article and article[key]:
+                image_url = article[key]
+                break
+    if 'title' in article and article['title']:
+        title = article['title'].strip()
+        if image_url:
+            title_line = f"> # [{title}]({image_url})"
+        else:
+            title_line = f"> # {title}"
+
+    # Blockquote only the main article content, preserving blank lines and indentation
+    # Skip all leading blank lines
+    content_lines = markdown.splitlines()
+    while content_lines and content_lines[0].strip() == '':
+        content_lines.pop(0)
+
+    blockquoted_lines = []
+    if title_line:
+        blockquoted_lines.append(title_line)
+        blockquoted_lines.append('>   ')
+        blockquoted_lines.append('>   ')
+        blockquoted_lines.append('>   ')
+    for line in content_lines:
+        if line.strip() == '':
+            blockquoted_lines.append('>   ')
+        else:
+            # Convert topic links to simple text
+            line = TOPIC_LINK_WITH_TITLE_REGEX.sub(r'\1', line)
+            line = TOPIC_LINK_REGEX.sub(r'\1', line)
+            # Convert image markdown to link format
+            line = IMAGE_MARKDOWN_REGEX.sub(r'[\1](\2)', line)
+            # Convert horizontal rules
+            line = line.replace('---', '- - - - - -')
+            blockquoted_lines.append('> ' + line)
+
+    # Remove trailing horizontal rules and blank lines before the signature
+    while blockquoted_lines and (blockquoted_lines[-1].strip() in ('> - - - - - -', '>   ', '>')):
+        blockquoted_lines.pop()
+    # Add the last horizontal rule
+    blockquoted_lines.append('> - - - - - -')
+
+    blockquoted = '\n'.join(blockquoted_lines)
+
+    # Convert signature to Markdown separately, preserving links
+    signature_md = html2md(signature).strip()
+    # Remove leading horizontal rule if present
+    signature_lines = signature_md.splitlines()
+    if signature_lines and signature_lines[0].strip() == '---':
+        signature_md = '\n'.join(signature_lines[1:]).lstrip()
+
+    # Replace .ru domain links in signature
+    signature_md = replace_ru_domains(signature_md)
+
+    # Add special header, blockquoted content, two blank lines, horizontal rule, one blank line, and signature
+    result = f"{SPECIAL_HEADER}{blockquoted}\n\n\n- - - - - -\n\n{signature_md}"
+    return result
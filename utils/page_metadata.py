@@ -0,0 +1,94 @@
+from html.parser import HTMLParser
+from typing import NamedTuple, Optional
+
+# Tags that may appear before or inside <head>, anything else means the body has started
+HEAD_TAGS = {'html', 'head', 'meta', 'link', 'title', 'base', 'script', 'style', 'noscript', 'template'}
+# Their content is not part of the head itself (e.g. tracking pixels in <noscript>)
+OPAQUE_TAGS = {'noscript', 'template'}
+
+
+class PageMetadata(NamedTuple):
+    """The handful of <head> fields the bot reads from an article page."""
+    canonical_url: Optional[str] = None
+    og_url: Optional[str] = None
+    og_image: Optional[str] = None
+    og_title: Optional[str] = None
+    published_time: Optional[str] = None
+    language: Optional[str] = None
+
+    @property
+    def base_url(self) -> Optional[str]:
+        """The URL the page says it lives at: canonical first, then og:url."""
+        return self.canonical_url or self.og_url
+
+
+class _StopParsing(Exception):
+    pass
+
+
+class _HeadParser(HTMLParser):
+    """Collect metadata tags, giving up as soon as the head is over."""
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        # The first occurrence of each field wins, even if empty, like BeautifulSoup's find()
+        self.fields: dict[str, Optional[str]] = {}
+        self._opaque_depth = 0
+
+    def _set(self, field: str, value: Optional[str]) -> None:
+        if field not in self.fields:
+            self.fields[field] = value or None
+
+    def handle_starttag(self, tag, attrs):
+        if self._opaque_depth:
+            self._opaque_depth += tag in OPAQUE_TAGS
+            return
+        if tag in OPAQUE_TAGS:
+            self._opaque_depth = 1
+            return
+        if tag not in HEAD_TAGS:
+            raise _StopParsing()
+        attributes = dict(attrs)
+        if tag == 'html':
+            self.fields.setdefault('language', attributes.get('lang') or None)
+        elif tag == 'link' and 'canonical' in (attributes.get('rel') or '').lower().split():
+            self._set('canonical_url', attributes.get('href'))
+        elif tag == 'meta':
+            prop = attributes.get('property')
+            content = attributes.get('content')
+            if prop == 'og:url':
+                self._set('og_url', content)
+            elif prop == 'og:image':
+                self._set('og_image', content)
+            elif prop == 'og:title':
+                self._set('og_title', content)
+            elif prop == 'article:published_time':
+                self._set('published_time', content)
+            elif (attributes.get('http-equiv') or '').lower() == 'content-language':
+                self._set('content_language', content)
+
+    def handle_endtag(self, tag):
+        if self._opaque_depth:
+            self._opaque_depth -= tag in OPAQUE_TAGS
+            return
+        if tag == 'head':
+            raise _StopParsing()
+
+
+def read_page_metadata(html: str) -> PageMetadata:
+    """
+    Read canonical URL, og:url, og:image, og:title, published time and language from a page.
+    Only the document up to the end of <head> is tokenized, so the cost does not grow with the
+    article; tags that only appear in the body are not seen.
+    """
+    parser = _HeadParser()
+    try:
+        parser.feed(html)
+        parser.close()
+    except _StopParsing:
+        pass
+    fields = parser.fields
+    if not fields.get('language'):
+        fields['language'] = fields.get('content_language')
+    fields.pop('content_language', None)
+    return PageMetadata(**fields)
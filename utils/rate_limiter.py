@@ -0,0 +1,88 @@
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Iterator, Optional
+
+
+class RateLimitScheduler:
+    """
+    Hold requests back until Reddit's rate limit has room for them.
+
+    Reddit reports how many requests are left in the current window and when
+    it resets in the X-Ratelimit-Remaining and X-Ratelimit-Reset headers,
+    which PRAW keeps in reddit.auth.limits. Work is priced at the number of
+    requests it makes; if fewer than that (plus `reserve`, left for other
+    users of the same client) remain, wait_for sleeps until the window resets
+    rather than failing part way through. Before the first response, or once
+    the reset time has passed, the limits are unknown and nothing is held back.
+
+    PRAW 8 no longer passes the reset time on; windows are then assumed to be
+    `window` seconds long and aligned to the clock, as Reddit's are, and the
+    limits to belong to the window in which they were first seen.
+
+    Threads posting through the same client share one scheduler: requests
+    held with `hold` count against the remaining quota until the block
+    exits, so two threads cannot both spend the last requests of a window.
+    """
+
+    def __init__(
+        self,
+        limits: Callable[[], dict],
+        reserve: int = 0,
+        window: int = 600,
+        clock: Callable[[], float] = time.time,
+        sleep: Callable[[float], None] = time.sleep
+    ):
+        self.limits = limits
+        self.reserve = reserve
+        self.window = window
+        self.clock = clock
+        self.sleep = sleep
+        self._observed: Optional[tuple] = None
+        self._observed_at = 0.0
+        # Waiters queue up behind each other; _pending_lock alone guards the held requests,
+        # so a thread finishing its requests is never stuck behind one sleeping until a reset
+        self._lock = threading.Lock()
+        self._pending_lock = threading.Lock()
+        self._pending = 0
+
+    def delay_for(self, cost: int) -> float:
+        """Return the seconds until `cost` requests can be made, 0 if they can be made now."""
+        limits = self.limits()
+        remaining: Optional[float] = limits.get("remaining")
+        with self._pending_lock:
+            pending = self._pending
+        if remaining is None or remaining - self.reserve - pending >= cost:
+            return 0
+        now = self.clock()
+        reset_timestamp: Optional[float] = limits.get("reset_timestamp")
+        if reset_timestamp is None:
+            observed = (remaining, limits.get("used"))
+            if observed != self._observed:
+                self._observed, self._observed_at = observed, now
+            reset_timestamp = self._observed_at - self._observed_at % self.window + self.window
+        return max(0.0, reset_timestamp - now)
+
+    def wait_for(self, cost: int) -> float:
+        """Sleep until `cost` requests can be made. Returns the seconds slept."""
+        with self.hold(cost) as delay:
+            return delay
+
+    @contextmanager
+    def hold(self, cost: int) -> Iterator[float]:
+        """
+        Sleep until `cost` requests can be made and hold them for the block, yielding the seconds slept.
+        The requests stay held until the block exits, even those it already made; that errs on the side
+        of waiting.
+        """
+        with self._lock:
+            delay = self.delay_for(cost)
+            if delay:
+                self.sleep(delay)
+            with self._pending_lock:
+                self._pending += cost
+        try:
+            yield delay
+        finally:
+            with self._pending_lock:
+                self._pending -= cost
@@ -0,0 +1,56 @@
+/*
+ * Long-lived Readability.js worker.
+ *
+ * Reads length-prefixed frames (4 byte big-endian length followed by UTF-8 JSON)
+ * from stdin and answers each one with a frame on stdout:
+ *   {"html": "..."}  ->  {"article": {...} | null}  or  {"error": "..."}
+ *   {"ping": true}   ->  {"pong": true}
+ *
+ * An optional module path can be passed as the first argument to replace
+ * Readability with another parse(html) function, which the tests use.
+ */
+
+function readabilityParse(html) {
+	const { Readability } = require('@mozilla/readability');
+	const { JSDOM } = require('jsdom');
+	const doc = new JSDOM(html);
+	return new Readability(doc.window.document).parse();
+}
+
+const parse = process.argv[2] ? require(require('path').resolve(process.argv[2])) : readabilityParse;
+
+function send(message) {
+	const body = Buffer.from(JSON.stringify(message), 'utf-8');
+	const header = Buffer.alloc(4);
+	header.writeUInt32BE(body.length, 0);
+	process.stdout.write(Buffer.concat([header, body]));
+}
+
+function handle(request) {
+	if (request.ping) {
+		return { pong: true };
+	}
+	try {
+		// Same as ExtractArticle.js, which trims the file it reads
+		return { article: parse(request.html.trim()) };
+	} catch (e) {
+		return { error: String(e && e.stack || e) };
+	}
+}
+
+let buffer = Buffer.alloc(0);
+
+process.stdin.on('data', (chunk) => {
+	buffer = Buffer.concat([buffer, chunk]);
+	while (buffer.length >= 4) {
+		const length = buffer.readUInt32BE(0);
+		if (buffer.length < 4 + length) {
+			break;
+		}
+		const request = JSON.parse(buffer.subarray(4, 4 + length).toString('utf-8'));
+		buffer = buffer.subarray(4 + length);
+		send(handle(request));
+	}
+});
+
+process.stdin.on('end', () => process.exit(0));
@@ -0,0 +1,191 @@
+import json
+import logging
+import os
+import resource
+import select
+import struct
+import subprocess
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Iterator, Optional
+import readabilipy
+from readabilipy import simple_json_from_html_string
+from readabilipy.simple_json import have_node
+
+logger = logging.getLogger(__name__)
+
+WORKER_SCRIPT = Path(__file__).with_name("readability_worker.js")
+# readabilipy installs Readability.js and jsdom next to its own script
+READABILIPY_JS_DIR = Path(readabilipy.__file__).parent / "javascript"
+FRAME_HEADER = struct.Struct(">I")
+ARTICLE_FIELDS = ("title", "byline", "date", "content")
+
+
+@contextmanager
+def _memory_limit_lifted() -> Iterator[None]:
+    """
+    Node reserves far more address space than it uses, don't pass on a limit meant for Python.
+    Extraction pool workers set a soft limit below the hard one; it is raised around the spawn
+    here because a preexec_fn, which would raise it in the child only, is not safe in the
+    threaded main process. Where the soft limit is the hard one nothing is changed.
+    """
+    soft, hard = resource.getrlimit(resource.RLIMIT_AS)
+    if soft == hard:
+        yield
+        return
+    resource.setrlimit(resource.RLIMIT_AS, (hard, hard))
+    try:
+        yield
+    finally:
+        resource.setrlimit(resource.RLIMIT_AS, (soft, hard))
+
+
+class WorkerError(Exception):
+    """The Node worker died, timed out or sent something we could not read."""
+
+
+class ReadabilityWorker:
+    """
+    A Node.js process running Readability.js that stays up between articles.
+
+    readabilipy starts a fresh Node process for every article, paying the
+    interpreter and jsdom start-up cost each time. This worker is started
+    once and fed pages over stdin/stdout using length-prefixed JSON frames.
+    It is health-checked with a ping when started and restarted whenever it
+    has exited. Not thread-safe, callers serialise access.
+    """
+
+    def __init__(self, timeout: int = 30, parser: Optional[str] = None):
+        self.timeout = timeout
+        self.parser = parser
+        self._process: Optional[subprocess.Popen] = None
+
+    def is_alive(self) -> bool:
+        """Check if the Node process is running."""
+        return self._process is not None and self._process.poll() is None
+
+    def start(self) -> None:
+        """Start the Node process and wait until it answers a ping."""
+        self.stop()
+        command = ["node", str(WORKER_SCRIPT)]
+        if self.parser:
+            command.append(self.parser)
+        with _memory_limit_lifted():
+            self._process = subprocess.Popen(
+                command,
+                cwd=READABILIPY_JS_DIR,
+                env={**os.environ, "NODE_PATH": str(READABILIPY_JS_DIR / "node_modules")},
+                stdin=subprocess.PIPE,
+                stdout=subprocess.PIPE
+            )
+        if not self._request({"ping": True}).get("pong"):
+            self.stop()
+            raise WorkerError("Readability worker failed its health check")
+
+    def stop(self) -> None:
+        """Stop the Node process if it is running."""
+        if self._process is None:
+            return
+        process, self._process = self._process, None
+        try:
+            process.stdin.close()
+        except OSError:
+            pass
+        try:
+            process.wait(timeout=1)
+        except subprocess.TimeoutExpired:
+            process.kill()
+            process.wait()
+
+    def parse(self, html: str) -> Optional[dict]:
+        """Run Readability on a page. Returns its article, or None if it found none."""
+        if not self.is_alive():
+            self.start()
+        response = self._request({"html": html})
+        if "error" in response:
+            raise WorkerError(response["error"])
+        return response.get("article")
+
+    def _request(self, message: dict) -> dict:
+        body = json.dumps(message).encode("utf-8")
+        try:
+            self._process.stdin.write(FRAME_HEADER.pack(len(body)) + body)
+            self._process.stdin.flush()
+            deadline = time.monotonic() + self.timeout
+            (length,) = FRAME_HEADER.unpack(self._read_exact(FRAME_HEADER.size, deadline))
+            return json.loads(self._read_exact(length, deadline))
+        except (OSError, ValueError, WorkerError) as e:
+            # The process is in an unknown state, the next request starts a new one
+            self.stop()
+            if isinstance(e, WorkerError):
+                raise
+            raise WorkerError(f"Readability worker failed: {e}") from e
+        except BaseException:
+            # Interrupted part way, e.g. by a pool worker's CPU budget: its reply may still be
+            # unread and would be taken for the next article's
+            self.stop()
+            raise
+
+    def _read_exact(self, size: int, deadline: float) -> bytes:
+        stdout = self._process.stdout
+        data = b""
+        while len(data) < size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0 or not select.select([stdout], [], [], remaining)[0]:
+                raise WorkerError(f"Readability worker timed out after {self.timeout} seconds")
+            chunk = os.read(stdout.fileno(), size - len(data))
+            if not chunk:
+                raise WorkerError("Readability worker exited")
+            data += chunk
+        return data
+
+
+_worker: Optional[ReadabilityWorker] = None
+_node_available: Optional[bool] = None
+_lock = threading.Lock()
+
+
+def node_is_available() -> bool:
+    """Check once per process that Node and readabilipy's JavaScript dependencies are installed."""
+    global _node_available
+    if _node_available is None:
+        try:
+            _node_available = have_node()
+        except Exception as e:
+            logger.warning(f"Could not set up Node for Readability: {e}")
+            _node_available = False
+        if not _node_available:
+            logger.warning("Node is not available, extracting articles with the pure-Python parser")
+    return _node_available
+
+
+def set_node_available(available: bool) -> None:
+    """Skip the check in processes that cannot run it, e.g. under a memory limit Node would not start with."""
+    global _node_available
+    _node_available = available
+
+
+def simple_json_from_html(html: str) -> dict:
+    """
+    Drop-in for simple_json_from_html_string(html, use_readability=True) that reuses
+    a persistent worker per process. Only the title, byline, date and content fields
+    are filled in. Falls back to readabilipy's own Node call if the worker fails,
+    and to its pure-Python extractor if Node is not available.
+    """
+    global _worker
+    if not node_is_available():
+        return simple_json_from_html_string(html, use_readability=False)
+
+    with _lock:
+        if _worker is None:
+            _worker = ReadabilityWorker()
+        try:
+            article = _worker.parse(html)
+        except Exception as e:
+            logger.warning(f"Readability worker failed, falling back to a one-off Node process: {e}")
+            return simple_json_from_html_string(html, use_readability=True)
+
+    article = article or {}
+    return {field: article.get(field) or None for field in ARTICLE_FIELDS}
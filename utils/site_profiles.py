@@ -0,0 +1,78 @@
+from typing import Iterable, NamedTuple, Optional
+import bs4
+from urllib.parse import urlparse
+
+
+class SiteProfile(NamedTuple):
+    """CSS selectors for pulling an article out of a newspaper with known markup."""
+    domain: str
+    body: str
+    title: Optional[str] = None
+    image: Optional[str] = None
+    drop: tuple[str, ...] = ()
+
+
+def load_site_profiles(profiles_config: Optional[dict]) -> tuple[SiteProfile, ...]:
+    """
+    Build site profiles from the `site_profiles` config section, which maps a
+    domain to its selectors:
+
+        lanacion.com.ar:
+          title: 'h1.com-title'
+          body: 'section.cuerpo__nota'
+          image: 'meta[property="og:image"]'
+          drop: ['.mod-banner', '.newsletter']
+    """
+    profiles = []
+    for domain, selectors in (profiles_config or {}).items():
+        profiles.append(SiteProfile(
+            domain=domain.lower(),
+            body=selectors['body'],
+            title=selectors.get('title'),
+            image=selectors.get('image'),
+            drop=tuple(selectors.get('drop', []))
+        ))
+    return tuple(profiles)
+
+
+def match_site_profile(profiles: Iterable[SiteProfile], url: Optional[str]) -> Optional[SiteProfile]:
+    """Return the profile for the URL's domain or any of its parent domains."""
+    if not url:
+        return None
+    host = urlparse(url).netloc.lower().split(':')[0]
+    for profile in profiles:
+        if host == profile.domain or host.endswith('.' + profile.domain):
+            return profile
+    return None
+
+
+def extract_with_profile(soup: bs4.BeautifulSoup, profile: SiteProfile) -> Optional[dict]:
+    """
+    Extract an article from a parsed page using a site profile.
+    Returns a dict shaped like readabilipy's output (title, content and
+    lead_image_url), or None when the body selector matches nothing.
+    Elements matching the drop selectors are removed from the soup.
+    """
+    bodies = soup.select(profile.body)
+    if not bodies:
+        return None
+
+    for body in bodies:
+        for selector in profile.drop:
+            for element in body.select(selector):
+                element.decompose()
+    content = "<div>" + "".join(str(body) for body in bodies) + "</div>"
+
+    title = None
+    title_element = soup.select_one(profile.title) if profile.title else None
+    if title_element:
+        title = title_element.get_text(" ", strip=True)
+    elif soup.title and soup.title.string:
+        title = soup.title.string.strip()
+
+    image_url = None
+    image_element = soup.select_one(profile.image) if profile.image else None
+    if image_element:
+        image_url = image_element.get("content") or image_element.get("src")
+
+    return {"title": title or None, "content": content, "lead_image_url": image_url}
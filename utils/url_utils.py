@@ -0,0 +1,50 @@
+import re
+from urllib.parse import urlparse, parse_qsl, urlencode, urlunparse
+
+# Query parameters that only identify where a click came from
+TRACKING_PARAMS = {
+    'fbclid', 'gclid', 'dclid', 'msclkid', 'igshid', 'yclid', 'twclid',
+    'mc_cid', 'mc_eid', '_ga', '_gl', 'ref', 'ref_src', 'ref_url',
+    'cmpid', 'ito', 'mbid', 'smid', 'outputtype',
+}
+TRACKING_PREFIXES = ('utm_',)
+
+# AMP variants of an article path: /nota/amp, /nota/amp/, /nota.amp, /amp/nota
+AMP_SUFFIX_REGEX = re.compile(r'(/amp/?|\.amp)$', re.I)
+AMP_PREFIX_REGEX = re.compile(r'^/amp(?=/)', re.I)
+
+
+def _is_tracking_param(name: str) -> bool:
+    name = name.lower()
+    return name in TRACKING_PARAMS or name == 'amp' or name.startswith(TRACKING_PREFIXES)
+
+
+def canonicalize_url(url: str) -> str:
+    """
+    Build a key that is shared by every link to the same article.
+    Drops scheme differences, credentials, default ports, 'www.', 'm.' and
+    'amp.' subdomains, AMP path suffixes, fragments, tracking parameters and
+    trailing slashes. Remaining query parameters are sorted.
+    """
+    parsed = urlparse(url.strip())
+    host = (parsed.hostname or '').lower()
+    for prefix in ('www.', 'm.', 'amp.'):
+        if host.startswith(prefix):
+            host = host[len(prefix):]
+            break
+    try:
+        port = parsed.port
+    except ValueError:
+        port = None
+    if port and port not in (80, 443):
+        host = f"{host}:{port}"
+
+    path = AMP_PREFIX_REGEX.sub('', parsed.path)
+    path = AMP_SUFFIX_REGEX.sub('', path).rstrip('/')
+
+    query = sorted(
+        (name, value)
+        for name, value in parse_qsl(parsed.query, keep_blank_values=True)
+        if not _is_tracking_param(name)
+    )
+    return urlunparse(('https', host, path, '', urlencode(query), ''))